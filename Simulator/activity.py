@@ -1,11 +1,15 @@
 import re
+from datetime import timedelta
 
+from associations import Associations
 from common import sensor_states
 from device import devices
 from door import doors
 from log import log_activity_start, log_activity_end, log_end_of_simulation
 from point import points
 from read import coordinates, read_devices, read_sensors, read_walls_coordinates, read_doors
+from registry import find_device
+from timeseries import last_falling_edge, last_state, states_of
 from sensor import sensors
 from utils import find_closest_sensor_within_fov
 from wall import walls_coordinates
@@ -15,9 +19,12 @@ RADIUS_STANDARD = 150   # px distance for "closest sensor within FOV"
 
 activity_sessions = {}
 current_activities = {}
+gui_associations = {}  # load_active -> Associations over the GUI lists monitored by monitor_activities
 
 exit_triggered = False
 exit_time = 0
+returning_triggered = False  # entrance closed, waiting RETURN_WINDOW for a PIR (see detect_entering_home)
+returning_time = None
 prev_entry_state = None # previous state of the input switch to detect fronts
 
 
@@ -27,13 +34,47 @@ meal_detection_start = {
     "dinner": None
 }
 meal_active = None
+MEAL_SLOTS = {"breakfast": (7, 9), "lunch": (12, 14), "dinner": (20, 22)}  # [start hour, end hour)
 MEAL_MIN_DURATION = 10  # simulated seconds to confirm meal
 SLEEP_MIN_DURATION = 10  # simulated seconds with Weight=1 near bed
+EXIT_CONFIRM_DELAY = 5  # simulated seconds after the entrance closes before checking that all PIRs are off
+RETURN_WINDOW = 5  # simulated seconds after the entrance closes in which a PIR must fire to count a return
 sleep_weight_start = {}  # sleep_weight_start: timers per Weight sensor near bed
 # index of the last edge 1->0 already managed for the "entrance" switch
 exit_last_edge_idx = -1
 
 
+# Forget every open activity and detector timer, e.g. before a new headless run in the same process.
+def reset_activity_state():
+    global exit_triggered, exit_time, prev_entry_state, meal_active, exit_last_edge_idx
+    global exit_activated, returning_triggered, returning_time
+
+    activity_sessions.clear()
+    current_activities.clear()
+    sleep_weight_start.clear()
+    for key in meal_detection_start:
+        meal_detection_start[key] = None
+    meal_active = None
+    exit_triggered = False
+    exit_time = 0
+    exit_activated = False
+    exit_last_edge_idx = -1
+    prev_entry_state = None
+    returning_triggered = False
+    returning_time = None
+
+# The first `removed` samples of a sensor history were dropped (multi-day runs keep only the latest one):
+# shift the edge index of the entrance switch so already handled exits are not detected again.
+def sensor_history_trimmed(name, removed):
+    global exit_last_edge_idx
+    if name.lower() == "entrance" and exit_last_edge_idx >= 0:
+        exit_last_edge_idx = max(exit_last_edge_idx - removed, -1)
+
+# Completed sessions are only needed until they are written out: multi-day runs drop them at every day.
+def clear_activity_sessions():
+    activity_sessions.clear()
+
+
 def monitor_activities(canvas, load_active, activity_label, timer_app_instance):
     if load_active:
         p_points = coordinates
@@ -48,30 +89,47 @@ def monitor_activities(canvas, load_active, activity_label, timer_app_instance):
         walls = walls_coordinates
         d_doors = doors
 
+    associations = gui_associations.get(load_active)
+    if associations is None:
+        associations = gui_associations[load_active] = Associations(p_points, s_sensors, d_devices, d_doors)
+
     if timer_app_instance.is_running:
         now = timer_app_instance.get_simulated_time()
-        detected = set()
-
-        detectors = [
-            lambda: detect_exiting_home(sensor_states, s_sensors, timer_app_instance),
-            lambda: detect_entering_home(sensor_states, s_sensors, timer_app_instance, activity_label),
-            lambda: detect_sleeping(sensor_states, s_sensors, p_points, timer_app_instance),
-            lambda: detect_cooking(sensor_states, d_devices, s_sensors, walls, d_doors),
-            lambda: detect_meal(sensor_states, s_sensors, d_devices, timer_app_instance),
-            lambda: detect_laundry(sensor_states, d_devices),
-            lambda: detect_dishwasher(sensor_states, d_devices),
-            lambda: detect_office(sensor_states, d_devices),
-        ]
-
-        for detect in detectors:
-            act = detect()
-            if act:
-                detected.add(act)
-
+        detected = detect_activities(sensor_states, p_points, d_devices, s_sensors, walls, d_doors,
+                                     timer_app_instance, activity_label, associations=associations)
         update_activity_state(now, detected, activity_label)
 
         canvas.after(1000, monitor_activities, canvas, load_active, activity_label, timer_app_instance)
 
+# Run every detector once on the given scenario and return the set of detected activities.
+# Shared by the Tkinter loop above and by the headless engine (activity_label=None).
+# closest_in_fov(point, max_distance, fov_angle), e.g. visibility.FovCache.closest, answers the PIR lookups of the
+# cooking and meal detectors; without it they call find_closest_sensor_within_fov. `associations` (see
+# associations.py) gives the Weight sensors of beds and table; without it they are found from the lists.
+def detect_activities(sensor_states, p_points, d_devices, s_sensors, walls, d_doors, timer_app_instance,
+                      activity_label=None, closest_in_fov=None, associations=None):
+    detected = set()
+    if associations is None:
+        associations = Associations(p_points, s_sensors, d_devices, d_doors)
+
+    detectors = [
+        lambda: detect_exiting_home(sensor_states, s_sensors, timer_app_instance),
+        lambda: detect_entering_home(sensor_states, s_sensors, timer_app_instance, activity_label),
+        lambda: detect_sleeping(sensor_states, s_sensors, p_points, timer_app_instance, associations),
+        lambda: detect_cooking(sensor_states, d_devices, s_sensors, walls, d_doors, closest_in_fov),
+        lambda: detect_meal(sensor_states, s_sensors, d_devices, timer_app_instance, p_points, walls, d_doors,
+                            closest_in_fov, associations),
+        lambda: detect_laundry(sensor_states, d_devices),
+        lambda: detect_dishwasher(sensor_states, d_devices),
+        lambda: detect_office(sensor_states, d_devices),
+    ]
+
+    for detect in detectors:
+        act = detect()
+        if act:
+            detected.add(act)
+    return detected
+
 def update_activity_state(current_time, detected_activities, activity_label):
     global current_activities, activity_sessions
 
@@ -110,48 +168,52 @@ def close_current_activity(timer_app_instance, activity_label=None):
     log_end_of_simulation(now)
 
 
-def detect_cooking(sensor_states, devices, sensors, walls, doors):
+def _closest_pir(point, sensors, walls, doors, closest_in_fov=None):
+    if closest_in_fov is not None:
+        return closest_in_fov(point, RADIUS_STANDARD, FOV_ANGLE)
+    return find_closest_sensor_within_fov(point, sensors, walls, doors, RADIUS_STANDARD, FOV_ANGLE)
+
+def detect_cooking(sensor_states, devices, sensors, walls, doors, closest_in_fov=None):
     for device in devices:
         name, x, y, type, _, state, *_ = device
         if re.match(r'^oven\d*$', type, re.IGNORECASE) and state == 1:
-            pir = find_closest_sensor_within_fov((x, y), sensors, walls, doors, RADIUS_STANDARD, FOV_ANGLE)
+            pir = _closest_pir((x, y), sensors, walls, doors, closest_in_fov)
             if pir:
-                pir_state = sensor_states.get(pir[0], {}).get('state', [])
-                if pir_state and pir_state[-1] == 1:
+                if last_state(sensor_states, pir[0]) == 1:
                     return "cooking"
     return None
 
 def detect_laundry(sensor_states, devices):
-    for name, data in sensor_states.items():
-        if data.get('type') == "Smart Meter":
-            assoc = data.get('associated_device')
-            state = data['state'][-1] if data['state'] else 0
+    for name, series in sensor_states.items():
+        if series.type == "Smart Meter":
+            assoc = series.associated_device
+            state = series.last_state or 0
             if assoc:
-                for d in devices:
-                    if d[0] == assoc and d[3].lower() == "washing_machine" and state > 0:
-                        return "laundry"
+                d = find_device(devices, assoc)
+                if d and d[3].lower() == "washing_machine" and state > 0:
+                    return "laundry"
     return None
 
 def detect_dishwasher(sensor_states, devices):
-    for name, data in sensor_states.items():
-        if data.get('type') == "Smart Meter":
-            assoc = data.get('associated_device')
-            state = data['state'][-1] if data['state'] else 0
+    for name, series in sensor_states.items():
+        if series.type == "Smart Meter":
+            assoc = series.associated_device
+            state = series.last_state or 0
             if assoc:
-                for d in devices:
-                    if d[0] == assoc and d[3].lower() == "dishwasher" and state > 0:
-                        return "dishwasher"
+                d = find_device(devices, assoc)
+                if d and d[3].lower() == "dishwasher" and state > 0:
+                    return "dishwasher"
     return None
 
 def detect_office(sensor_states, devices):
-    for name, data in sensor_states.items():
-        if data.get('type') == "Smart Meter":
-            assoc = data.get('associated_device')
-            state = data['state'][-1] if data['state'] else 0
+    for name, series in sensor_states.items():
+        if series.type == "Smart Meter":
+            assoc = series.associated_device
+            state = series.last_state or 0
             if assoc:
-                for d in devices:
-                    if d[0] == assoc and d[3].lower() == "computer" and state > 0:
-                        return "office"
+                d = find_device(devices, assoc)
+                if d and d[3].lower() == "computer" and state > 0:
+                    return "office"
     return None
 
 def detect_exiting_home(sensor_states, sensors, timer_app_instance):
@@ -175,16 +237,13 @@ def detect_exiting_home(sensor_states, sensors, timer_app_instance):
     for s in sensors:
         if s[0].lower() == "entrance" and s[3].lower() == "switch":
             entrance_name = s[0]
-            entrance_state = sensor_states.get(entrance_name, {}).get("state", [])
+            entrance_state = states_of(sensor_states, entrance_name)
             break
 
     # Detect last edge 1->0 (if it exists)
-    if entrance_state and len(entrance_state) >= 2 and not exit_activated:
-        last_edge_idx = None
-        # I scroll through the entire sequence: it handles cases [1,0,1,0] well in the same second
-        for i in range(1, len(entrance_state)):
-            if entrance_state[i-1] == 1 and entrance_state[i] == 0:
-                last_edge_idx = i
+    if entrance_state is not None and len(entrance_state) >= 2 and not exit_activated:
+        # the entire sequence is checked: it handles cases [1,0,1,0] well in the same second
+        last_edge_idx = last_falling_edge(entrance_state)
 
         if last_edge_idx is not None and last_edge_idx > exit_last_edge_idx:
             exit_last_edge_idx = last_edge_idx
@@ -194,14 +253,13 @@ def detect_exiting_home(sensor_states, sensors, timer_app_instance):
     #  After the trigger: wait 5s and check PIR all at 0
     if exit_triggered and not exit_activated:
         delta = (timer_app_instance.elapsed_time - exit_time).total_seconds()
-        if delta >= 5:
+        if delta >= EXIT_CONFIRM_DELAY:
             exit_triggered = False
             # checks that all PIRs are at 0 (last seen state)
             all_zero = True
             for s in sensors:
                 if s[3] == "PIR":
-                    seq = sensor_states.get(s[0], {}).get("state", [])
-                    if seq and seq[-1] == 1:
+                    if last_state(sensor_states, s[0]) == 1:
                         all_zero = False
                         break
             if all_zero:
@@ -238,8 +296,7 @@ def detect_entering_home(sensor_states, sensors, timer_app_instance, activity_la
         # prev_entry_state so as not to lose the first useful front
         for s in sensors:
             if s[0].lower() == "entrance" and s[3].lower() == "switch":
-                curr = sensor_states.get(s[0], {}).get("state", [])
-                prev_entry_state = (curr[-1] if curr else 0)
+                prev_entry_state = last_state(sensor_states, s[0]) or 0
                 break
         return None
 
@@ -247,10 +304,10 @@ def detect_entering_home(sensor_states, sensors, timer_app_instance, activity_la
     entrance_state = None
     for s in sensors:
         if s[0].lower() == "entrance" and s[3].lower() == "switch":
-            entrance_state = sensor_states.get(s[0], {}).get("state", [])
+            entrance_state = states_of(sensor_states, s[0])
             break
 
-    curr_entrance = entrance_state[-1] if entrance_state else 0
+    curr_entrance = entrance_state[-1] if entrance_state is not None and len(entrance_state) else 0
     if prev_entry_state is None:
         prev_entry_state = curr_entrance
 
@@ -265,15 +322,11 @@ def detect_entering_home(sensor_states, sensors, timer_app_instance, activity_la
     # At least one PIR must be activated within 5 simulated seconds
     if returning_triggered:
         delta = (timer_app_instance.elapsed_time - returning_time).total_seconds()
-        if delta > 5:
+        if delta > RETURN_WINDOW:
             # timeout expired
             returning_triggered = False
         else:
-            active_pir = any(
-                (sensor_states.get(s[0], {}).get("state", []) and
-                 sensor_states.get(s[0], {}).get("state")[-1] == 1)
-                for s in sensors if s[3] == "PIR"
-            )
+            active_pir = any(last_state(sensor_states, s[0]) == 1 for s in sensors if s[3] == "PIR")
             if active_pir:
                 returning_triggered = False
                 exit_activated = False
@@ -285,10 +338,8 @@ def detect_entering_home(sensor_states, sensors, timer_app_instance, activity_la
 
                 try:
                     last_edge_idx = None
-                    if entrance_state and len(entrance_state) >= 2:
-                        for i in range(1, len(entrance_state)):
-                            if entrance_state[i-1] == 1 and entrance_state[i] == 0:
-                                last_edge_idx = i
+                    if entrance_state is not None:
+                        last_edge_idx = last_falling_edge(entrance_state)
                     if last_edge_idx is not None:
                         exit_last_edge_idx = max(exit_last_edge_idx, last_edge_idx)
                 except Exception:
@@ -310,71 +361,54 @@ def detect_entering_home(sensor_states, sensors, timer_app_instance, activity_la
     return None
 
 
-def detect_sleeping(sensor_states, sensors, points, timer_app_instance):
+def detect_sleeping(sensor_states, sensors, points, timer_app_instance, associations=None):
 
     global sleep_weight_start
 
-    bed_pattern = re.compile(r'^bed\d*$', re.IGNORECASE)
-
-    # search all 'bed*' points
-    beds = [(name, x, y) for (name, x, y) in points if bed_pattern.match(name)]
-
-    def dist(ax, ay, bx, by):
-        return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5
+    if associations is None:
+        associations = Associations(points, sensors, (), ())
 
     any_near_bed_active = False
 
-    for _, lx, ly in beds:
-        # search weight sensor near bed
-        for s in sensors:
-            name, sx, sy, type, *_ = s
-            if type == "Weight" and dist(lx, ly, sx, sy) < 30:
-                state_seq = sensor_states.get(name, {}).get('state', [])
-                active = bool(state_seq and state_seq[-1] == 1)
+    # weight sensors near each 'bed*' point
+    for s in associations.bed_weights():
+        name = s[0]
+        active = last_state(sensor_states, name) == 1
 
-                if active:
-                    any_near_bed_active = True
-                    # start timer for this sensor
-                    if name not in sleep_weight_start:
-                        sleep_weight_start[name] = timer_app_instance.elapsed_time
-                    else:
-                        delta = (timer_app_instance.elapsed_time - sleep_weight_start[name]).total_seconds()
-                        if delta >= SLEEP_MIN_DURATION:
-                            return "sleeping"
-                else:
-                    # reset timer
-                    if name in sleep_weight_start:
-                        del sleep_weight_start[name]
+        if active:
+            any_near_bed_active = True
+            # start timer for this sensor
+            if name not in sleep_weight_start:
+                sleep_weight_start[name] = timer_app_instance.elapsed_time
+            else:
+                delta = (timer_app_instance.elapsed_time - sleep_weight_start[name]).total_seconds()
+                if delta >= SLEEP_MIN_DURATION:
+                    return "sleeping"
+        else:
+            # reset timer
+            if name in sleep_weight_start:
+                del sleep_weight_start[name]
 
 
 
 
-def detect_meal(sensor_states, sensors, devices, timer_app_instance):
+def detect_meal(sensor_states, sensors, devices, timer_app_instance, p_points=None, walls=None, d_doors=None,
+                closest_in_fov=None, associations=None):
     global meal_detection_start, meal_active
-    TABLE_RADIUS = 40  # max distance weight - table
-
-    # find table coordinates
-    table_coords = None
-    table_pattern = re.compile(r'^table\d*$', re.IGNORECASE)
-    for name, x, y in (points + coordinates):
-        if table_pattern.match(name):
-            table_coords = (x, y)
-            break
+
+    # without an explicit scenario fall back to the GUI lists
+    if p_points is None:
+        p_points = points + coordinates
+    if walls is None:
+        walls = walls_coordinates
+    if d_doors is None:
+        d_doors = doors
+    if associations is None:
+        associations = Associations(p_points, sensors, (), ())
 
     # search for Active Weight sensor near the table
     def weight_active_near_table():
-        if not table_coords:
-            return False
-        tx, ty = table_coords
-        for s in sensors:
-            name, sx, sy, type, *_ = s
-            if type == "Weight":
-                dist = ((tx - sx)**2 + (ty - sy)**2) ** 0.5
-                if dist <= TABLE_RADIUS:
-                    state = sensor_states.get(name, {}).get("state", [])
-                    if state and state[-1] == 1:
-                        return True
-        return False
+        return any(last_state(sensor_states, s[0]) == 1 for s in associations.table_weights())
 
 
     time_str = timer_app_instance.get_simulated_time()
@@ -384,22 +418,19 @@ def detect_meal(sensor_states, sensors, devices, timer_app_instance):
         hour = 0
 
     slot = None
-    if 7 <= hour < 9:
-        slot = "breakfast"
-    elif 12 <= hour < 14:
-        slot = "lunch"
-    elif 20 <= hour < 22:
-        slot = "dinner"
+    for meal, (start_hour, end_hour) in MEAL_SLOTS.items():
+        if start_hour <= hour < end_hour:
+            slot = meal
+            break
 
     if slot:
         for d in devices:
             name, x, y, type, _, state, *_ = d
             # oven off
             if type.lower() == "oven" and state == 0:
-                pir = find_closest_sensor_within_fov((x, y), sensors, walls_coordinates, doors, RADIUS_STANDARD, FOV_ANGLE)
+                pir = _closest_pir((x, y), sensors, walls, d_doors, closest_in_fov)
                 if pir:
-                    state = sensor_states.get(pir[0], {}).get("state", [])
-                    if state and state[-1] == 1:
+                    if last_state(sensor_states, pir[0]) == 1:
                         if not weight_active_near_table():
                             return None
                         if meal_active == slot:
@@ -424,3 +455,30 @@ def detect_meal(sensor_states, sensors, devices, timer_app_instance):
         meal_active = None
 
     return None
+
+
+# Timer elapsed times at which a pending detector window expires (sleep/meal confirmation, exit check,
+# return window). The event-driven engine wakes up at these instants instead of polling every second.
+def pending_activity_deadlines():
+    deadlines = []
+    for start in sleep_weight_start.values():
+        deadlines.append(start + timedelta(seconds=SLEEP_MIN_DURATION))
+    for start in meal_detection_start.values():
+        if start is not None:
+            deadlines.append(start + timedelta(seconds=MEAL_MIN_DURATION))
+    if exit_triggered and exit_time is not None:
+        deadlines.append(exit_time + timedelta(seconds=EXIT_CONFIRM_DELAY))
+    if returning_triggered and returning_time is not None:
+        # the window closes when delta > RETURN_WINDOW, so wake up just after it
+        deadlines.append(returning_time + timedelta(seconds=RETURN_WINDOW + 1))
+    return deadlines
+
+# Minutes from "HH:MM" to the next start or end of a meal slot.
+def minutes_to_next_meal_boundary(time_str):
+    hour, minute = map(int, time_str.split(":"))
+    now = hour * 60 + minute
+    boundaries = sorted(h * 60 for slot in MEAL_SLOTS.values() for h in slot)
+    for boundary in boundaries:
+        if boundary > now:
+            return boundary - now
+    return boundaries[0] + 24 * 60 - now
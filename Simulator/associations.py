@@ -0,0 +1,87 @@
+import re
+
+from utils import calculate_distance
+
+SWITCH_DOOR_DISTANCE = 50  # px from the centre of a door to the Switch sensors that follow it
+BED_WEIGHT_DISTANCE = 30  # px from a 'bed*' point to the Weight sensors that detect sleeping
+TABLE_WEIGHT_DISTANCE = 40  # px from the 'table*' point to the Weight sensors that detect a meal
+OVEN_DISTANCE_THRESHOLD = 50  # px from a Temperature sensor to the Ovens that heat it
+
+_BED = re.compile(r'^bed\d*$', re.IGNORECASE)
+_TABLE = re.compile(r'^table\d*$', re.IGNORECASE)
+
+
+class Associations:
+    """ Sensor/device associations that only depend on where things are: the Switches of each door, the Weight
+    sensors of the beds and of the table, the Ovens near each Temperature sensor. They are computed once per
+    layout and read as lists; points, sensors, devices or doors added, moved or removed (their `revision`, the
+    length of plain lists) rebuild them on the next read. States are never cached: callers read them from the
+    records, which the registries update in place. """
+
+    def __init__(self, points, sensors, devices, doors):
+        self.points = points
+        self.sensors = sensors
+        self.devices = devices
+        self.doors = doors
+        self._layout = None
+
+    def _refresh(self):
+        layout = tuple(getattr(c, "revision", len(c)) for c in (self.points, self.sensors, self.devices, self.doors))
+        if layout != self._layout:
+            self._build()
+            self._layout = layout
+
+    def _build(self):
+        switches = [s for s in self.sensors if s[3] == "Switch"]
+        weights = [s for s in self.sensors if s[3] == "Weight"]
+        ovens = [d for d in self.devices if d[3] == "Oven"]
+
+        self._door_switches = []
+        for index, door in enumerate(self.doors):
+            center_x, center_y = (door[0] + door[2]) / 2, (door[1] + door[3]) / 2
+            near = [s for s in switches
+                    if calculate_distance(center_x, center_y, s[1], s[2]) < SWITCH_DOOR_DISTANCE]
+            if near:
+                self._door_switches.append((index, near))
+
+        # one entry per (bed, Weight sensor) pair, bed by bed, as detect_sleeping visits them
+        self._bed_weights = []
+        for name, x, y in self.points:
+            if _BED.match(name):
+                self._bed_weights += [s for s in weights
+                                      if ((x - s[1]) ** 2 + (y - s[2]) ** 2) ** 0.5 < BED_WEIGHT_DISTANCE]
+
+        # detect_meal only looks at the first table
+        table = next(((x, y) for name, x, y in self.points if _TABLE.match(name)), None)
+        self._table_weights = []
+        if table:
+            tx, ty = table
+            self._table_weights = [s for s in weights
+                                   if ((tx - s[1]) ** 2 + (ty - s[2]) ** 2) ** 0.5 <= TABLE_WEIGHT_DISTANCE]
+
+        self._temperature_ovens = {}
+        for sensor in self.sensors:
+            if sensor[3] == "Temperature":
+                sx, sy = sensor[1], sensor[2]
+                self._temperature_ovens[sensor[0]] = [
+                    d for d in ovens if calculate_distance(sx, sy, d[1], d[2]) <= OVEN_DISTANCE_THRESHOLD]
+
+    # [(door, switches, door state), ...] for the doors with Switches nearby, as utils.find_switch_sensors_by_doors.
+    def switches_by_doors(self):
+        self._refresh()
+        return [(self.doors[index], switches, self.doors[index][4]) for index, switches in self._door_switches]
+
+    # Weight sensors near a 'bed*' point (one per bed it is near), in the order detect_sleeping checks them.
+    def bed_weights(self):
+        self._refresh()
+        return self._bed_weights
+
+    # Weight sensors near the first 'table*' point (none without a table).
+    def table_weights(self):
+        self._refresh()
+        return self._table_weights
+
+    # Ovens within OVEN_DISTANCE_THRESHOLD of the Temperature sensor `name`.
+    def ovens_near(self, name):
+        self._refresh()
+        return self._temperature_ovens.get(name, ())
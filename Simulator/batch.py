@@ -0,0 +1,101 @@
+import argparse
+import contextlib
+import itertools
+import multiprocessing
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from replay import read_moves, simulate_moves
+from routine import generate
+
+GAP_JITTER = 0.2  # each gap between two moves is scaled by a factor in [1 - GAP_JITTER, 1 + GAP_JITTER]
+START_JITTER_MINUTES = 15  # the whole routine is shifted by up to +/- this many minutes
+GENERATED_ROUTINE = "generated"  # routine name for schedules sampled by routine.RoutineGenerator
+
+
+# One run per (scenario, routine, seed) combination; seed None replays the routine unchanged.
+def make_jobs(scenarios, routines, seeds=(None,)):
+    return list(itertools.product(scenarios, routines, seeds))
+
+# Seeded variation of a routine: shifted start and stretched/shrunk gaps, keeping the order of the moves.
+def jitter_moves(moves, end_time, rng, gap_jitter=GAP_JITTER, start_jitter_minutes=START_JITTER_MINUTES):
+    if not moves:
+        return moves, end_time
+    shift = timedelta(minutes=rng.randint(-start_jitter_minutes, start_jitter_minutes))
+    jittered = [(moves[0][0] + shift, moves[0][1], moves[0][2])]
+    for (prev_ts, _, _), (ts, x, y) in zip(moves, moves[1:]):
+        gap = (ts - prev_ts).total_seconds() * rng.uniform(1 - gap_jitter, 1 + gap_jitter)
+        jittered.append((jittered[-1][0] + timedelta(minutes=round(gap / 60)), x, y))
+    tail = end_time - moves[-1][0] if end_time else timedelta()
+    return jittered, jittered[-1][0] + tail
+
+def _run_name(stamp, index, scenario_path, routine_path, seed):
+    scenario = os.path.splitext(os.path.basename(scenario_path))[0]
+    if routine_path == GENERATED_ROUTINE:
+        routine = GENERATED_ROUTINE
+    elif os.path.basename(routine_path) == "interactions.csv":
+        routine = os.path.basename(os.path.dirname(routine_path))
+    else:
+        routine = os.path.splitext(os.path.basename(routine_path))[0]
+    name = f"{stamp}_batch_{index:05d}_{scenario}_{routine}"
+    return name if seed is None else f"{name}_s{seed}"
+
+# Worker: one independent simulation, its console output kept in the run folder.
+def run_job(args):
+    scenario_path, routine_path, seed, output_dir, days = args
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "console.txt"), "w", encoding="utf-8") as console, \
+            contextlib.redirect_stdout(console):
+        try:
+            if routine_path == GENERATED_ROUTINE:
+                generate(scenario_path, days, output_dir, seed)
+                return output_dir, True
+            moves, end_time = read_moves(routine_path)
+            if not moves:
+                print(f"[WARN] No moves found in {routine_path}")
+                return output_dir, False
+            if seed is not None:
+                moves, end_time = jitter_moves(moves, end_time, random.Random(seed))
+            simulate_moves(moves, end_time, scenario_path, output_dir)
+            return output_dir, True
+        except Exception as e:
+            print(f"[ERROR] Run failed: {e}")
+            return output_dir, False
+
+# Run every job on a process pool, each into output_root/<stamp>_batch_<n>_<scenario>_<routine>_s<seed>/.
+# Generated routines cover `days` days, one subfolder per day. Returns [(output_dir, ok), ...] in job order.
+def run_batch(jobs, output_root="logs", processes=None, days=1):
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    tasks = [(scenario, routine, seed, os.path.join(output_root, _run_name(stamp, i, scenario, routine, seed)), days)
+             for i, (scenario, routine, seed) in enumerate(jobs)]
+    if not tasks:
+        return []
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+    if processes == 1:
+        return [run_job(task) for task in tasks]
+    # Workers only receive file paths and return the output folder, so runs stay independent and scale with cores.
+    with multiprocessing.Pool(processes) as pool:
+        return list(pool.imap(run_job, tasks, chunksize=1))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many seeded headless simulations in parallel.")
+    parser.add_argument("--scenarios", nargs="+", required=True, help="scenario files (read_scenario.csv format)")
+    parser.add_argument("--routines", nargs="+", required=True,
+                        help=f"routine scripts (interactions.csv format) or '{GENERATED_ROUTINE}'")
+    parser.add_argument("--seeds", nargs="*", type=int, default=None, help="seeds; none replays each routine as is")
+    parser.add_argument("--out", default="logs", help="output folder")
+    parser.add_argument("--days", type=int, default=1, help=f"days simulated by '{GENERATED_ROUTINE}' routines")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    results = run_batch(make_jobs(args.scenarios, args.routines, args.seeds or [None]), args.out, args.processes,
+                        args.days)
+    failed = [path for path, ok in results if not ok]
+    print(f"[LOG] {len(results) - len(failed)}/{len(results)} runs written to '{args.out}' "
+          f"in {time.monotonic() - started:.1f}s")
+    for path in failed:
+        print(f"[WARN] Run failed, see {os.path.join(path, 'console.txt')}")
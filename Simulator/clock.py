@@ -0,0 +1,96 @@
+import calendar
+import time
+from functools import lru_cache
+from datetime import datetime, timedelta
+
+SIMULATED_SECONDS_PER_TIMER_SECOND = 60  # TimerApp: one real (timer) second is one simulated minute
+AS_FAST_AS_POSSIBLE = None  # speed of a clock that only moves when the simulation advances it
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+# Simulated timestamps are whole seconds since 1970-01-01 00:00 of the simulated calendar (no time zone).
+def datetime_to_timestamp(dt):
+    return calendar.timegm(dt.timetuple())
+
+def timestamp_to_datetime(ts):
+    return _EPOCH + timedelta(seconds=int(ts))
+
+def format_timestamp(ts, fmt="%Y-%m-%d %H:%M"):
+    return timestamp_to_datetime(ts).strftime(fmt)
+
+# Timestamp of 00:00 of a "YYYY-MM-DD" date; cached, as the clocks ask for the same start date on every sample.
+@lru_cache(maxsize=64)
+def date_to_timestamp(date):
+    return datetime_to_timestamp(datetime.strptime(date, "%Y-%m-%d"))
+
+
+class VirtualClock:
+    """ Simulation clock independent of the wall clock, with the same interface as TimerApp.
+    speed is the number of simulated seconds per real second (TimerApp runs at 60); with
+    AS_FAST_AS_POSSIBLE the clock only moves when advance()/advance_to() are called. """
+
+    def __init__(self, start_hour="00:00", current_date=None, speed=AS_FAST_AS_POSSIBLE):
+        self.speed = speed
+        self.start_date = current_date or datetime.today().strftime("%Y-%m-%d")
+        start = datetime.strptime(start_hour, "%H:%M")
+        self.start_of_day = start.hour * 3600 + start.minute * 60  # seconds after midnight
+        self.is_running = False
+        self._simulated_seconds = 0.0
+        self._real_start = None
+
+    # Simulated seconds since the start of the simulation.
+    @property
+    def simulated_seconds(self):
+        if self.is_running and self.speed is not AS_FAST_AS_POSSIBLE:
+            return self._simulated_seconds + (time.monotonic() - self._real_start) * self.speed
+        return self._simulated_seconds
+
+    # Seconds on the timer (one per simulated minute), as TimerApp.elapsed_time: the detectors rely on it.
+    @property
+    def elapsed_time(self):
+        return timedelta(seconds=self.simulated_seconds / SIMULATED_SECONDS_PER_TIMER_SECOND)
+
+    def start_stop(self):
+        if self.is_running:
+            self._simulated_seconds = self.simulated_seconds
+            self.is_running = False
+        else:
+            self._real_start = time.monotonic()
+            self.is_running = True
+
+    # seconds on the timer, i.e. simulated minutes
+    def advance(self, seconds):
+        self.advance_simulated(seconds * SIMULATED_SECONDS_PER_TIMER_SECOND)
+
+    def advance_simulated(self, seconds):
+        self._simulated_seconds += seconds
+
+    # Bring the clock to simulated second t: instantly as fast as possible, otherwise sleeping in real time.
+    def advance_to(self, t):
+        delta = t - self.simulated_seconds
+        if delta <= 0:
+            return
+        if self.is_running and self.speed is not AS_FAST_AS_POSSIBLE:
+            time.sleep(delta / self.speed)
+        else:
+            self._simulated_seconds += delta
+
+    # Date of the simulated instant: it moves on at every midnight, so a run can span several days.
+    @property
+    def current_date(self):
+        return format_timestamp(self.get_simulated_timestamp(), "%Y-%m-%d")
+
+    # Simulated seconds since the start of the run at which the next simulated day begins.
+    def next_midnight(self):
+        return (self.simulated_seconds + self.start_of_day) // 86400 * 86400 + 86400 - self.start_of_day
+
+    def get_simulated_timestamp(self):
+        day_start = date_to_timestamp(self.start_date)
+        return day_start + int(self.start_of_day + self.simulated_seconds)
+
+    def get_simulated_datetime(self):
+        return timestamp_to_datetime(self.get_simulated_timestamp())
+
+    def get_simulated_time(self):
+        return self.get_simulated_datetime().strftime("%H:%M")
@@ -1,3 +1,4 @@
+from registry import update_sensor
 from utils import update_sensor_color
 
 sensor_states = {}
@@ -33,13 +34,7 @@ def changeSwitch(canvas, sensor, sensors, door_state):
 
     new_state = numeric_state
 
-    updated_sensors = []
-    for s in sensors:
-        if s == sensor:
-            updated_sensor = (name, x, y, type, min_val, max_val, step, new_state, direction, consumption, associated_device)
-            updated_sensors.append(updated_sensor)
-        else:
-            updated_sensors.append(s)
+    updated_sensors = update_sensor(sensors, sensor, state=new_state)
 
     update_sensor_color(canvas, name, new_state, float(min_val))
     return name, new_state, updated_sensors
@@ -1,19 +1,25 @@
+from bisect import bisect_right
+from collections import OrderedDict
+
+import numpy as np
+
+DICT_PROFILE_CACHE_SIZE = 64  # plain {minute: W} profiles kept compiled for consumption_step() and co.
+
+
 def interpolated_consumption(profile, minutes, standby):
-    keys = sorted(profile)
+    compiled = profile if isinstance(profile, CompiledProfile) else _compiled_dict(profile, standby)
+    keys, values = compiled.keys, compiled.values
     if not keys:
         return standby
     if minutes <= keys[0]:
-        return profile[keys[0]]
+        return values[0]
     elif minutes >= keys[-1]:
-        return profile[keys[-1]]
-    else:
-        for i in range(len(keys) - 1):
-            t1, t2 = keys[i], keys[i + 1]
-            if t1 <= minutes < t2:
-                c1, c2 = profile[t1], profile[t2]
-                factor = (minutes - t1) / (t2 - t1)
-                return c1 + (c2 - c1) * factor
-    return profile[keys[0]]
+        return values[-1]
+    i = bisect_right(keys, minutes) - 1
+    t1, t2 = keys[i], keys[i + 1]
+    c1, c2 = values[i], values[i + 1]
+    factor = (minutes - t1) / (t2 - t1)
+    return c1 + (c2 - c1) * factor
 
 # Profiles: keys are minutes from start; values are Watts; "standby" is the idle draw.
 consumption_profiles = {
@@ -104,53 +110,200 @@ consumption_profiles = {
 }
 
 
-def consumption_step(profile: dict, minutes: float, standby: float, repeat: bool = False, start_from_standby: bool = True) -> float:
+# Which device types should loop their profile (e.g., fridge cycles) versus run once.
+REPEAT_BY_TYPE = {
+    "Fridge": True,
+    "Washing_Machine": False,
+    "Dishwasher": False,
+    "Coffee_Machine": False,
+    "Oven": False,
+    "Computer": False
+}
 
-    if not profile:
-        return standby
-    keys = sorted(profile)
-    duration = keys[-1]
+# Device types that stay on at the end of their profile instead of switching off.
+CONTINUOUS_TYPES = {"Fridge", "Computer"}
+
+
+class CompiledProfile:
+    """ A consumption profile as sorted key/value tuples, with its length (last key), standby draw and the
+    repeat/continuous flags of its device type, so a lookup is one bisect on the keys. A program that is not
+    continuous draws its last step for one minute and is switched off at `end`, one minute after its last key.
+    Built once per device type by compiled_profile(); consumption_step() also takes a plain {minute: W} dict,
+    compiled on its first use. """
+
+    __slots__ = ("keys", "values", "standby", "duration", "end", "repeat", "continuous", "cumulative", "_key_array")
+
+    def __init__(self, profile, standby=0.0, repeat=False, continuous=False):
+        self.keys = tuple(sorted(profile))
+        self.values = tuple(profile[k] for k in self.keys)
+        self.standby = standby
+        self.duration = self.keys[-1] if self.keys else 0
+        # update_devices_consumption and DeviceBank switch a program off once past `duration`, at the next minute
+        self.end = self.duration + 1
+        self.repeat = repeat
+        self.continuous = continuous
+        # W·min drawn from the start of the cycle to each key
+        cumulative = [self.values[0] * self.keys[0]] if self.keys else []
+        for i in range(1, len(self.keys)):
+            cumulative.append(cumulative[-1] + self.values[i - 1] * (self.keys[i] - self.keys[i - 1]))
+        self.cumulative = tuple(cumulative)
+        self._key_array = np.array(self.keys, dtype=np.float64)
+
+    # Power `minutes` after the start of the cycle: the value of the last key reached, the first one before it.
+    def step(self, minutes):
+        keys = self.keys
+        if not keys:
+            return self.standby
+        t = minutes % self.duration if self.repeat and self.duration > 0 else minutes
+        i = bisect_right(keys, t) - 1
+        return self.values[max(i, 0)]
+
+    # Positions in `values` of the power step() draws at each of an array of minutes (the profile must have keys).
+    def indexes(self, minutes):
+        t = np.mod(minutes, self.duration) if self.repeat and self.duration > 0 else minutes
+        return np.maximum(np.searchsorted(self._key_array, t, side="right") - 1, 0)
+
+    # Wh drawn between `m0` and `m1` minutes after the start of the cycle, exactly as step() draws them: whole
+    # loops of a repeating profile at once, nothing after `end` for a device that is not continuous (the minute
+    # of its final step included).
+    def energy(self, m0, m1):
+        return (self._integral(m1) - self._integral(m0)) / 60.0
+
+    # W·min from the start of the cycle to `minutes` after it.
+    def _integral(self, minutes):
+        if minutes <= 0:
+            return 0.0
+        keys = self.keys
+        if not keys:
+            return self.standby * minutes
+        loops = 0
+        if self.repeat and self.duration > 0:
+            loops, minutes = divmod(minutes, self.duration)
+        elif not self.continuous:
+            minutes = min(minutes, self.end)
+        i = bisect_right(keys, minutes) - 1
+        within = self.values[0] * minutes if i < 0 else self.cumulative[i] + self.values[i] * (minutes - keys[i])
+        return loops * self.cumulative[-1] + within
+
+    # First key after `minutes`, None past the last one.
+    def next_key(self, minutes):
+        i = bisect_right(self.keys, minutes)
+        return self.keys[i] if i < len(self.keys) else None
+
+    # First power of the cycle (standby without a profile).
+    @property
+    def first(self):
+        return self.values[0] if self.values else self.standby
 
-    t = minutes % duration if repeat and duration > 0 else minutes
 
-    if t < keys[0]:
-        return profile[keys[0]]
+_compiled_profiles = {}  # device type -> CompiledProfile
+_dict_profiles = OrderedDict()  # (id of a {minute: W} dict, standby, repeat) -> (the dict, CompiledProfile)
+_trace_library = None  # traces.TraceLibrary used instead of the profiles, see use_trace_library()
+profiles_revision = 0  # changes when profile_for() may answer differently (profiles reset, trace library swapped)
 
-    last_key = keys[0]
-    for k in keys:
-        if t < k:
-            return profile[last_key]
-        last_key = k
-    return profile[keys[-1]] if repeat else profile[keys[-1]]
+# CompiledProfile of a device type, None if it has no profile. Built on first use: call
+# reset_compiled_profiles() after editing consumption_profiles, REPEAT_BY_TYPE or CONTINUOUS_TYPES.
+def compiled_profile(device_type):
+    compiled = _compiled_profiles.get(device_type)
+    if compiled is None:
+        profile = consumption_profiles.get(device_type)
+        if not profile:
+            return None
+        compiled = CompiledProfile(profile["profile"], profile["standby"], REPEAT_BY_TYPE.get(device_type, False),
+                                   device_type in CONTINUOUS_TYPES)
+        _compiled_profiles[device_type] = compiled
+    return compiled
+
+def reset_compiled_profiles():
+    global profiles_revision
+    _compiled_profiles.clear()
+    _dict_profiles.clear()
+    profiles_revision += 1
+
+# CompiledProfile of a plain {minute: W} dict, compiled once per dict: the last DICT_PROFILE_CACHE_SIZE used are
+# kept (with the dict, so its id is not reused meanwhile). Call reset_compiled_profiles() after editing one.
+def _compiled_dict(profile, standby, repeat=False):
+    key = (id(profile), standby, repeat)
+    entry = _dict_profiles.get(key)
+    if entry is None:
+        entry = (profile, CompiledProfile(profile, standby, repeat))
+        _dict_profiles[key] = entry
+        while len(_dict_profiles) > DICT_PROFILE_CACHE_SIZE:
+            _dict_profiles.popitem(last=False)
+    else:
+        _dict_profiles.move_to_end(key)
+    return entry[1]
+
+# Draw the devices from the recorded traces of a traces.TraceLibrary (None: back to the profiles above); the
+# device types without traces keep their profile.
+def use_trace_library(library):
+    global _trace_library, profiles_revision
+    _trace_library = library
+    profiles_revision += 1
+
+# Profile drawn by one device: its trace when a trace library is in use and has some for its type, the
+# CompiledProfile of its type otherwise. Both answer step(), indexes(), energy(), next_key() and first.
+# `step_seconds` asks for the trace at another resolution than the library's (nilm.py samples it at 1 s).
+def profile_for(device_name, device_type, step_seconds=None):
+    if _trace_library is not None:
+        trace = _trace_library.profile(device_name, device_type, step_seconds)
+        if trace is not None:
+            return trace
+    return compiled_profile(device_type)
+
+
+# A CompiledProfile brings its own standby and repeat flag.
+def consumption_step(profile, minutes: float, standby: float, repeat: bool = False) -> float:
+    if not isinstance(profile, CompiledProfile):
+        profile = _compiled_dict(profile, standby, repeat)
+    return profile.step(minutes)
 
 def get_device_consumption(device_name, device_type, current_timestamp, active_cycles, device_state=1):
     if device_state == 0:
         return 0.0
 
-    profile = consumption_profiles.get(device_type)
+    profile = profile_for(device_name, device_type)
     if not profile:
         return 0.0
 
-    standby = profile["standby"]
-    prof_det = profile["profile"]
-
-    # Which device types should loop their profile (e.g., fridge cycles) versus run once.
-    repeat_by_type = {
-        "Fridge": True,
-        "Washing_Machine": False,
-        "Dishwasher": False,
-        "Coffee_Machine": False,
-        "Oven": False,
-        "Computer": False
-    }
-
-    repeat = repeat_by_type.get(device_type, False)
-
     if device_name in active_cycles:
         start_time, _type = active_cycles[device_name]
         elapsed_min = (current_timestamp - start_time).total_seconds() / 60.0
-        return consumption_step(prof_det, elapsed_min, standby, repeat=repeat, start_from_standby=True)
+        return profile.step(elapsed_min)
     else:
         # device turned on but cycle not recorded: start immediately from t=0 (no standby)
-        keys = sorted(prof_det)
-        return prof_det[keys[0]] if keys else standby
+        return profile.first
+
+# Wh drawn between the datetimes t0 and t1 by a device of `device_type` whose cycle started at `start` and, if it
+# was switched off, ended at `end`: the closed form of get_device_consumption over the range, 0 outside the cycle.
+# `device_name` selects the trace of the device when a trace library is in use.
+def energy_between(device_type, start, t0, t1, end=None, device_name=None):
+    profile = profile_for(device_name, device_type)
+    if not profile:
+        return 0.0
+    if end is not None:
+        t1 = min(t1, end)
+    if t1 <= t0:
+        return 0.0
+    return profile.energy((t0 - start).total_seconds() / 60.0, (t1 - start).total_seconds() / 60.0)
+
+# Minutes from elapsed_min (since the cycle start) to the next change of the consumption,
+# including the automatic switch-off of non-continuous devices; None if it will not change anymore.
+def minutes_to_next_change(device_type, elapsed_min, device_name=None):
+    profile = profile_for(device_name, device_type)
+    if not profile or not len(profile.keys):
+        return None
+    duration = profile.duration
+
+    if profile.repeat and duration > 0:
+        t = elapsed_min % duration
+        key = profile.next_key(t)
+        return (key if key is not None else duration) - t
+
+    key = profile.next_key(elapsed_min)
+    if key is not None:
+        return key - elapsed_min
+    if not profile.continuous:
+        # update_devices_consumption switches the device off once elapsed_min > duration
+        return max(duration + 1 - elapsed_min, 1)
+    return None
@@ -0,0 +1,117 @@
+import tkinter as tk
+from tkinter import simpledialog, messagebox
+from tkinter import ttk
+
+from device import devices, get_device_params
+from read import read_devices as devices_file
+from read import read_sensors as sensors_file
+from sensor import sensors, get_sensor_params
+
+# Dialogs of the scenario editor, kept out of sensor.py and device.py so the engine imports without tkinter.
+
+
+class SensorDialog(simpledialog.Dialog):
+    def body(self, master):
+        tk.Label(master, text="Sensor name:").grid(row=0)
+        tk.Label(master, text="Sensor type:").grid(row=1)
+        self.sensor_name = tk.Entry(master)
+        self.sensor_name.grid(row=0, column=1)
+        self.sensor_type = ttk.Combobox(master, values=["PIR", "Temperature", "Switch", "Smart Meter", "Weight"])
+        self.sensor_type.grid(row=1, column=1)
+        self.sensor_type.current(0)
+        self.direction_label = tk.Label(master, text="Direction (degrees):")
+        self.direction_entry = tk.Entry(master)
+        self.associated_device_label = tk.Label(master, text="Associated device:")
+
+        # Merge runtime + devices loaded from files (without duplicates)
+        devices_names_runtime = [d[0] for d in devices] if devices else []
+        devices_names_file = [d[0] for d in devices_file] if devices_file else []
+        devices_names = sorted(set(devices_names_runtime + devices_names_file))
+
+        self.associated_device_combobox = ttk.Combobox(master, values=devices_names)
+        self.sensor_type.bind("<<ComboboxSelected>>", self.on_sensor_type_selected)
+        return self.sensor_name
+
+    # Show 'direction' for PIR or 'associated device' for Smart Meter only.
+    def on_sensor_type_selected(self, event):
+        type = self.sensor_type.get()
+        if type == "PIR":
+            self.direction_label.grid(row=2, column=0)
+            self.direction_entry.grid(row=2, column=1)
+            self.associated_device_label.grid_remove()
+            self.associated_device_combobox.grid_remove()
+        elif type == "Smart Meter":
+            self.direction_label.grid_remove()
+            self.direction_entry.grid_remove()
+            self.associated_device_label.grid(row=2, column=0)
+            self.associated_device_combobox.grid(row=2, column=1)
+            if self.associated_device_combobox['values']:
+                self.associated_device_combobox.current(0)
+        else:
+            self.direction_label.grid_remove()
+            self.direction_entry.grid_remove()
+            self.associated_device_label.grid_remove()
+            self.associated_device_combobox.grid_remove()
+
+    # Check for empty/duplicate name; require direction (PIR) or device (Smart Meter).
+    def validate(self):
+        name = self.sensor_name.get().strip()
+        if not name:
+            messagebox.showwarning("Input not valid", "Sensor name cannot be empty.")
+            return False
+        for s in sensors + sensors_file:
+            if name == s[0]:
+                messagebox.showwarning("Input not valid", "Sensor name already exists.")
+                return False
+        if self.sensor_type.get() == "PIR" and not self.direction_entry.get().strip():
+            messagebox.showwarning("Input not valid", "Pir sensor direction cannot be empty.")
+            return False
+        if self.sensor_type.get() == "Smart Meter" and not self.associated_device_combobox.get():
+            messagebox.showwarning("Input not valid", "Select a device to associate with the Smart Meter.")
+            return False
+        return True
+
+    def apply(self):
+        name = self.sensor_name.get()
+        type = self.sensor_type.get()
+        params = get_sensor_params(type)
+        if type == "PIR":
+            direction = float(self.direction_entry.get())
+            params["direction"] = direction
+        associated_device = self.associated_device_combobox.get() if type == "Smart Meter" else None
+        self.result = (name, type, params["min"], params["max"], params["step"],
+                       params["state"], params.get("direction", None), params["consumption"], associated_device)
+
+
+class DeviceDialog(simpledialog.Dialog):
+    def body(self, master):
+        tk.Label(master, text="Device name:").grid(row=0)
+        tk.Label(master, text="Device type:").grid(row=1)
+        self.device_name = tk.Entry(master)
+        self.device_name.grid(row=0, column=1)
+        self.device_type = ttk.Combobox(master, values=[
+            "Fridge", "Washing_Machine", "Oven", "Coffee_Machine", "Computer", "Dishwasher"])
+        self.device_type.grid(row=1, column=1)
+        self.device_type.current(0)
+        return self.device_name
+
+    def validate(self):
+        name = self.device_name.get().strip()
+        if not name:
+            messagebox.showwarning("Input not valid", "Device name cannot be empty.")
+            return False
+        # avoid duplicates by considering both runtimes and file uploads
+        for d in devices + devices_file:
+            if name == d[0]:
+                messagebox.showwarning("Input not valid", "Device name already present.")
+                return False
+        return True
+
+    def apply(self):
+        name = self.device_name.get()
+        type = self.device_type.get()
+        params = get_device_params(type)
+        power = params["power"]
+        min_consumption = params["min_consumption"]
+        max_consumption = params["max_consumption"]
+        self.result = (name, type, power, min_consumption, max_consumption)
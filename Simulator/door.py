@@ -1,8 +1,12 @@
-import tkinter as tk
+try:
+    import tkinter as tk
+except ImportError:  # headless runs (engine.py) never open the door window
+    tk = None
 from point import points
+from geometry import DoorList
 from read import coordinates, read_doors
 
-doors = []
+doors = DoorList()
 
 def draw_line_door(canvas, window, load_active):
     global doors
@@ -0,0 +1,46 @@
+from consumption_profiles import energy_between
+
+
+class EnergyLedger:
+    """ Cycles of the devices (start, end, type), recorded by the engine when a device is switched on or off.
+    The energy of a device over any time range is the sum of the closed-form integrals of its profile over the
+    part of each cycle inside the range (consumption_profiles.energy_between), with no sampling. A program
+    switched off automatically ends at the first update past the end of its profile, which the engine records;
+    until then the integral stops by itself at the profile's `end`, after the minute of its final step. """
+
+    def __init__(self):
+        self._cycles = {}  # device name -> [[start, end or None, type], ...]
+
+    def started(self, name, when, device_type):
+        cycles = self._cycles.setdefault(name, [])
+        if cycles and cycles[-1][1] is None:
+            cycles[-1][1] = when
+        cycles.append([when, None, device_type])
+
+    def stopped(self, name, when):
+        cycles = self._cycles.get(name)
+        if cycles and cycles[-1][1] is None:
+            cycles[-1][1] = when
+
+    # [(start, end or None, type), ...] of the device `name`, oldest first.
+    def cycles(self, name):
+        return [tuple(c) for c in self._cycles.get(name, ())]
+
+    # Wh drawn by the device `name` between the datetimes t0 and t1.
+    def energy(self, name, t0, t1):
+        return sum(energy_between(type, start, t0, t1, end, name)
+                   for start, end, type in self._cycles.get(name, ()) if start < t1 and (end is None or end > t0))
+
+    # [(device, type, Wh), ...] of the devices that ran between t0 and t1, in the order they were first seen.
+    def report(self, t0, t1):
+        rows = []
+        for name, cycles in self._cycles.items():
+            wh = self.energy(name, t0, t1)
+            if wh:
+                rows.append((name, cycles[-1][2], wh))
+        return rows
+
+    # Drop the cycles over before `when` (e.g. the previous days of a long run).
+    def forget_before(self, when):
+        for name, cycles in self._cycles.items():
+            self._cycles[name] = [c for c in cycles if c[1] is None or c[1] > when]
@@ -0,0 +1,706 @@
+import math
+from datetime import timedelta
+
+import numpy as np
+
+from activity import (detect_activities, update_activity_state, close_current_activity, current_activities,
+                      pending_activity_deadlines, minutes_to_next_meal_boundary, sensor_history_trimmed)
+from associations import Associations
+from clock import VirtualClock, timestamp_to_datetime, format_timestamp, SIMULATED_SECONDS_PER_TIMER_SECOND
+from common import changeSwitch
+from consumption_profiles import minutes_to_next_change
+from door import point_in_line, toggle_door_state
+from energy import EnergyLedger
+from geometry import WallCoordinates, DoorList
+from metering import DeviceBank
+from read import parse_scenario_file, resolve_walls_coordinates
+from registry import SensorRegistry, DeviceRegistry, update_sensor
+from residents import Resident, sense, pir_holders
+from scheduler import EventScheduler
+from timeseries import SensorSeries
+from navigation import NavigationGrid
+from trajectory import walk_route, changes, SAMPLES_PER_SECOND
+from visibility import FovCache, VisibilityRaster, NO_SENSOR
+from sensor import changePIR, changeTemperature, changeSmartMeter, ChangeWeight
+from utils import find_closest_sensor_without_intersection, calculate_distance
+
+MAX_DISTANCE = 230
+FOV_ANGLE = 60
+DOOR_TOLERANCE = 5  # px distance of a click from a door segment that toggles it
+DEVICE_TOLERANCE = 5  # px distance of a click from a device that toggles it
+WEIGHT_DISTANCE = 10  # px distance of a click from a Weight sensor that activates it
+SMART_METER_THRESHOLD_W = 1.0
+
+PER_SECOND_SENSOR_SAMPLING = True
+PER_SECOND_SENSOR_TYPES = {"PIR", "Switch", "Weight"}
+
+
+class SimulationObserver:
+    """ Receives the engine notifications. The GUI subclasses it to repaint the canvas and log.InteractionLog
+    writes the interaction rows; headless runs attach only the ones they need. """
+
+    def sensor_changed(self, name, state, min_val):
+        pass
+
+    def device_changed(self, name, state):
+        pass
+
+    def doors_changed(self, doors):
+        pass
+
+    def avatar_moved(self, x, y):
+        pass
+
+    # Any resident moved (see SimulationEngine.add_resident); avatar_moved is also sent for the first one.
+    def resident_moved(self, name, x, y):
+        pass
+
+    # Positions of a walk between two clicks (see SimulationEngine.walk_speed), in bulk: simulated seconds and
+    # whole-pixel x, y arrays.
+    def avatar_walked(self, times, xs, ys):
+        pass
+
+    def activities_changed(self, activities):
+        pass
+
+    # One row of the interaction log (moves, sensor and device events), see log.InteractionLog.
+    def interaction(self, timestamp_sim, event_type, subject, name, x, y, value, extra):
+        pass
+
+
+class SimulationEngine:
+    """ Scenario, sensor/device state and clock of one simulation, with no dependency on a canvas.
+    The scenario lists are updated in place, so the GUI can hand over its own lists and keep using them.
+    Sensors and devices are kept in a SensorRegistry / DeviceRegistry, walls and doors on the occlusion grid of
+    geometry.py (a plain list is copied into one). """
+
+    def __init__(self, points=None, walls_coordinates=None, sensors=None, devices=None, doors=None,
+                 clock=None, sensor_states=None, active_cycles=None):
+        self.points = points if points is not None else []
+        self.walls_coordinates = (walls_coordinates if isinstance(walls_coordinates, WallCoordinates)
+                                  else WallCoordinates(walls_coordinates or []))
+        self.sensors = sensors if isinstance(sensors, SensorRegistry) else SensorRegistry(sensors or [])
+        self.devices = devices if isinstance(devices, DeviceRegistry) else DeviceRegistry(devices or [])
+        self.doors = doors if isinstance(doors, DoorList) else DoorList(doors or [])
+        self.clock = clock if clock is not None else VirtualClock()
+        self.sensor_states = sensor_states if sensor_states is not None else {}
+        self.active_cycles = active_cycles if active_cycles is not None else {}
+        # device cycles switched on and off, for energy_between()
+        self.energy = EnergyLedger()
+        # consumption of all the devices and Smart Meter readings, one batch per tick
+        self.device_bank = DeviceBank(self.devices)
+
+        # Switches of each door, Weight sensors of beds and table, Ovens of each Temperature sensor
+        self.associations = Associations(self.points, self.sensors, self.devices, self.doors)
+        # closest visible PIR per point (detectors, off-raster clicks), re-resolved only when a door it sees toggles
+        self.fov_cache = FovCache(self.sensors, self.walls_coordinates, self.doors)
+        # closest visible PIR per pixel: prepared per layout, combined per door configuration
+        self.visibility = VisibilityRaster(self.sensors, self.walls_coordinates, self.doors, MAX_DISTANCE, FOV_ANGLE,
+                                           self.fov_cache)
+
+        self.observers = []
+        # occupants, the first one is the avatar of the GUI; see add_resident()
+        self.residents = [Resident("user")]
+        self._move_batches = {}  # time -> (event, [(resident, x, y), ...]) of the moves scheduled together
+        self._weight_holders = {}  # Weight sensor -> names of the residents standing on it
+        self.last_temp_elapsed = None
+        # walking between clicks: px per simulated second (None teleports the avatar, only the click point is seen
+        # by the PIRs) and positions sampled per simulated second
+        self.walk_speed = None
+        self.trajectory_rate = SAMPLES_PER_SECOND
+        # routes around walls and through open doors for the walks, grid built on the first one
+        self.navigation = NavigationGrid(self.walls_coordinates, self.doors)
+
+        self.scheduler = EventScheduler()
+        self._wakeups = set()
+        self.events_processed = 0
+        self._drained = {}  # samples per sensor already returned by drain_sensor_states()
+
+    @classmethod
+    def from_file(cls, file_path, clock=None):
+        points, walls, sensors, devices, doors = parse_scenario_file(file_path)
+        walls_coordinates = resolve_walls_coordinates(walls, points)
+        engine = cls(points=points, walls_coordinates=walls_coordinates, sensors=sensors, devices=devices,
+                     doors=doors, clock=clock)
+        engine.visibility.rebuild()
+        return engine
+
+    # ---- observers ----
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        if observer in self.observers:
+            self.observers.remove(observer)
+
+    # Observers only need the notifications they handle (log.InteractionLog only takes `interaction`).
+    def _notify(self, event, *args):
+        for observer in self.observers:
+            handler = getattr(observer, event, None)
+            if handler is not None:
+                handler(*args)
+
+    # ---- interaction log rows (written by the attached log.InteractionLog, if any) ----
+
+    def _log_move(self, timestamp, x, y, subject="user"):
+        self._notify("interaction", timestamp, "move", subject, "", int(x), int(y), "", "")
+
+    def _log_sensor_event(self, timestamp, name, sensor_type, x, y, value, extra=""):
+        self._notify("interaction", timestamp, "sensor", sensor_type, name, int(x), int(y), value, extra)
+
+    def _log_device_event(self, timestamp, name, dev_type, x, y, state, extra=""):
+        self._notify("interaction", timestamp, "device", dev_type, name, int(x), int(y), state, extra)
+
+    # ---- clock ----
+
+    def timestamp(self):
+        return f"{self.clock.current_date} {self.clock.get_simulated_time()}"
+
+    def current_datetime(self):
+        return timestamp_to_datetime(self.clock.get_simulated_timestamp())
+
+    def start(self):
+        if not self.clock.is_running:
+            self.clock.start_stop()
+
+    def stop(self):
+        if self.clock.is_running:
+            self.clock.start_stop()
+        close_current_activity(self.clock)
+
+    # Advance the clock one timer second at a time, updating sensors and activities after each step.
+    def run(self, seconds, step=1):
+        if not self.clock.is_running:
+            self.start()
+        elapsed = 0
+        while elapsed < seconds:
+            self.clock.advance(step)
+            elapsed += step
+            self.tick()
+            self.update_activities()
+
+    # ---- event-driven run ----
+
+    # Simulated seconds since the start of the run.
+    def now(self):
+        return self.clock.simulated_seconds
+
+    # Moves of several residents scheduled at the same time are applied together, in one move_residents() call;
+    # they share the returned event.
+    def schedule_move(self, t, x, y, resident=0):
+        if len(self.residents) == 1:
+            return self.scheduler.schedule(t, "move", self.move_to, x, y)
+        batch = self._move_batches.get(t)
+        if batch is None:
+            batch = self._move_batches[t] = (self.scheduler.schedule(t, "moves", self._run_move_batch, t), [])
+        batch[1].append((resident, x, y))
+        return batch[0]
+
+    def _run_move_batch(self, t):
+        _, moves = self._move_batches.pop(t)
+        self.move_residents(moves)
+
+    def schedule_device_toggle(self, t, x, y):
+        return self.scheduler.schedule(t, "device", self.toggle_device_at, x, y)
+
+    def schedule_door_toggle(self, t, index):
+        return self.scheduler.schedule(t, "door", self.toggle_door, index)
+
+    # Re-evaluate the scenario at t even if nothing is scheduled then (profile step, detector timeout...).
+    # Callers round t to whole seconds where they can, so repeated requests for the same instant collapse.
+    def schedule_wakeup(self, t):
+        if t <= self.now() or t in self._wakeups:
+            return
+        self._wakeups.add(t)
+        self.scheduler.schedule(t, "wakeup")
+
+    # Jump from one pending event to the next until simulated second t_end, evaluating sensors, devices and
+    # activities only at those instants. Idle stretches cost nothing beyond the wakeups they really need.
+    # With inclusive=False the run stops before the events at t_end itself and the clock stays on the last instant
+    # evaluated, for a caller that opens a new period at t_end (run_days at midnight).
+    def run_until(self, t_end, inclusive=True):
+        self.start()
+        if self.last_temp_elapsed is None:
+            self._evaluate()
+        while True:
+            t = self.scheduler.peek_time()
+            if t is None or t > t_end or (t == t_end and not inclusive):
+                break
+            self.clock.advance_to(t)
+            # events at the same instant are applied together before a single evaluation
+            while self.scheduler.peek_time() == t:
+                event = self.scheduler.pop()
+                if event.kind == "wakeup":
+                    self._wakeups.discard(event.time)
+                if event.callback is not None:
+                    event.callback(*event.args)
+                self.events_processed += 1
+            self._evaluate()
+        if inclusive:
+            self.clock.advance_to(t_end)
+            self._evaluate()
+
+    def _evaluate(self):
+        self._update(event_driven=True)
+        self.update_activities()
+        self._schedule_wakeups()
+
+    def _schedule_wakeups(self):
+        now = self.now()
+
+        # Temperature keeps moving one timer second at a time until it reaches its bound
+        for sensor in self.sensors.of_type("Temperature"):
+            if self._temperature_moving(sensor, 1 if self._oven_near(sensor) else 0):
+                next_step = self.last_temp_elapsed.total_seconds() + 1
+                self.schedule_wakeup(next_step * SIMULATED_SECONDS_PER_TIMER_SECOND)
+                break
+
+        # Next step of the consumption profile of every running device
+        current_datetime = self.current_datetime()
+        for device in self.devices:
+            if device[5] == 1 and device[0] in self.active_cycles:
+                start_time, cycle_type = self.active_cycles[device[0]]
+                elapsed_min = (current_datetime - start_time).total_seconds() / 60.0
+                minutes = minutes_to_next_change(cycle_type, elapsed_min, device[0])
+                if minutes is not None:
+                    self.schedule_wakeup(math.ceil(now + minutes * 60))
+
+        # Detector windows and meal slots (slots start on the minute: count from the start of this one)
+        for deadline in pending_activity_deadlines():
+            self.schedule_wakeup(deadline.total_seconds() * SIMULATED_SECONDS_PER_TIMER_SECOND)
+        minute_start = int(now) - self.clock.get_simulated_timestamp() % 60
+        self.schedule_wakeup(minute_start + minutes_to_next_meal_boundary(self.clock.get_simulated_time()) * 60)
+
+    # ---- sensor bookkeeping ----
+
+    def _series(self, name, type, binary=False, associated_device=None):
+        series = self.sensor_states.get(name)
+        if series is None:
+            series = SensorSeries(type, binary=binary, consumption=type == "Smart Meter",
+                                  associated_device=associated_device)
+            self.sensor_states[name] = series
+        return series
+
+    # Samples are kept per simulated minute, as the timestamps of the interaction log (`ts`: simulated timestamp,
+    # now by default).
+    def _sample_time(self, ts=None):
+        if ts is None:
+            ts = self.clock.get_simulated_timestamp()
+        return ts - ts % 60
+
+    # Binary state (0/1) with dedup on timestamp:
+    # same ts and same value -> nothing to add, same ts but different value -> append (preserve edge 0<->1)
+    # `ts` backdates the sample (e.g. a PIR passed on a walk), never before the last one of the sensor.
+    def _append_binary(self, name, type, state_val, ts=None):
+        series = self._series(name, type, binary=True)
+        s = 1 if int(round(float(state_val))) else 0
+        t = self._sample_time(ts)
+        if series.last_time is not None and t < series.last_time:
+            t = series.last_time
+        if series.last_time == t and series.last_state == s:
+            return
+        series.append(t, s)
+
+    # Numeric sample that overwrites the previous one when it falls in the same timestamp.
+    def _append_sample(self, series, state_val, consumption_val=None):
+        state_float = float(round(float(state_val), 2))
+        consumption = None if consumption_val is None else float(round(float(consumption_val), 2))
+        t = self._sample_time()
+        if series.last_time == t:
+            series.replace_last(state_float, consumption)
+        else:
+            series.append(t, state_float, consumption)
+
+    # Samples recorded since the previous call, one (sensor, type, times, states, consumption) block of columns
+    # per sensor (see SensorSeries.columns). Each history is cut down to its last sample, which is all the
+    # detectors look at, so memory stays flat on long runs.
+    def drain_sensor_states(self):
+        blocks = []
+        for name, series in self.sensor_states.items():
+            start = self._drained.get(name, 0)
+            if start < len(series):
+                blocks.append((name, series.type, *series.columns(start)))
+            removed = series.trim()
+            if removed:
+                sensor_history_trimmed(name, removed)
+            self._drained[name] = len(series)
+        return blocks
+
+    def _set_pir(self, sensor, state):
+        # changePIR also resets every other PIR, so repaint all of them
+        name, new_state, _ = changePIR(None, sensor, self.sensors, state)
+        for s in self.sensors.of_type("PIR"):
+            self._notify("sensor_changed", s[0], s[7], s[4])
+        return name, new_state
+
+    # ---- residents ----
+
+    # Add an occupant with its own position and moves (move_to / schedule_move with its index), logged as `name`
+    # (user2, user3, ... by default). Returns its index.
+    def add_resident(self, name=None):
+        name = name or f"user{len(self.residents) + 1}"
+        if any(r.name == name for r in self.residents):
+            raise ValueError(f"Resident '{name}' already exists.")
+        self.residents.append(Resident(name))
+        return len(self.residents) - 1
+
+    # PIRs seeing the avatar (the first resident).
+    @property
+    def active_pir_sensors(self):
+        return self.residents[0].active_pir_sensors
+
+    @active_pir_sensors.setter
+    def active_pir_sensors(self, sensors):
+        self.residents[0].active_pir_sensors = sensors
+
+    @property
+    def avatar_position(self):
+        return self.residents[0].position
+
+    @avatar_position.setter
+    def avatar_position(self, position):
+        self.residents[0].position = position
+
+    # ---- interaction ----
+
+    # A move with no sensors in the scenario only moves the avatar.
+    def _has_sensors(self):
+        if not self.sensors:
+            print("No sensors exists.")
+            return False
+        return True
+
+    # Same logic as a click in the GUI: move the avatar, pick the closest PIR in FOV, fallback actions, logging.
+    # With several residents, `resident` is the one moving and the click goes through move_residents().
+    def move_to(self, x, y, resident=0):
+        if len(self.residents) > 1:
+            self.move_residents([(resident, x, y)])
+            return
+        timestamp = self.timestamp()
+        if self.walk_speed and self.avatar_position is not None and self.sensors:
+            self._walk(self.avatar_position, (x, y))
+        self._log_move(timestamp, int(x), int(y))
+        self.avatar_position = (x, y)
+        self._notify("avatar_moved", x, y)
+
+        if not self._has_sensors():
+            return
+
+        # PIR: Find the closest one in the FOV first and without walls/blocks
+        closest_sensor_pir = self.visibility.closest(x, y)
+        self._activate_pir(closest_sensor_pir, timestamp, "closest_in_fov")
+
+        if closest_sensor_pir:
+            self.toggle_device_at(x, y)
+        else:
+            # If no valid PIR, the click still reaches a device if any sensor is in sight
+            if find_closest_sensor_without_intersection((x, y), self.sensors, self.walls_coordinates):
+                self.toggle_device_at(x, y)
+
+        # Weight: activate sensor if clicked close otherwise turn off
+        for sensor in self.sensors.of_type("Weight"):
+            sx, sy = sensor[1], sensor[2]
+            active = 1 if calculate_distance(x, y, sx, sy) < WEIGHT_DISTANCE else 0
+            name, state, _ = ChangeWeight(None, sensor, self.sensors, active)
+            self._notify("sensor_changed", name, state, sensor[4])
+            self._append_binary(name, 'Weight', state)
+            self._log_sensor_event(timestamp, name, "Weight", int(sx), int(sy), active,
+                                   "click_nearby" if active else "auto_off")
+
+        # Doors + Switch
+        self.toggle_door_at(x, y)
+        self.sync_door_switches(timestamp)
+
+    # Moves [(resident, x, y), ...] of several residents at the same instant. The sensors are evaluated once for
+    # all the residents (sense(): one raster gather for the PIRs, one residents x Weights distance matrix): a PIR
+    # stays on while it is the closest in sight of any resident and a Weight while anyone stands on it, so the
+    # single-occupant reset of changePIR is not used. Sensor events carry the resident name after the reason
+    # ("closest_in_fov:user2"). The residents jump to their click: walk_speed only applies to a single resident.
+    def move_residents(self, moves):
+        timestamp = self.timestamp()
+        for k, x, y in moves:
+            resident = self.residents[k]
+            self._log_move(timestamp, int(x), int(y), resident.name)
+            resident.position = (x, y)
+            self._notify("resident_moved", resident.name, x, y)
+            if k == 0:
+                self._notify("avatar_moved", x, y)
+
+        if not self._has_sensors():
+            return
+
+        placed = [r for r in self.residents if r.position is not None]
+        weights = self.sensors.of_type("Weight")
+        pirs, on_weights = sense([r.position[0] for r in placed], [r.position[1] for r in placed],
+                                 self.visibility, weights, WEIGHT_DISTANCE)
+
+        # PIR: off when no resident sees it any more, on for the residents that moved
+        candidates = self.visibility.candidates
+        holders = pir_holders(placed, pirs)
+        seen = {candidates[i][0] for i in holders}
+        moved = {k for k, _, _ in moves}
+        switched_off = set()
+        for k, resident in enumerate(self.residents):
+            if k not in moved:
+                continue
+            index = pirs[placed.index(resident)]
+            closest_sensor_pir = None if index == NO_SENSOR else candidates[index]
+            for sensor in resident.active_pir_sensors:
+                if sensor[0] in seen or sensor[0] in switched_off:
+                    continue
+                switched_off.add(sensor[0])
+                self._set_resident_pir(sensor, 0, timestamp, f"auto-off-prev:{resident.name}")
+            resident.active_pir_sensors = []
+            if closest_sensor_pir:
+                self._set_resident_pir(closest_sensor_pir, 1, timestamp, f"closest_in_fov:{resident.name}")
+                resident.active_pir_sensors.append(closest_sensor_pir)
+
+        # Weight: logged when it goes on or off, with the residents standing on it (or who just left it)
+        for j, sensor in enumerate(weights):
+            names = tuple(r.name for r, on in zip(placed, on_weights[:, j].tolist()) if on)
+            previous = self._weight_holders.get(sensor[0], ())
+            self._weight_holders[sensor[0]] = names
+            active = 1 if names else 0
+            if active == (1 if int(round(float(sensor[7]))) else 0):
+                continue
+            name, state, _ = ChangeWeight(None, sensor, self.sensors, active)
+            self._notify("sensor_changed", name, state, sensor[4])
+            self._append_binary(name, 'Weight', state)
+            self._log_sensor_event(timestamp, name, "Weight", int(sensor[1]), int(sensor[2]), active,
+                                   f"click_nearby:{'+'.join(names)}" if active else f"auto_off:{'+'.join(previous)}")
+
+        # devices and doors under each click, then the Switches once
+        for k, x, y in moves:
+            index = pirs[placed.index(self.residents[k])]
+            if index != NO_SENSOR or find_closest_sensor_without_intersection((x, y), self.sensors,
+                                                                             self.walls_coordinates):
+                self.toggle_device_at(x, y)
+            self.toggle_door_at(x, y)
+        self.sync_door_switches(timestamp)
+
+    def _set_resident_pir(self, sensor, state, timestamp, reason):
+        update_sensor(self.sensors, sensor, state=state)
+        self._notify("sensor_changed", sensor[0], state, sensor[4])
+        self._append_binary(sensor[0], 'PIR', state)
+        self._log_sensor_event(timestamp, sensor[0], "PIR", int(sensor[1]), int(sensor[2]), state, reason)
+
+    # The PIR in sight becomes the only active one (None: no PIR sees the avatar, all of them go off).
+    # `ts`: simulated timestamp of the samples, now by default (see _append_binary).
+    def _activate_pir(self, closest_sensor_pir, timestamp, reason, ts=None):
+        # turn off previous active PIRs, but NOT the one you are about to activate
+        for sensor in self.active_pir_sensors:
+            if closest_sensor_pir and sensor[0] == closest_sensor_pir[0]:
+                continue
+            name, state = self._set_pir(sensor, 0)
+            self._append_binary(name, 'PIR', state, ts)
+            self._log_sensor_event(timestamp, name, "PIR", int(sensor[1]), int(sensor[2]), 0, "auto-off-prev")
+
+        self.active_pir_sensors = []
+
+        if closest_sensor_pir:
+            # force ON (1) without toggle to avoid 0->1 in the same minute
+            name, state = self._set_pir(closest_sensor_pir, 1)
+            self._append_binary(name, 'PIR', state, ts)
+            self.active_pir_sensors.append(closest_sensor_pir)
+            self._log_sensor_event(timestamp, name, "PIR", int(closest_sensor_pir[1]), int(closest_sensor_pir[2]), 1,
+                                   reason)
+
+    # Walk from `start` to the click along the navigation route, arriving now: every PIR in sight along the way goes
+    # on as the avatar passes, in order, at the time it gets there. All the positions are evaluated at once on the
+    # visibility raster; the PIR in sight at the click is left to move_to. When the closed doors leave no route the
+    # avatar does not walk (no PIR is swept through the walls) and jumps to the click.
+    def _walk(self, start, end):
+        waypoints = self.navigation.route(start, end)
+        if not waypoints:
+            return
+        times, xs, ys = walk_route(waypoints, self.walk_speed, self.trajectory_rate)
+        ago = times[-1] - times  # simulated seconds from each position to the click
+        self._notify("avatar_walked", self.now() - ago, xs, ys)
+        candidates = self.visibility.candidates
+        # starting from the PIR active now, each change of the PIR in sight along the way; the last one is the PIR
+        # in sight at the click
+        active = next((i for i, s in enumerate(candidates) for a in self.active_pir_sensors if s is a), NO_SENSOR)
+        indexes = np.concatenate(([active], self.visibility.indexes_along(xs, ys)))
+        now = self.clock.get_simulated_timestamp()
+        for i in changes(indexes)[1:-1]:
+            sensor = None if indexes[i] == NO_SENSOR else candidates[indexes[i]]
+            ts = now - int(math.ceil(ago[i - 1]))
+            self._activate_pir(sensor, format_timestamp(ts), "swept_path", ts)
+
+    def toggle_door_at(self, x, y):
+        for index, door in enumerate(self.doors):
+            x1, y1, x2, y2, state = door
+            if point_in_line(x, y, x1, y1, x2, y2, DOOR_TOLERANCE):
+                self.toggle_door(index, sync_switches=False)
+                return True
+        return False
+
+    # Door toggled directly (e.g. by a scheduled event); the Switch sensors next to the doors follow it.
+    def toggle_door(self, index, sync_switches=True):
+        toggle_door_state(index, self.doors)
+        self._notify("doors_changed", self.doors)
+        if sync_switches:
+            self.sync_door_switches(self.timestamp())
+
+    def sync_door_switches(self, timestamp):
+        for door, associated_sensors, door_state in self.associations.switches_by_doors():
+            for sensor in associated_sensors:
+                sw_name, sw_state, _ = changeSwitch(None, sensor, self.sensors, door_state)
+                self._notify("sensor_changed", sw_name, sw_state, sensor[4])
+                self._append_binary(sw_name, 'Switch', int(sw_state))
+                self._log_sensor_event(timestamp, sw_name, "Switch", int(sensor[1]), int(sensor[2]), int(sw_state),
+                                       f"sync_with_door:{door[0]}")
+
+    # Toggle the device under (x, y), if any, and refresh the Temperature sensors affected by ovens.
+    def toggle_device_at(self, x, y):
+        current_timestamp = self.timestamp()
+        simulation_datetime = self.current_datetime()
+
+        i = self.devices.index_at(x, y, DEVICE_TOLERANCE)
+        if i is None:
+            return False
+        dev_name, dx, dy, type, power, dev_state, min_c, max_c, current_cons, cons_dir = self.devices[i]
+        new_state = 0 if dev_state == 1 else 1
+
+        if new_state == 1:
+            current_cons = min_c
+            cons_dir = 1
+            self.active_cycles[dev_name] = (simulation_datetime, type)
+            self.energy.started(dev_name, simulation_datetime, type)
+        else:
+            if type != "Fridge" and dev_name in self.active_cycles:
+                del self.active_cycles[dev_name]
+            self.energy.stopped(dev_name, simulation_datetime)
+            # Do not change current_cons for Fridge: continue the descent
+
+        self.devices[i] = (dev_name, dx, dy, type, power, new_state, min_c, max_c, current_cons, cons_dir)
+        self._notify("device_changed", dev_name, new_state)
+        self._log_device_event(current_timestamp, dev_name, type, int(dx), int(dy), int(new_state),
+                               "user_toggle_at_click")
+
+        for sensor in self.sensors.of_type("Temperature"):
+            heating_factor = 1 if self._oven_near(sensor) else 0
+            self._update_temperature(sensor, heating_factor, 1.0)
+        return True
+
+    # Wh drawn by the device `name` between the datetimes t0 and t1, integrated in closed form over its cycles.
+    def energy_between(self, name, t0, t1):
+        return self.energy.energy(name, t0, t1)
+
+    # ---- periodic update ----
+
+    def _oven_near(self, sensor):
+        return any(device[5] == 1 for device in self.associations.ovens_near(sensor[0]))
+
+    def _update_temperature(self, sensor, heating_factor, delta_seconds):
+        name, new_state, _ = changeTemperature(None, sensor, self.sensors, heating_factor, delta_seconds)
+        self._notify("sensor_changed", name, new_state, sensor[4])
+        self._series(name, "Temperature").append(self._sample_time(), new_state)
+
+    # One update pass over Temperature, Smart Meters, device consumption and per-second samples.
+    def tick(self):
+        self._update(event_driven=False)
+
+    # event_driven=True is used by the scheduler: Temperature moves in whole timer seconds, Smart Meters are
+    # recorded only when their reading changes and there is no per-second sampling of binary sensors.
+    def _update(self, event_driven):
+        current_elapsed = self.clock.elapsed_time
+        if self.last_temp_elapsed is None:
+            self.last_temp_elapsed = current_elapsed
+        delta_seconds = (current_elapsed - self.last_temp_elapsed).total_seconds()
+        if event_driven:
+            delta_seconds = float(math.floor(delta_seconds))
+            self.last_temp_elapsed += timedelta(seconds=delta_seconds)
+        else:
+            self.last_temp_elapsed = current_elapsed
+
+        timestamp = self.timestamp()
+        current_datetime = self.current_datetime()
+
+        # --- Temperature ---
+        if delta_seconds > 0 or not event_driven:
+            for sensor in self.sensors.of_type("Temperature"):
+                heating_factor = 1 if self._oven_near(sensor) else 0
+                if event_driven and not self._temperature_moving(sensor, heating_factor):
+                    continue
+                self._update_temperature(sensor, heating_factor, delta_seconds)
+
+        # Between events nobody else will look at the meters, so switch-offs must be visible right now
+        if event_driven:
+            self._update_devices(delta_seconds)
+
+        # --- Smart Meter ---
+        updated_smartmeters = set()
+        readings = self.device_bank.readings(self.sensors.metered_devices(), self.clock.get_simulated_timestamp(),
+                                             self.active_cycles)
+        for sensor in self.sensors.of_type("Smart Meter"):
+            previous_consumption = sensor[9]  # the registry updates the sensor in place
+            if sensor[10] in readings:
+                sensor_name, new_consumption = sensor[0], readings[sensor[10]]
+                update_sensor(self.sensors, sensor, consumption=new_consumption)
+            else:
+                # no associated device, or only in the scenario file
+                sensor_name, new_consumption, _ = changeSmartMeter(None, sensor, self.sensors, self.devices,
+                                                                   delta_seconds, current_datetime,
+                                                                   self.active_cycles)
+            updated_smartmeters.add(sensor_name)
+            if event_driven and new_consumption == previous_consumption and sensor_name in self.sensor_states:
+                continue
+            self._notify("sensor_changed", sensor_name, new_consumption, sensor[4])
+            self._record_smart_meter(sensor, sensor[10], new_consumption, timestamp)
+
+        # Dynamic device consumption
+        if not event_driven:
+            self._update_devices(delta_seconds)
+
+        # Current snapshot for each device monitored by a Smart Meter not sampled yet in this tick
+        for dev_name, meters in self.sensors.metered_devices().items():
+            device = self.devices.get(dev_name)
+            if device is None:
+                continue
+            for sensor in meters:
+                if sensor[0] not in updated_smartmeters:
+                    self._record_smart_meter(sensor, dev_name, device[8], timestamp)
+
+        if PER_SECOND_SENSOR_SAMPLING and not event_driven:
+            for sensor in self.sensors:
+                type = sensor[3]
+                if type in PER_SECOND_SENSOR_TYPES:
+                    try:
+                        current_state = int(round(float(sensor[7])))
+                    except Exception:
+                        current_state = 0
+                    self._append_binary(sensor[0], type, current_state)
+                    self._log_sensor_event(timestamp, sensor[0], type, int(sensor[1]), int(sensor[2]), current_state,
+                                           "per-second-sample")
+
+    # The programs switched off here end their cycle in the ledger too: the first update past the end of the
+    # profile, at most one minute later (the minute of the final step).
+    def _update_devices(self, delta_seconds):
+        for name in self.device_bank.update(self.clock.get_simulated_timestamp(), self.active_cycles):
+            self.energy.stopped(name, self.current_datetime())
+            self._notify("device_changed", name, 0)
+
+    @staticmethod
+    def _temperature_moving(sensor, heating_factor):
+        if heating_factor > 0:
+            return float(sensor[7]) < float(sensor[5])
+        return float(sensor[7]) > float(sensor[4])
+
+    def _record_smart_meter(self, sensor, associated_device, consumption, timestamp):
+        series = self._series(sensor[0], "Smart Meter", associated_device=associated_device)
+        bin_state = 1 if (consumption or 0.0) > SMART_METER_THRESHOLD_W else 0
+        self._append_sample(series, bin_state, round(consumption, 2))
+        self._log_sensor_event(timestamp, sensor[0], "Smart Meter", int(sensor[1]), int(sensor[2]),
+                               float(round(consumption, 2)), f"device:{associated_device}")
+
+    def update_activities(self):
+        before = set(current_activities)
+        detected = detect_activities(self.sensor_states, self.points, self.devices, self.sensors,
+                                     self.walls_coordinates, self.doors, self.clock,
+                                     closest_in_fov=self.fov_cache.closest, associations=self.associations)
+        update_activity_state(self.clock.get_simulated_time(), detected, None)
+        if set(current_activities) != before:
+            self._notify("activities_changed", sorted(current_activities))
+        return detected
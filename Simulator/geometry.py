@@ -0,0 +1,404 @@
+import heapq
+import math
+
+import numpy as np
+
+OCCLUSION_CELL_SIZE = 40  # px side of the grid cells indexing wall and door segments
+_EPSILON = 1e-6  # px of slack on cell borders, so segments touching a border are found from both sides
+KERNEL_CHUNK = 1 << 20  # ray x segment pairs evaluated at once by the batch kernel (bounds its memory)
+KD_LEAF_SIZE = 8  # points per leaf of a PointTree
+
+
+class SegmentGrid:
+    """ Uniform grid over line segments: each segment is listed in the cells of its bounding box, and a query
+    segment only looks at the cells it passes through, so occlusion tests skip the walls of other rooms. """
+
+    def __init__(self, cell_size=OCCLUSION_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = {}
+
+    def clear(self):
+        self._cells.clear()
+
+    def add(self, key, x1, y1, x2, y2):
+        size = self.cell_size
+        for cx in range(math.floor(min(x1, x2) / size), math.floor(max(x1, x2) / size) + 1):
+            for cy in range(math.floor(min(y1, y2) / size), math.floor(max(y1, y2) / size) + 1):
+                self._cells.setdefault((cx, cy), []).append(key)
+
+    # Keys of the segments sharing a cell with the segment (x1, y1)-(x2, y2), each once, in no particular order.
+    def along(self, x1, y1, x2, y2):
+        if not self._cells:
+            return ()
+        size = self.cell_size
+        if x1 > x2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        dx = x2 - x1
+        found = set()
+        for cx in range(math.floor((x1 - _EPSILON) / size), math.floor((x2 + _EPSILON) / size) + 1):
+            # part of the segment inside this column of cells
+            xa, xb = max(x1, cx * size), min(x2, (cx + 1) * size)
+            if dx:
+                ya, yb = y1 + (xa - x1) * (y2 - y1) / dx, y1 + (xb - x1) * (y2 - y1) / dx
+            else:
+                ya, yb = y1, y2
+            for cy in range(math.floor((min(ya, yb) - _EPSILON) / size),
+                            math.floor((max(ya, yb) + _EPSILON) / size) + 1):
+                keys = self._cells.get((cx, cy))
+                if keys:
+                    found.update(keys)
+        return found
+
+
+class CompiledSegments:
+    """ Segments compiled into contiguous float64 arrays: endpoints (N, 4: x1, y1, x2, y2), bounding boxes
+    (N, 4: min x, min y, max x, max y) and direction vectors (N, 2), with `rows` holding the same eight numbers
+    per segment as tuples for scalar loops. A missing segment (None) is a row of NaN, which no box test accepts.
+    Doors also get `closed`, one flag per row (see DoorList.compiled). """
+
+    def __init__(self, segments):
+        nan = (math.nan,) * 4
+        self.segments = np.array([nan if s is None else tuple(s[:4]) for s in segments],
+                                 dtype=np.float64).reshape(-1, 4)
+        x1, y1, x2, y2 = self.segments.T
+        self.boxes = np.column_stack((np.minimum(x1, x2), np.minimum(y1, y2), np.maximum(x1, x2), np.maximum(y1, y2)))
+        self.directions = self.segments[:, 2:] - self.segments[:, :2]
+        self.rows = [tuple(row) for row in np.hstack((self.segments, self.boxes)).tolist()]
+        self.closed = np.zeros(len(self.segments), dtype=bool)
+
+    def __len__(self):
+        return len(self.segments)
+
+    # Rows whose bounding box meets the box (x0, y0)-(x1, y1), optionally among `rows` only.
+    def overlapping(self, x0, y0, x1, y1, rows=None):
+        boxes = self.boxes if rows is None else self.boxes[rows]
+        found = np.flatnonzero((boxes[:, 0] <= x1) & (boxes[:, 2] >= x0) & (boxes[:, 1] <= y1) & (boxes[:, 3] >= y0))
+        return found if rows is None else np.asarray(rows)[found]
+
+
+class WallCoordinates(list):
+    """ Flat [x1, y1, x2, y2, ...] list of wall coordinates, as built by read.resolve_walls_coordinates and
+    wall.py, that also keeps its walls on a SegmentGrid. A wall is indexed once its fourth coordinate is added.
+    `revision` changes whenever the walls do, so results derived from them know when to be recomputed;
+    `compiled` is the CompiledSegments of the walls (grid keys are its rows), rebuilt on first use after a change. """
+
+    def __init__(self, coordinates=()):
+        self.revision = 0
+        self._compiled = None
+        super().__init__(coordinates)
+        self._reindex()
+
+    @property
+    def compiled(self):
+        if self._compiled is None or self._compiled[0] != self.revision:
+            self._compiled = (self.revision, CompiledSegments(self.segments))
+        return self._compiled[1]
+
+    def _reindex(self):
+        self.revision += 1
+        self.segments = []
+        self.grid = SegmentGrid()
+        for i in range(0, len(self) - len(self) % 4, 4):
+            self._index(list.__getitem__(self, slice(i, i + 4)))
+
+    def _index(self, coordinates):
+        try:
+            segment = tuple(float(c) for c in coordinates)
+        except (TypeError, ValueError):
+            print(f"[WARN] Wall with invalid coordinates not indexed: {coordinates}")
+            segment = None
+        self.revision += 1
+        if segment is not None:
+            self.grid.add(len(self.segments), *segment)
+        self.segments.append(segment)
+
+    # (x1, y1, x2, y2) of the walls that may cross the segment from (x1, y1) to (x2, y2).
+    def crossing(self, x1, y1, x2, y2):
+        segments = self.segments
+        return [segments[i] for i in self.grid.along(x1, y1, x2, y2)]
+
+    # ---- list mutations keep the grid current ----
+
+    def append(self, coordinate):
+        super().append(coordinate)
+        if len(self) % 4 == 0:
+            self._index(list.__getitem__(self, slice(len(self) - 4, len(self))))
+
+    def extend(self, coordinates):
+        for coordinate in coordinates:
+            self.append(coordinate)
+
+    def __iadd__(self, coordinates):
+        self.extend(coordinates)
+        return self
+
+    def insert(self, index, coordinate):
+        super().insert(index, coordinate)
+        self._reindex()
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._reindex()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._reindex()
+
+    def remove(self, coordinate):
+        super().remove(coordinate)
+        self._reindex()
+
+    def pop(self, index=-1):
+        coordinate = super().pop(index)
+        self._reindex()
+        return coordinate
+
+    def clear(self):
+        super().clear()
+        self._reindex()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._reindex()
+
+    def reverse(self):
+        super().reverse()
+        self._reindex()
+
+
+class DoorList(list):
+    """ List of (x1, y1, x2, y2, state) doors that also keeps them on a SegmentGrid. Toggling a door replaces its
+    tuple (doors[i] = (..., new_state)): the position does not change, so the grid is kept as it is.
+    `closed` is a bitmask of the closed doors (bit i for doors[i]); `revision` changes when doors are added, moved
+    or removed, not when they are toggled. `compiled` is the CompiledSegments of the doors (grid keys are its
+    rows), rebuilt after a revision change, with its `closed` flags refreshed after a toggle. """
+
+    def __init__(self, doors=()):
+        self.revision = 0
+        self._compiled = None
+        super().__init__(doors)
+        self._reindex()
+
+    @property
+    def compiled(self):
+        if self._compiled is None or self._compiled[0] != self.revision:
+            self._compiled = [self.revision, CompiledSegments(self), None]
+        revision, compiled, closed = self._compiled
+        if closed != self.closed:
+            compiled.closed = np.array([door[4] == "close" for door in self], dtype=bool).reshape(-1)
+            self._compiled[2] = self.closed
+        return compiled
+
+    def _reindex(self):
+        self.revision += 1
+        self.grid = SegmentGrid()
+        self.closed = 0
+        for index, door in enumerate(self):
+            self.grid.add(index, *door[:4])
+            if door[4] == "close":
+                self.closed |= 1 << index
+
+    # Indexes of the doors that may cross the segment from (x1, y1) to (x2, y2), whatever their state.
+    def crossing(self, x1, y1, x2, y2):
+        return self.grid.along(x1, y1, x2, y2)
+
+    # ---- list mutations keep the grid current ----
+
+    def append(self, door):
+        super().append(door)
+        self.revision += 1
+        self.grid.add(len(self) - 1, *door[:4])
+        if door[4] == "close":
+            self.closed |= 1 << (len(self) - 1)
+
+    def extend(self, doors):
+        for door in doors:
+            self.append(door)
+
+    def __iadd__(self, doors):
+        self.extend(doors)
+        return self
+
+    def insert(self, index, door):
+        super().insert(index, door)
+        self._reindex()
+
+    def __setitem__(self, index, value):
+        if not isinstance(index, slice) and tuple(list.__getitem__(self, index)[:4]) == tuple(value[:4]):
+            super().__setitem__(index, value)
+            bit = 1 << (index % len(self))
+            self.closed = self.closed | bit if value[4] == "close" else self.closed & ~bit
+            return
+        super().__setitem__(index, value)
+        self._reindex()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._reindex()
+
+    def remove(self, door):
+        super().remove(door)
+        self._reindex()
+
+    def pop(self, index=-1):
+        door = super().pop(index)
+        self._reindex()
+        return door
+
+    def clear(self):
+        super().clear()
+        self._reindex()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._reindex()
+
+    def reverse(self):
+        super().reverse()
+        self._reindex()
+
+
+class PointTree:
+    """ 2-d tree over points [(x, y), ...]. nearest(x, y) yields their indexes from the closest one on, lazily
+    (best-first search over the tree), so a caller that stops at the first point that suits it only looks at the
+    few leaves around the query. The order is the one of sorting the indexes by utils.calculate_distance (ties in
+    index order), computed with the same expression; the bound of a box never exceeds the distance of its points. """
+
+    def __init__(self, points, leaf_size=KD_LEAF_SIZE):
+        self.points = [(p[0], p[1]) for p in points]
+        self.leaf_size = leaf_size
+        self.root = self._build(list(range(len(self.points))), 0) if self.points else None
+
+    # Node: (x0, y0, x1, y1, children, indexes), bounding box of its points; leaves have no children.
+    def _build(self, indexes, depth):
+        xs = [self.points[i][0] for i in indexes]
+        ys = [self.points[i][1] for i in indexes]
+        box = (min(xs), min(ys), max(xs), max(ys))
+        if len(indexes) <= self.leaf_size:
+            return box + ((), sorted(indexes))
+        axis = depth % 2
+        indexes.sort(key=lambda i: self.points[i][axis])
+        middle = len(indexes) // 2
+        return box + ((self._build(indexes[:middle], depth + 1), self._build(indexes[middle:], depth + 1)), ())
+
+    def nearest(self, x, y):
+        if self.root is None:
+            return
+        points = self.points
+        # (distance, 0, n, node) for boxes, (distance, 1, index, None) for points: on equal distances boxes are
+        # opened first, so points come out in index order
+        heap = [(0.0, 0, 0, self.root)]
+        counter = 1
+        while heap:
+            distance, kind, key, node = heapq.heappop(heap)
+            if kind:
+                yield key
+                continue
+            x0, y0, x1, y1, children, indexes = node
+            for index in indexes:
+                px, py = points[index]
+                heapq.heappush(heap, (math.sqrt((px - x) ** 2 + (py - y) ** 2), 1, index, None))
+            for child in children:
+                dx = child[0] - x if x < child[0] else (x - child[2] if x > child[2] else 0.0)
+                dy = child[1] - y if y < child[1] else (y - child[3] if y > child[3] else 0.0)
+                heapq.heappush(heap, (math.sqrt(dx ** 2 + dy ** 2), 0, counter, child))
+                counter += 1
+
+
+# ---- batch kernel: M rays against N segments with array arithmetic ----
+
+# (N, 4) float array of x1, y1, x2, y2 rows; accepts tuples, a WallCoordinates/flat list, CompiledSegments or
+# another array.
+def as_segments(segments):
+    if isinstance(segments, CompiledSegments):
+        segments = segments.segments
+        return segments[~np.isnan(segments).any(axis=1)]
+    if isinstance(segments, WallCoordinates):
+        return as_segments(segments.compiled)
+    array = np.asarray(segments, dtype=np.float64)
+    if array.ndim == 1:
+        array = array[:len(array) - len(array) % 4]
+    return array.reshape(-1, 4)
+
+# CompiledSegments of walls or doors: the one kept by a WallCoordinates/DoorList, or compiled from a flat
+# coordinate list or from (x1, y1, x2, y2, ...) tuples.
+def compile_segments(segments):
+    if isinstance(segments, (WallCoordinates, DoorList)):
+        return segments.compiled
+    if len(segments) and not isinstance(segments[0], (tuple, list)):
+        return CompiledSegments(as_segments(segments))
+    compiled = CompiledSegments(segments)
+    compiled.closed = np.array([len(s) > 4 and s[4] == "close" for s in segments], dtype=bool).reshape(-1)
+    return compiled
+
+def _orientation(ax, ay, bx, by, cx, cy):
+    # same expression as utils.orientation, so the rounding is the same; only the sign matters
+    return np.sign((by - ay) * (cx - bx) - (bx - ax) * (cy - by))
+
+def _on_segment(ax, ay, bx, by, x, y):
+    return ((np.minimum(ax, bx) <= x) & (x <= np.maximum(ax, bx)) &
+            (np.minimum(ay, by) <= y) & (y <= np.maximum(ay, by)))
+
+# (M, N) boolean matrix: ray m intersects segment n, with the same rules as utils.intersect (touching and
+# collinear overlaps count, disjoint bounding boxes never do).
+def hit_matrix(rays, segments):
+    rays, segments = as_segments(rays), as_segments(segments)
+    x1, y1, x2, y2 = (rays[:, i:i + 1] for i in range(4))
+    x3, y3, x4, y4 = (segments[None, :, i] for i in range(4))
+    boxes = ((np.maximum(x1, x2) >= np.minimum(x3, x4)) & (np.minimum(x1, x2) <= np.maximum(x3, x4)) &
+             (np.maximum(y1, y2) >= np.minimum(y3, y4)) & (np.minimum(y1, y2) <= np.maximum(y3, y4)))
+    o1 = _orientation(x1, y1, x2, y2, x3, y3)
+    o2 = _orientation(x1, y1, x2, y2, x4, y4)
+    o3 = _orientation(x3, y3, x4, y4, x1, y1)
+    o4 = _orientation(x3, y3, x4, y4, x2, y2)
+    return boxes & (((o1 != o2) & (o3 != o4)) |
+                    ((o1 == 0) & _on_segment(x1, y1, x2, y2, x3, y3)) |
+                    ((o2 == 0) & _on_segment(x1, y1, x2, y2, x4, y4)) |
+                    ((o3 == 0) & _on_segment(x3, y3, x4, y4, x1, y1)) |
+                    ((o4 == 0) & _on_segment(x3, y3, x4, y4, x2, y2)))
+
+def _ray_chunks(rays, segments):
+    step = max(KERNEL_CHUNK // max(len(segments), 1), 1)
+    for start in range(0, len(rays), step):
+        yield start, rays[start:start + step]
+
+# (M,) boolean mask: ray m is blocked by at least one of the segments.
+def blocked_mask(rays, segments):
+    rays, segments = as_segments(rays), as_segments(segments)
+    mask = np.zeros(len(rays), dtype=bool)
+    if len(segments):
+        for start, chunk in _ray_chunks(rays, segments):
+            mask[start:start + len(chunk)] = hit_matrix(chunk, segments).any(axis=1)
+    return mask
+
+# Nearest segment hit by each ray: (index, t) arrays, t in [0, 1] along the ray from its first point, with
+# index -1 and t inf for the rays that hit nothing. For a collinear overlap, t is where the overlap starts.
+def nearest_hits(rays, segments):
+    rays, segments = as_segments(rays), as_segments(segments)
+    index = np.full(len(rays), -1, dtype=np.int64)
+    nearest = np.full(len(rays), np.inf)
+    if not len(segments):
+        return index, nearest
+    for start, chunk in _ray_chunks(rays, segments):
+        hits = hit_matrix(chunk, segments)
+        px, py = chunk[:, 0:1], chunk[:, 1:2]
+        rx, ry = chunk[:, 2:3] - px, chunk[:, 3:4] - py
+        qx, qy = segments[None, :, 0], segments[None, :, 1]
+        sx, sy = segments[None, :, 2] - qx, segments[None, :, 3] - qy
+        denom = rx * sy - ry * sx
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = ((qx - px) * sy - (qy - py) * sx) / denom
+            # parallel (collinear) hits: first point of the overlap, by projection on the ray
+            length2 = rx * rx + ry * ry
+            t3 = ((qx - px) * rx + (qy - py) * ry) / length2
+            t4 = ((qx + sx - px) * rx + (qy + sy - py) * ry) / length2
+            t_collinear = np.clip(np.minimum(t3, t4), 0.0, 1.0)
+        t = np.where(denom == 0, np.where(length2 == 0, 0.0, t_collinear), t)
+        t = np.where(hits, np.clip(t, 0.0, 1.0), np.inf)
+        best = np.argmin(t, axis=1)
+        best_t = t[np.arange(len(chunk)), best]
+        found = np.isfinite(best_t)
+        index[start:start + len(chunk)] = np.where(found, best, -1)
+        nearest[start:start + len(chunk)] = best_t
+    return index, nearest
+
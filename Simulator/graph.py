@@ -8,10 +8,12 @@ import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 from matplotlib.ticker import MaxNLocator, FormatStrFormatter
+import numpy as np
 import pandas as pd
 
 from sensor import sensors
 from read import read_sensors
+from timeseries import SensorSeries
 
 plt.rcParams.update({
     "axes.titlesize": 16,
@@ -40,8 +42,12 @@ def _align_len(lst, target_len, fill=None):
         out = out[:target_len]
     return out
 
+# Times are strings for the series read from CSV files, a datetime64 array for a SensorSeries (no parsing).
 def _build_dataframe(time_list_str, values_list):
-    time_list = [_parse_datetime(t) for t in time_list_str]
+    if isinstance(time_list_str, np.ndarray):
+        time_list = time_list_str
+    else:
+        time_list = [_parse_datetime(t) for t in time_list_str]
     vals = pd.to_numeric(pd.Series(values_list), errors="coerce")
     df = pd.DataFrame({"timestamp": time_list, "value": vals})
     df = df.dropna(subset=["value"])
@@ -54,9 +60,18 @@ def _build_dataframe(time_list_str, values_list):
     df = df.resample("1min").ffill()
     return df
 
+# (times, states, consumption) to plot: zero-copy views for a SensorSeries, the lists of the CSV dicts otherwise.
+def _plot_columns(sensor_data):
+    if isinstance(sensor_data, SensorSeries):
+        return sensor_data.datetimes(), sensor_data.states, sensor_data.consumption
+    return sensor_data.get('time', []), sensor_data.get('state', []), sensor_data.get('consumption')
+
 def _sensor_type(name: str, sensor_states: dict):
     # from sensor_states
-    t = sensor_states.get(name, {}).get("type")
+    data = sensor_states.get(name, {})
+    if isinstance(data, SensorSeries):
+        return data.type
+    t = data.get("type")
     if t:
         return t
     # from runtime
@@ -135,18 +150,16 @@ def show_graphs(canvas, sensor_states):
     def generate_graph(sensor, sensor_data, frame):
         fig, ax = plt.subplots(figsize=(12, 6))
 
-        time_list = sensor_data.get('time', [])
-        state_list = sensor_data.get('state', [])
+        time_list, state_list, consumption_list = _plot_columns(sensor_data)
 
         sensor_type = _sensor_type(sensor, sensor_states)
 
         if sensor_type == "Smart Meter":
-            consumption_list = sensor_data.get('consumption')
-            if not consumption_list:
+            if consumption_list is None or not len(consumption_list):
                 m = _load_consumption_from_interactions(sensor)
                 if m:
                     consumption_list = _match_full_or_suffix(time_list, m)
-            if not consumption_list:
+            if consumption_list is None or not len(consumption_list):
                 # no consumption available: blank message and graph
                 ax.text(0.5, 0.5, "Consumption not available for this Smart Meter", ha="center", va="center", transform=ax.transAxes)
                 y_series = []
@@ -162,9 +175,9 @@ def show_graphs(canvas, sensor_states):
             else:
                 y_label = "Value"
 
-        df = _build_dataframe(time_list, y_series) if y_series else pd.DataFrame()
+        df = _build_dataframe(time_list, y_series) if len(y_series) else pd.DataFrame()
         if df.empty:
-            if y_series:  # data existed but was not valid
+            if len(y_series):  # data existed but was not valid
                 ax.text(0.5, 0.5, "No valid data to plot", ha="center", va="center", transform=ax.transAxes)
         else:
             unique_vals = set(df["value"].dropna().unique().tolist())
@@ -259,17 +272,15 @@ def show_graphs_auto(sensor_states, selected_keys, target_frame):
     def generate_graph(sensor, sensor_data, frame):
         fig, ax = plt.subplots(figsize=(12, 6))
 
-        time_list = sensor_data.get('time', [])
-        state_list = sensor_data.get('state', [])
+        time_list, state_list, consumption_list = _plot_columns(sensor_data)
         sensor_type = _sensor_type(sensor, sensor_states)
 
         if sensor_type == "Smart Meter":
-            consumption_list = sensor_data.get('consumption')
-            if not consumption_list:
+            if consumption_list is None or not len(consumption_list):
                 m = _load_consumption_from_interactions(sensor)
                 if m:
                     consumption_list = _match_full_or_suffix(time_list, m)
-            if not consumption_list:
+            if consumption_list is None or not len(consumption_list):
                 ax.text(0.5, 0.5, "Consumption not available for this Smart Meter", ha="center", va="center", transform=ax.transAxes)
                 y_series = []
             else:
@@ -284,9 +295,9 @@ def show_graphs_auto(sensor_states, selected_keys, target_frame):
             else:
                 y_label = "Value"
 
-        df = _build_dataframe(time_list, y_series) if y_series else pd.DataFrame()
+        df = _build_dataframe(time_list, y_series) if len(y_series) else pd.DataFrame()
         if df.empty:
-            if y_series:
+            if len(y_series):
                 ax.text(0.5, 0.5, "No valid data to plot", ha="center", va="center", transform=ax.transAxes)
         else:
             unique_vals = set(df["value"].dropna().unique().tolist())
@@ -1,9 +1,13 @@
-import tkinter as tk
-from tkinter import messagebox, ttk, filedialog
 import csv
+try:
+    import tkinter as tk
+    from tkinter import messagebox, ttk, filedialog
+except ImportError:  # headless runs only use the save_* functions and InteractionLog
+    tk = messagebox = ttk = filedialog = None
 
 from read import read_sensors
 from sensor import sensors
+from timeseries import format_times, nan_to_none, sensor_columns
 
 import os
 from datetime import datetime
@@ -39,6 +43,21 @@ def log_end_of_simulation(end_time):
         print(f"[LOG] Force close activity: {name} at {end_time}")
     active_activities.clear()
 
+# Close the activities still open at end_time and reopen them at next_start, so each chunk of a long run
+# (e.g. one simulated day) lists everything that happened in it.
+def split_activity_log(end_time, next_start):
+    for name, start in list(active_activities.items()):
+        activity_log.append({
+            "activity": name,
+            "start": start,
+            "end": end_time
+        })
+        active_activities[name] = next_start
+
+def reset_activity_log():
+    activity_log.clear()
+    active_activities.clear()
+
 def save_activity_log(filename="activity_log.csv"):
     try:
         with open(filename, mode="w", newline="", encoding="utf-8") as f:
@@ -50,6 +69,31 @@ def save_activity_log(filename="activity_log.csv"):
     except Exception as e:
         print(f"[ERROR] Saving failed: {e}")
 
+# Sensor samples as (sensor, type, times, states, consumption) column blocks, as returned by
+# SimulationEngine.drain_sensor_states(), e.g. one simulated day of a long run. Times are formatted per block.
+def save_sensor_log(blocks, filename="sensor_log.csv"):
+    try:
+        with open(filename, mode="w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["sensor", "type", "time", "state", "consumption"])
+            for name, type, times, states, consumption in blocks:
+                n = len(times)
+                values = [None] * n if consumption is None else nan_to_none(consumption)
+                writer.writerows(zip([name] * n, [type] * n, format_times(times), states.tolist(), values))
+    except Exception as e:
+        print(f"[ERROR] Saving failed: {e}")
+
+# Energy of each device over a period, [(device, type, Wh), ...] as returned by EnergyLedger.report().
+def save_energy_report(rows, filename="energy.csv"):
+    try:
+        with open(filename, mode="w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["device", "type", "kWh"])
+            for name, type, wh in rows:
+                writer.writerow([name, type, round(wh / 1000.0, 4)])
+    except Exception as e:
+        print(f"[ERROR] Saving failed: {e}")
+
 def show_activity_log():
     log_window = tk.Toplevel()
     log_window.title("Activity log")
@@ -114,15 +158,14 @@ def show_log(canvas, sensor_states, load_active):
         text_box.pack(padx=10, pady=(0, 8), fill="both", expand=True)
 
         # Data
-        time_list = sensor_data.get('time', []) or []
-        state_list = sensor_data.get('state', []) or []
+        time_list, state_list, consumption_data = sensor_columns(sensor_data)
         sensor_type, x, y = _sensor_metadata(sensore_name)
 
         if not time_list:
             text_box.insert(tk.END, "No data available for this sensor.\n")
         else:
             if str(sensor_type).lower() == "smart meter":
-                consumption_list = _align_len(sensor_data.get('consumption'), len(time_list), fill=None)
+                consumption_list = _align_len(consumption_data, len(time_list), fill=None)
                 text_box.insert(tk.END, "time\tstate\tconsumption\n")
                 for t, s, c in zip(time_list, state_list, consumption_list):
                     text_box.insert(tk.END, f"{t}\t{s}\t{c}\n")
@@ -133,7 +176,7 @@ def show_log(canvas, sensor_states, load_active):
 
         def save_log_tab():
             if str(sensor_type).lower() == "smart meter":
-                consumption_list = _align_len(sensor_data.get('consumption'), len(time_list), fill=None)
+                consumption_list = _align_len(consumption_data, len(time_list), fill=None)
             else:
                 consumption_list = [None] * len(time_list)
 
@@ -178,13 +221,11 @@ def show_log(canvas, sensor_states, load_active):
 
         for sensor_name in selected:
             if sensor_name in sensor_states:
-                sensor_data = sensor_states[sensor_name]
-                time_list = sensor_data['time']
-                state_list = sensor_data['state']
+                time_list, state_list, consumption_data = sensor_columns(sensor_states[sensor_name])
 
                 sensor_type, x, y = _sensor_metadata(sensor_name)
                 if str(sensor_type).lower() == "smart meter":
-                    consumption_list = _align_len(sensor_data.get('consumption'), len(time_list), fill=None)
+                    consumption_list = _align_len(consumption_data, len(time_list), fill=None)
                 else:
                     consumption_list = [None] * len(time_list)
 
@@ -301,66 +342,49 @@ def show_log(canvas, sensor_states, load_active):
     tk.Button(buttons_frame, text="Open Preview", command=open_detail_window).grid(row=0, column=0, padx=5)
     tk.Button(buttons_frame, text="Save directly", command=save_selected_logs).grid(row=0, column=1, padx=5)
 
-_interaction_session_dir = None
-_interaction_file_path = None
-_interaction_file = None
-
-def start_interaction_log_session(session_label: str = ""):
-    global _interaction_session_dir, _interaction_file_path, _interaction_file
-    os.makedirs("logs", exist_ok=True)
-    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    folder_name = f"{stamp}_manual"
-
-    if session_label:
-        safe = str(session_label).replace(":", "").replace("/", "-").replace("\\", "-").strip()
-        if safe:
-            folder_name += f"_{safe}"
-    _interaction_session_dir = os.path.join("logs", folder_name)
-    os.makedirs(_interaction_session_dir, exist_ok=True)
-    _interaction_file_path = os.path.join(_interaction_session_dir, "interactions.csv")
-    _interaction_file = open(_interaction_file_path, mode="w", newline="", encoding="utf-8")
-    import csv as _csv
-    writer = _csv.writer(_interaction_file)
-    writer.writerow(["timestamp_sim", "event_type", "subject", "name", "x", "y", "value", "extra"])
-    _interaction_file.flush()
-    print(f"[LOG] Interaction Session: {_interaction_file_path}")
-
-def stop_interaction_log_session():
-    global _interaction_file
-    try:
-        if _interaction_file:
-            _interaction_file.flush()
-            _interaction_file.close()
-            _interaction_file = None
-            print("[LOG] Interaction Session closed.")
-    except Exception as e:
-        print(f"[ERROR] Closing Interaction Session: {e}")
-
-def append_interaction_row(row):
-    global _interaction_file
-    if _interaction_file is None:
-        start_interaction_log_session()
-    try:
-        import csv as _csv
-        writer = _csv.writer(_interaction_file)
-        writer.writerow(row)
-        _interaction_file.flush()
-    except Exception as e:
-        print(f"[ERROR] Writing interaction log: {e}")
-
-def log_move(timestamp_sim: str, x:int, y:int):
-    #Record a movement of the avatar
-    append_interaction_row([timestamp_sim, "move", "user", "", int(x), int(y), "", ""])
-
-def log_sensor_event(timestamp_sim: str, name:str, sensor_type:str, x:int, y:int, value, extra:str=""):
-    #Record a sensor event
-    append_interaction_row([timestamp_sim, "sensor", sensor_type, name, int(x), int(y), value, extra])
-
-def log_device_event(timestamp_sim: str, name:str, dev_type:str, x:int, y:int, state:int, extra:str=""):
-    #Record a device event on/off
-    append_interaction_row([timestamp_sim, "device", dev_type, name, int(x), int(y), state, extra])
-
-def log_door_event(timestamp_sim: str, door_id:str, x1:int, y1:int, x2:int, y2:int, state:int):
-    #Record interaction with the door
-    extra = f"({x1},{y1})-({x2},{y2})"
-    append_interaction_row([timestamp_sim, "door", "door", door_id, "", "", state, extra])
+class InteractionLog:
+    """ The interactions.csv of one session (moves, sensor and device events), written as the engine notifies
+    them: attach it with SimulationEngine.add_observer() and close() it at the end, the engine writes nothing on
+    its own. `folder` writes the session there instead of a new logs/<stamp>_manual folder (headless runs);
+    flush_each_row=False lets long headless runs buffer their writes. """
+
+    def __init__(self, folder=None, session_label="", flush_each_row=True):
+        if folder is None:
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            folder_name = f"{stamp}_manual"
+            if session_label:
+                safe = str(session_label).replace(":", "").replace("/", "-").replace("\\", "-").strip()
+                if safe:
+                    folder_name += f"_{safe}"
+            folder = os.path.join("logs", folder_name)
+        self.folder = folder
+        self.flush_each_row = flush_each_row
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(folder, "interactions.csv")
+        self._file = open(self.path, mode="w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(["timestamp_sim", "event_type", "subject", "name", "x", "y", "value", "extra"])
+        self._file.flush()
+        print(f"[LOG] Interaction Session: {self.path}")
+
+    # One row from SimulationEngine (see SimulationObserver.interaction).
+    def interaction(self, timestamp_sim, event_type, subject, name, x, y, value, extra):
+        if self._file is None:
+            return
+        try:
+            self._writer.writerow([timestamp_sim, event_type, subject, name, x, y, value, extra])
+            if self.flush_each_row:
+                self._file.flush()
+        except Exception as e:
+            print(f"[ERROR] Writing interaction log: {e}")
+
+    def close(self):
+        try:
+            if self._file:
+                self._file.flush()
+                self._file.close()
+                self._file = None
+                self._writer = None
+                print("[LOG] Interaction Session closed.")
+        except Exception as e:
+            print(f"[ERROR] Closing Interaction Session: {e}")
@@ -6,7 +6,8 @@ from tkinter import Menu, messagebox, filedialog
 from PIL import ImageTk, Image
 
 from sensor import add_sensor, sensors
-from sim import start_simulation, stop_simulation, interaction, update_sensors
+from sim import (start_simulation, stop_simulation, interaction, update_sensors, start_interaction_log,
+                 stop_interaction_log)
 from point import add_point, points
 from wall import draw_line_window, walls
 from read import read_coordinates_from_file, draw_points, draw_walls, draw_sensors, draw_devices, draw_doors
@@ -17,7 +18,6 @@ from activity import monitor_activities, close_current_activity
 from timer import TimerApp
 from log import show_log, show_activity_log
 from automatic import launch_automatic_interface
-from log import start_interaction_log_session, stop_interaction_log_session
 from common import sensor_states
 
 
@@ -268,13 +268,13 @@ def start_sim():
             start_simulation(canvas, timer_app_instance, load_active, activity_label),
             monitor_activities(canvas, load_active, activity_label, timer_app_instance),
             # start CSV session of interactions (label = simulated time)
-            start_interaction_log_session(timer_app_instance.get_simulated_time()),
+            start_interaction_log(canvas, timer_app_instance, load_active),
             canvas.bind("<Button-1>", lambda event: interaction(canvas, timer_app_instance, event, load_active, activity_label))
         ),
         stop_callback=lambda: (
             stop_simulation(timer_app_instance),
             close_current_activity(timer_app_instance, activity_label),
-            stop_interaction_log_session(),
+            stop_interaction_log(),
             canvas.unbind("<Button-1>")
         )
     )
@@ -0,0 +1,171 @@
+from datetime import timedelta
+
+import numpy as np
+
+import consumption_profiles
+from clock import timestamp_to_datetime
+from consumption_profiles import profile_for, CONTINUOUS_TYPES
+
+_EPOCH = timestamp_to_datetime(0)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class DeviceBank:
+    """ Power drawn by all the devices of a DeviceRegistry at one tick. The state of every device, the start of
+    its cycle (microseconds since the epoch), the profile of its cycle type (of its own type without a cycle) and
+    the duration of that profile live in NumPy arrays, one slot per record: they are rebuilt when the registry
+    `revision` or consumption_profiles.profiles_revision changes, and states and cycle starts are read again from
+    the records when the registry counts a replaced device (`changes`, as toggles do) or the active cycles are
+    another dict or another number. A tick is then a few array operations, one searchsorted per profile in use
+    (CompiledProfile.indexes), and a write to the records whose draw changed. update() does what
+    utils.update_devices_consumption does device by device, readings() gives what changeSmartMeter reads. """
+
+    def __init__(self, devices):
+        self.devices = devices
+        self._layout = None
+        self._synced = None
+        self._profiles = {}  # (device name, type) -> profile_for(name, type)
+        self._starts = {}  # device name -> (cycle start datetime, microseconds since the epoch)
+        self._readers = (None, None)  # (layout, metered device names) -> (their slots, their names)
+        self._names = []
+        self._slots = {}  # device name -> slot
+        self._used = []  # profile id -> (profile, its values as an object array)
+        self._used_ids = {}  # id(profile) -> profile id
+        self._on = np.zeros(0, dtype=bool)
+        self._cycled = np.zeros(0, dtype=bool)
+        self._start_us = np.zeros(0, dtype=np.int64)
+        self._profile_id = np.zeros(0, dtype=np.intp)  # -1 without a profile
+        self._duration = np.zeros(0, dtype=np.float64)  # inf for continuous cycles and missing profiles
+        self._idle = np.zeros(0, dtype=object)  # what update() writes for a device that is not running
+        self._idle_reading = np.zeros(0, dtype=object)  # what its Smart Meter reads
+        self._written = np.zeros(0, dtype=object)  # current_consumption of each record
+
+    def _profile(self, name, type):
+        key = (name, type)
+        profile = self._profiles.get(key, key)
+        if profile is key:
+            profile = self._profiles[key] = profile_for(name, type)
+        return profile
+
+    def _profile_index(self, profile):
+        if profile is None:
+            return -1
+        index = self._used_ids.get(id(profile))
+        if index is None:
+            index = self._used_ids[id(profile)] = len(self._used)
+            self._used.append((profile, np.array(profile.values, dtype=object)))
+        return index
+
+    def _start(self, name, start):
+        cached = self._starts.get(name)
+        if cached is None or cached[0] != start:
+            cached = self._starts[name] = (start, (start - _EPOCH) // _MICROSECOND)
+        return cached[1]
+
+    # Rebuild the arrays when the layout changed, read states and cycles again when they may have.
+    def _sync(self, active_cycles):
+        layout = (getattr(self.devices, "revision", None), consumption_profiles.profiles_revision)
+        if layout != self._layout or layout[0] is None:
+            self._profiles.clear()
+            self._used, self._used_ids = [], {}
+            self._names = [device[0] for device in self.devices]
+            self._slots = {name: slot for slot, name in enumerate(self._names)}  # the last one, as get() finds
+            self._layout = layout
+            self._synced = None
+        changes = getattr(self.devices, "changes", None)
+        synced = (layout, changes, id(active_cycles), len(active_cycles))
+        if synced == self._synced and changes is not None:
+            return
+
+        n = len(self.devices)
+        on, cycled = np.zeros(n, dtype=bool), np.zeros(n, dtype=bool)
+        start_us, profile_id = np.zeros(n, dtype=np.int64), np.full(n, -1, dtype=np.intp)
+        duration = np.full(n, np.inf, dtype=np.float64)
+        idle, idle_reading = np.zeros(n, dtype=object), np.zeros(n, dtype=object)
+        written = np.empty(n, dtype=object)
+        for slot, device in enumerate(self.devices):
+            written[slot] = device[8]
+            on[slot] = device[5] == 1
+            cycle = active_cycles.get(device[0])
+            if not on[slot]:
+                continue
+            if cycle is None:
+                profile = self._profile(device[0], device[3])
+                idle[slot] = profile.first if profile else 0.0
+                idle_reading[slot] = float(profile.values[0]) if profile and len(profile.values) else 0.0
+                continue
+            profile = self._profile(device[0], cycle[1])
+            cycled[slot] = True
+            start_us[slot] = self._start(device[0], cycle[0])
+            profile_id[slot] = self._profile_index(profile)
+            if profile is not None and cycle[1] not in CONTINUOUS_TYPES:
+                duration[slot] = profile.duration
+            if profile is not None and not len(profile.keys):
+                idle[slot] = idle_reading[slot] = profile.standby
+            else:
+                idle[slot] = idle_reading[slot] = 0.0
+        self._on, self._cycled, self._start_us, self._profile_id, self._duration = \
+            on, cycled, start_us, profile_id, duration
+        self._idle, self._idle_reading, self._written = idle, idle_reading, written
+        self._synced = synced
+
+    # Minutes from the cycle start of the running devices to the simulated timestamp `now` (whole seconds), as
+    # (now - start).total_seconds() / 60.0 computes them, and their power: profile.step(), by profile.
+    def _cycle_power(self, running, now, idle):
+        elapsed = (int(now) * 1000000 - self._start_us[running]) / 1e6 / 60.0
+        power = idle[running]
+        profile_ids = self._profile_id[running]
+        for index in np.unique(profile_ids).tolist():
+            if index < 0:
+                continue
+            profile, values = self._used[index]
+            if not len(profile.keys):
+                continue
+            members = profile_ids == index
+            power[members] = values[profile.indexes(elapsed[members])]
+        return elapsed, power
+
+    # One consumption update of every device at the simulated timestamp `now`: the draw of the running ones from
+    # their profile, 0 for the others, and the devices that are not continuous switched off (cycle closed) once
+    # past the end of their profile. Returns the names of the devices switched off.
+    def update(self, now, active_cycles):
+        self._sync(active_cycles)
+        target = np.where(self._on, self._idle, 0)
+        running = np.flatnonzero(self._on & self._cycled)
+        switched_off = []
+        if len(running):
+            elapsed, power = self._cycle_power(running, now, self._idle)
+            target[running] = power
+            ended = running[elapsed > self._duration[running]]
+            for slot in ended.tolist():
+                device = self.devices[slot]
+                device[5], device[9] = 0, 0
+                active_cycles.pop(device[0], None)
+                switched_off.append(device[0])
+            if len(ended):
+                target[ended] = 0
+                self._on[ended] = False
+                self._cycled[ended] = False
+                self._synced = self._synced[:3] + (len(active_cycles),)
+
+        changed = np.flatnonzero(target != self._written)
+        for slot, value in zip(changed.tolist(), target[changed].tolist()):
+            self.devices[slot][8] = value
+        self._written = target
+        return switched_off
+
+    # What the Smart Meters of the devices `names` read at the simulated timestamp `now`, {device name: W} for
+    # the ones in the registry: the profile of the cycle type at its cycle position, of the device type without
+    # a cycle.
+    def readings(self, names, now, active_cycles):
+        self._sync(active_cycles)
+        key = tuple(names)
+        if self._readers[0] != (self._layout, key):
+            known = [name for name in key if name in self._slots]
+            self._readers = ((self._layout, key), (np.array([self._slots[n] for n in known], dtype=np.intp), known))
+        slots, known = self._readers[1]
+        values = np.where(self._on[slots], self._idle_reading[slots], 0.0)
+        running = self._on[slots] & self._cycled[slots]
+        if running.any():
+            values[running] = self._cycle_power(slots[running], now, self._idle_reading)[1]
+        return dict(zip(known, values.tolist()))
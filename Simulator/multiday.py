@@ -0,0 +1,91 @@
+import argparse
+import os
+from datetime import datetime, timedelta
+
+from activity import reset_activity_state, clear_activity_sessions
+from clock import VirtualClock
+from consumption_profiles import use_trace_library
+from engine import SimulationEngine
+from log import (InteractionLog, activity_log, reset_activity_log, save_activity_log, save_energy_report,
+                 save_sensor_log, split_activity_log)
+from nilm import save_nilm
+from replay import read_moves, schedule_moves
+from traces import TraceLibrary
+
+
+# Run the engine for `days` simulated days, streaming each day to output_dir/<YYYY-MM-DD>/ (interactions.csv,
+# sensor_log.csv, activity_log.csv, energy.csv with the kWh of each device that day) and then dropping it from
+# memory, so the length of the run does not matter. With `nilm` each day also gets nilm.npz, its 1 s mains and
+# per-device ground truth (see nilm.save_nilm).
+# on_day(engine, day_start, day_dir) is called at the beginning of every day (day_start in simulated seconds
+# since the start of the run) to schedule that day's events. An event belongs to the day it falls in: the ones at
+# t < midnight (fractional seconds included) are applied and logged in the old day, the ones at midnight in the new
+# one. Activities still going on at midnight end the day at 23:59 and start again at 00:00 in the next day's log.
+def run_days(engine, days, output_dir, on_day=None, nilm=False):
+    reset_activity_state()
+    reset_activity_log()
+    engine.start()
+    day_dirs = []
+    for day in range(days):
+        midnight = engine.clock.next_midnight()
+        day_begin = engine.current_datetime()
+        day_end = day_begin + timedelta(seconds=midnight - engine.now())
+        day_dir = os.path.join(output_dir, engine.clock.current_date)
+        interactions = InteractionLog(folder=day_dir, flush_each_row=False)
+        engine.add_observer(interactions)
+        try:
+            if on_day is not None:
+                on_day(engine, engine.now(), day_dir)
+            engine.run_until(midnight, inclusive=False)
+            engine.clock.advance_to(midnight - 1)  # the day closes at 23:59:59, unless an event came later
+            if day == days - 1:
+                engine.stop()
+            else:
+                split_activity_log(engine.clock.get_simulated_time(), "00:00")
+        finally:
+            engine.remove_observer(interactions)
+            interactions.close()
+
+        save_sensor_log(engine.drain_sensor_states(), os.path.join(day_dir, "sensor_log.csv"))
+        save_activity_log(os.path.join(day_dir, "activity_log.csv"))
+        save_energy_report(engine.energy.report(day_begin, day_end), os.path.join(day_dir, "energy.csv"))
+        if nilm:
+            save_nilm(engine, day_begin, day_end, os.path.join(day_dir, "nilm.npz"))
+        engine.energy.forget_before(day_end)
+        activity_log.clear()
+        clear_activity_sessions()
+        day_dirs.append(day_dir)
+        engine.clock.advance_to(midnight)
+    return day_dirs
+
+# on_day callback repeating a recorded routine every day at the same times of day.
+def daily_routine(moves):
+    def on_day(engine, day_start, day_dir):
+        now = engine.current_datetime()
+        run_start = now - timedelta(seconds=day_start)
+        today = [(datetime.combine(now.date(), ts.time()), x, y) for ts, x, y in moves]
+        schedule_moves(engine, [move for move in today if move[0] >= now.replace(second=0)], run_start)
+    return on_day
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a headless simulation over several days.")
+    parser.add_argument("scenario", help="scenario file (read_scenario.csv format)")
+    parser.add_argument("routine", help="routine repeated every day (interactions.csv format)")
+    parser.add_argument("--days", type=int, default=7, help="number of simulated days")
+    parser.add_argument("--start-date", default=None, help="first simulated day, YYYY-MM-DD (default: today)")
+    parser.add_argument("--out", default="logs", help="output folder")
+    parser.add_argument("--traces", default=None,
+                        help="folder of recorded power traces, <device type>/*.csv (default: built-in profiles)")
+    parser.add_argument("--nilm", action="store_true", help="also write the 1 s mains and device power of each day")
+    args = parser.parse_args()
+
+    if args.traces:
+        use_trace_library(TraceLibrary(args.traces))
+
+    moves, _ = read_moves(args.routine)
+    clock = VirtualClock("00:00", args.start_date)
+    engine = SimulationEngine.from_file(args.scenario, clock=clock)
+    out = os.path.join(args.out, datetime.now().strftime("%Y%m%d_%H%M%S") + f"_{args.days}days")
+    run_days(engine, args.days, out, daily_routine(moves), nilm=args.nilm)
+    print(f"[LOG] {args.days} days written to '{out}'")
@@ -0,0 +1,191 @@
+import heapq
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from geometry import blocked_mask, compile_segments, hit_matrix
+from visibility import closed_doors
+
+NAV_CELL_SIZE = 10  # px between two nodes of the navigation grid
+NAV_MARGIN = 200  # px of grid around the walls, for the points outside the house (entrance, garden)
+ROUTE_CACHE_SIZE = 4096  # node-to-node routes kept
+
+# neighbour offsets (columns, rows) of the edges stored once per pair of nodes: right, down and both diagonals
+_STEPS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+
+class _Route:
+    __slots__ = ("points", "mask", "closed")
+
+
+class NavigationGrid:
+    """ Grid of nodes every NAV_CELL_SIZE px over the floor plan, joined to their 8 neighbours unless a wall lies in
+    between; an edge across a door can only be taken while the door is open. route() plans with A* and keeps the
+    node-to-node results: a route stores the bitmask of the doors its search looked at (`mask`) and which of them
+    were closed, so it stays valid until one of those doors toggles, and a repeated query costs a few dictionary
+    reads. The grid is built on first use and again when walls or doors are added, moved or removed. """
+
+    def __init__(self, walls_coordinates, doors, cell_size=NAV_CELL_SIZE, margin=NAV_MARGIN):
+        self.walls_coordinates = walls_coordinates
+        self.doors = doors
+        self.cell_size = cell_size
+        self.margin = margin
+        self._layout = None
+        self._routes = OrderedDict()  # (source node, target node) -> _Route
+        self._snapped = {}  # point -> node
+
+    def _refresh(self):
+        layout = tuple(getattr(c, "revision", len(c)) for c in (self.walls_coordinates, self.doors))
+        if layout != self._layout:
+            self._build()
+            self._layout = layout
+
+    def _build(self):
+        self._routes.clear()
+        self._snapped.clear()
+        self._neighbours = []
+        self._columns = self._rows = 0
+        walls = compile_segments(self.walls_coordinates)
+        doors = compile_segments(self.doors)
+        boxes = np.concatenate((walls.boxes, doors.boxes))
+        boxes = boxes[~np.isnan(boxes).any(axis=1)]
+        if not len(boxes):
+            return
+        size = self.cell_size
+        self._x0 = math.floor((boxes[:, 0].min() - self.margin) / size) * size
+        self._y0 = math.floor((boxes[:, 1].min() - self.margin) / size) * size
+        self._columns = math.ceil((boxes[:, 2].max() + self.margin - self._x0) / size)
+        self._rows = math.ceil((boxes[:, 3].max() + self.margin - self._y0) / size)
+        self._walls, self._doors = walls, doors
+
+        # every edge once, checked against all the walls and doors in one batch
+        col, row = np.meshgrid(np.arange(self._columns), np.arange(self._rows))
+        col, row = col.ravel(), row.ravel()
+        starts, ends = [], []
+        for dc, dr in _STEPS:
+            valid = (col + dc < self._columns) & (row + dr >= 0) & (row + dr < self._rows)
+            starts.append(row[valid] * self._columns + col[valid])
+            ends.append((row[valid] + dr) * self._columns + col[valid] + dc)
+        starts, ends = np.concatenate(starts), np.concatenate(ends)
+        rays = np.column_stack((*self._centers(starts), *self._centers(ends)))
+        open_edges = ~blocked_mask(rays, walls)
+        starts, ends, rays = starts[open_edges], ends[open_edges], rays[open_edges]
+        door_bits = np.zeros(len(rays), dtype=object)
+        if len(doors) and len(rays):
+            for index, crossing in enumerate(hit_matrix(rays, doors).T):
+                door_bits[crossing] |= 1 << index
+        lengths = np.hypot(rays[:, 2] - rays[:, 0], rays[:, 3] - rays[:, 1])
+
+        self._neighbours = [[] for _ in range(self._columns * self._rows)]
+        for a, b, length, bits in zip(starts.tolist(), ends.tolist(), lengths.tolist(), door_bits.tolist()):
+            self._neighbours[a].append((b, length, bits))
+            self._neighbours[b].append((a, length, bits))
+
+    def _centers(self, nodes):
+        nodes = np.asarray(nodes)
+        return (self._x0 + (nodes % self._columns + 0.5) * self.cell_size,
+                self._y0 + (nodes // self._columns + 0.5) * self.cell_size)
+
+    def _center(self, node):
+        return (self._x0 + (node % self._columns + 0.5) * self.cell_size,
+                self._y0 + (node // self._columns + 0.5) * self.cell_size)
+
+    # Node a point starts from: the closest of the four around it that it reaches without crossing a wall or a
+    # door; the closest one if none does. None outside the grid.
+    def _snap(self, x, y):
+        node = self._snapped.get((x, y), -1)
+        if node != -1:
+            return node
+        size = self.cell_size
+        c0 = math.floor((x - self._x0) / size - 0.5)
+        r0 = math.floor((y - self._y0) / size - 0.5)
+        around = [(c, r) for r in (r0, r0 + 1) for c in (c0, c0 + 1)
+                  if 0 <= c < self._columns and 0 <= r < self._rows]
+        node = None
+        if around:
+            around.sort(key=lambda cr: math.hypot(self._x0 + (cr[0] + 0.5) * size - x,
+                                                  self._y0 + (cr[1] + 0.5) * size - y))
+            nodes = [r * self._columns + c for c, r in around]
+            rays = [(x, y, *self._center(n)) for n in nodes]
+            segments = np.concatenate((self._walls.segments, self._doors.segments))
+            blocked = blocked_mask(rays, segments[~np.isnan(segments).any(axis=1)])
+            node = next((n for n, b in zip(nodes, blocked) if not b), nodes[0])
+        self._snapped[(x, y)] = node
+        return node
+
+    # Waypoints [(x, y), ...] from `start` to `end` around the walls and through open doors: the two points and the
+    # grid corners in between. None when the doors closed now leave no way through.
+    def route(self, start, end):
+        self._refresh()
+        if not self._neighbours:
+            return None
+        source, target = self._snap(*start), self._snap(*end)
+        if source is None or target is None:
+            return None
+        closed = closed_doors(self.doors)
+        key = (source, target)
+        route = self._routes.get(key)
+        if route is None or closed & route.mask != route.closed:
+            route = self._search(source, target, closed)
+            self._routes[key] = route
+            while len(self._routes) > ROUTE_CACHE_SIZE:
+                self._routes.popitem(last=False)
+        else:
+            self._routes.move_to_end(key)
+        if route.points is None:
+            return None
+        return [tuple(start)] + route.points + [tuple(end)]
+
+    # A* from node `source` to node `target` with the doors `closed`; keeps the centres of the corners of the path.
+    def _search(self, source, target, closed):
+        columns, size = self._columns, self.cell_size
+        tc, tr = target % columns, target // columns
+
+        def estimate(node):
+            # octile distance: straight and diagonal steps, never more than the remaining length
+            dc, dr = abs(node % columns - tc), abs(node // columns - tr)
+            return size * (max(dc, dr) + (math.sqrt(2) - 1) * min(dc, dr))
+
+        route = _Route()
+        route.mask = 0
+        cost = {source: 0.0}
+        previous = {source: None}
+        heap = [(estimate(source), 0, source)]
+        counter = 1
+        done = set()
+        while heap:
+            _, _, node = heapq.heappop(heap)
+            if node == target:
+                break
+            if node in done:
+                continue
+            done.add(node)
+            for neighbour, length, bits in self._neighbours[node]:
+                if bits:
+                    route.mask |= bits
+                    if bits & closed:
+                        continue
+                candidate = cost[node] + length
+                if candidate < cost.get(neighbour, math.inf):
+                    cost[neighbour] = candidate
+                    previous[neighbour] = node
+                    heapq.heappush(heap, (candidate + estimate(neighbour), counter, neighbour))
+                    counter += 1
+        route.closed = closed & route.mask
+        if target not in previous:
+            route.points = None
+            return route
+        path = [target]
+        while previous[path[-1]] is not None:
+            path.append(previous[path[-1]])
+        path.reverse()
+        # corners: nodes where the direction changes, plus both ends
+        nodes = [path[0]]
+        for before, node, after in zip(path, path[1:], path[2:]):
+            if node - before != after - node:
+                nodes.append(node)
+        if len(path) > 1:
+            nodes.append(path[-1])
+        route.points = [self._center(n) for n in nodes]
+        return route
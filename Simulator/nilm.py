@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from clock import timestamp_to_datetime
+from consumption_profiles import consumption_profiles, profile_for
+
+NILM_STEP_SECONDS = 1  # s between two samples of the mains and device channels
+MAINS_BASE_LOAD_W = 0.0  # W always drawn by loads that are not devices of the scenario (router, alarm, ...)
+
+_EPOCH = timestamp_to_datetime(0)
+
+
+def _seconds(when):
+    return (when - _EPOCH).total_seconds()
+
+# Power of the devices of the engine at every `step` s of [t0, t1) (datetimes): simulated seconds since the epoch
+# of the samples, {device name: W} from the cycles of engine.energy (the profile drawn at each sample, 0 outside
+# the cycles and after the switch-off of a program, at its `end`) and the standby of the devices outside their
+# cycles. Recorded traces are read at `step` resolution, not at the coarser step the simulation draws them at.
+def device_channels(engine, t0, t1, step=NILM_STEP_SECONDS):
+    times = np.arange(int(_seconds(t0)), int(_seconds(t1)), step, dtype=np.int64)
+    channels = {}
+    standby = np.zeros(len(times), dtype=np.float64)
+    for device in engine.devices:
+        name, type = device[0], device[3]
+        power = np.zeros(len(times), dtype=np.float64)
+        running = np.zeros(len(times), dtype=bool)
+        for start, end, cycle_type in engine.energy.cycles(name):
+            profile = profile_for(name, cycle_type, step)
+            if profile is None:
+                continue
+            begin = _seconds(start)
+            finish = np.inf if end is None else _seconds(end)
+            if not profile.repeat and not profile.continuous:
+                finish = min(finish, begin + profile.end * 60)
+            i0, i1 = np.searchsorted(times, (begin, finish))
+            if i1 <= i0:
+                continue
+            if len(profile.keys):
+                minutes = (times[i0:i1] - begin) / 60.0
+                power[i0:i1] = np.asarray(profile.values, dtype=np.float64)[profile.indexes(minutes)]
+            else:
+                power[i0:i1] = profile.standby
+            running[i0:i1] = True
+        channels[name] = power
+        standby[~running] += consumption_profiles.get(type, {}).get("standby", 0.0)
+    return times, channels, standby
+
+# Write the mains of [t0, t1) and its ground truth to `filename` (.npz): `mains` (every device, the standby of
+# the idle ones and `base_load`), `standby`, one `device_<i>` column per device (names in `devices`, types in
+# `types`), float32 and compressed, with `start` and `step` for the sample times. Written day by day by
+# multiday.run_days(nilm=True).
+def save_nilm(engine, t0, t1, filename, step=NILM_STEP_SECONDS, base_load=MAINS_BASE_LOAD_W):
+    times, channels, standby = device_channels(engine, t0, t1, step)
+    mains = standby + base_load
+    for power in channels.values():
+        mains += power
+    columns = {f"device_{i}": power.astype(np.float32) for i, power in enumerate(channels.values())}
+    try:
+        np.savez_compressed(filename, start=np.int64(times[0] if len(times) else _seconds(t0)), step=np.int64(step),
+                            base_load=np.float64(base_load), mains=mains.astype(np.float32),
+                            standby=standby.astype(np.float32), devices=np.array(list(channels), dtype=str),
+                            types=np.array([d[3] for d in engine.devices], dtype=str), **columns)
+    except Exception as e:
+        print(f"[ERROR] Saving failed: {e}")
+
+# A file of save_nilm() as a frame indexed by timestamp: mains, standby and one column per device. `devices`
+# only reads those channels (and mains).
+def load_nilm(filename, devices=None):
+    with np.load(filename) as data:
+        names = data["devices"].tolist()
+        index = pd.DatetimeIndex((int(data["start"]) + int(data["step"]) * np.arange(len(data["mains"])))
+                                 .astype("datetime64[s]"), name="timestamp")
+        columns = {"mains": data["mains"], "standby": data["standby"]}
+        for i, name in enumerate(names):
+            if devices is None or name in devices:
+                columns[name] = data[f"device_{i}"]
+    return pd.DataFrame(columns, index=index)
@@ -1,5 +1,8 @@
-import tkinter as tk
-from tkinter import simpledialog, messagebox
+try:
+    import tkinter as tk
+    from tkinter import simpledialog, messagebox
+except ImportError:  # headless runs (engine.py) only read the points list
+    tk = simpledialog = messagebox = None
 from read import coordinates
 
 points = []
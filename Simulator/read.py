@@ -1,15 +1,32 @@
-import tkinter as tk
 from utils import draw_sensor
+from geometry import WallCoordinates, DoorList
+from registry import SensorRegistry, DeviceRegistry
 import csv
 
 # Global lists to save data read from file
 coordinates = []
 read_walls = []
-read_sensors = []
-read_devices = []
-read_doors = []
+read_sensors = SensorRegistry()
+read_devices = DeviceRegistry()
+read_doors = DoorList()
 
 def read_coordinates_from_file(file_path):
+    points, walls, sensors, devices, doors = parse_scenario_file(file_path)
+    coordinates.extend(points)
+    read_walls.extend(walls)
+    read_sensors.extend(sensors)
+    read_devices.extend(devices)
+    read_doors.extend(doors)
+    return coordinates, read_walls, read_sensors, read_devices, read_doors
+
+# Parse a scenario file into fresh lists, without touching the module globals or any canvas.
+def parse_scenario_file(file_path):
+    coordinates = []
+    read_walls = []
+    read_sensors = SensorRegistry()
+    read_devices = DeviceRegistry()
+    read_doors = DoorList()
+
     # Variable to track the current section
     current_section = None
 
@@ -107,19 +124,32 @@ def read_coordinates_from_file(file_path):
 def draw_points(coordinates, canvas):
     for name, x, y in coordinates:
         canvas.create_oval(x - 5, y - 5, x + 5, y + 5, fill="blue", tags='point')
-        canvas.create_text(x+7, y, text=name, fill="blue", anchor=tk.SW, tags='point')
+        canvas.create_text(x+7, y, text=name, fill="blue", anchor="sw", tags='point')
+
+read_walls_coordinates = WallCoordinates()
 
-read_walls_coordinates = []
+def find_wall_endpoints(point1, point2, coordinates):
+    coord_point1 = None
+    coord_point2 = None
+    for coord in coordinates:
+        if coord[0] == point1:
+            coord_point1 = (coord[1], coord[2])
+        elif coord[0] == point2:
+            coord_point2 = (coord[1], coord[2])
+    return coord_point1, coord_point2
+
+# WallCoordinates (geometry.py) of the walls between the named points, as used by the occlusion helpers in utils.py.
+def resolve_walls_coordinates(read_walls, coordinates):
+    walls_coordinates = WallCoordinates()
+    for point1, point2 in read_walls:
+        coord_point1, coord_point2 = find_wall_endpoints(point1, point2, coordinates)
+        if coord_point1 is not None and coord_point2 is not None:
+            walls_coordinates.extend([coord_point1[0], coord_point1[1], coord_point2[0], coord_point2[1]])
+    return walls_coordinates
 
 def draw_walls(read_walls, coordinates, canvas):
     for point1, point2 in read_walls:
-        coord_point1 = None
-        coord_point2 = None
-        for coord in coordinates:
-            if coord[0] == point1:
-                coord_point1 = (coord[1], coord[2])
-            elif coord[0] == point2:
-                coord_point2 = (coord[1], coord[2])
+        coord_point1, coord_point2 = find_wall_endpoints(point1, point2, coordinates)
         if coord_point1 is not None and coord_point2 is not None:
             canvas.create_line(coord_point1, coord_point2, fill="red", width=3, tags='wall')
             read_walls_coordinates.extend([coord_point1[0], coord_point1[1], coord_point2[0], coord_point2[1]])
@@ -135,7 +165,7 @@ def draw_devices(read_devices, canvas):
         name, x, y, type, power, state, min_consumption, max_consumption, current_consumption, consumption_direction = device
         color = "red" if state == 0 else "green"
         canvas.create_oval(x - 5, y - 5, x + 5, y + 5, fill=color, tags=(name, 'device'))
-        canvas.create_text(x+7, y, text=f"{name} ({type})", fill=color, anchor=tk.SW, tags=(name, 'device'))
+        canvas.create_text(x+7, y, text=f"{name} ({type})", fill=color, anchor="sw", tags=(name, 'device'))
 
 def draw_doors(read_doors, canvas):
     for x1, y1, x2, y2, state in read_doors:
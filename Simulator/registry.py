@@ -0,0 +1,317 @@
+from geometry import PointTree
+
+SENSOR_FIELDS = ("name", "x", "y", "type", "min", "max", "step", "state", "direction", "consumption",
+                 "associated_device")
+DEVICE_FIELDS = ("name", "x", "y", "type", "power", "state", "min_consumption", "max_consumption",
+                 "current_consumption", "consumption_direction")
+CLICK_CELL_SIZE = 32  # px side of the grid cells used to find the device under a click
+
+
+def _field(index):
+    return property(lambda self: list.__getitem__(self, index),
+                    lambda self, value: list.__setitem__(self, index, value))
+
+
+class Sensor(list):
+    """ One sensor, with the same 11 fields as the scenario tuples, in the same order. Being a list it indexes,
+    unpacks and has len() like the tuple it replaces (draw_sensor, save() and `name, x, y, type, *_ = s` keep
+    working at C speed), while the fields are also reachable by name and can be changed in place. """
+
+    __slots__ = ()
+
+    def __init__(self, name, x, y, type, min, max, step, state, direction, consumption, associated_device):
+        super().__init__((name, x, y, type, min, max, step, state, direction, consumption, associated_device))
+
+    def __repr__(self):
+        return f"Sensor{tuple(self)}"
+
+    def as_tuple(self):
+        return tuple(self)
+
+
+for _index, _name in enumerate(SENSOR_FIELDS):
+    setattr(Sensor, _name, _field(_index))
+del _index, _name
+
+
+def as_sensor(sensor):
+    return sensor if isinstance(sensor, Sensor) else Sensor(*sensor)
+
+
+class Device(list):
+    """ One device, with the same 10 fields as the scenario tuples, in the same order (see Sensor). """
+
+    __slots__ = ()
+
+    def __init__(self, name, x, y, type, power, state, min_consumption, max_consumption, current_consumption,
+                 consumption_direction):
+        super().__init__((name, x, y, type, power, state, min_consumption, max_consumption, current_consumption,
+                          consumption_direction))
+
+    def __repr__(self):
+        return f"Device{tuple(self)}"
+
+    def as_tuple(self):
+        return tuple(self)
+
+
+for _index, _name in enumerate(DEVICE_FIELDS):
+    setattr(Device, _name, _field(_index))
+del _index, _name
+
+
+def as_device(device):
+    return device if isinstance(device, Device) else Device(*device)
+
+
+class SensorRegistry(list):
+    """ List of Sensor records indexed by name and by type. It is still a list (iteration, len, clear, `+`),
+    so it can stand in for the scenario lists; tuples added to it are converted to Sensor records. `revision`
+    changes when sensors are added, replaced or removed, not when their state is updated in place. """
+
+    def __init__(self, sensors=()):
+        self.revision = 0
+        super().__init__(as_sensor(s) for s in sensors)
+        self._reindex()
+
+    def _reindex(self):
+        self.revision += 1
+        self._by_name = {}
+        self._by_type = {}
+        self._by_device = {}
+        self._trees = {}
+        for sensor in self:
+            self._index(sensor)
+
+    def _index(self, sensor):
+        self._trees.clear()
+        self._by_name[sensor.name] = sensor
+        self._by_type.setdefault(sensor.type, []).append(sensor)
+        if sensor.type == "Smart Meter" and sensor.associated_device:
+            self._by_device.setdefault(sensor.associated_device, []).append(sensor)
+
+    # ---- lookup ----
+
+    def get(self, name, default=None):
+        return self._by_name.get(name, default)
+
+    def __contains__(self, item):
+        if isinstance(item, str):
+            return item in self._by_name
+        return super().__contains__(item)
+
+    # Sensors of one type, in list order (shared list: do not modify it).
+    def of_type(self, type):
+        return self._by_type.get(type, ())
+
+    def names(self):
+        return self._by_name.keys()
+
+    # Smart Meters monitoring a device (shared list: do not modify it).
+    def meters_of(self, device_name):
+        return self._by_device.get(device_name, ())
+
+    # {device name: [Smart Meters monitoring it]}, for the devices that have at least one.
+    def metered_devices(self):
+        return self._by_device
+
+    # Sensors (of one type, or all) from the closest to (x, y) on, ties in list order, yielded lazily from a
+    # PointTree built on first use and kept until sensors are added, replaced or removed.
+    def nearest(self, x, y, type=None):
+        tree = self._trees.get(type)
+        if tree is None:
+            sensors = self if type is None else self.of_type(type)
+            tree = self._trees[type] = (PointTree([(s.x, s.y) for s in sensors]), list(sensors))
+        points, sensors = tree
+        for index in points.nearest(x, y):
+            yield sensors[index]
+
+    # ---- list mutations keep the indexes current ----
+
+    def append(self, sensor):
+        sensor = as_sensor(sensor)
+        super().append(sensor)
+        self.revision += 1
+        self._index(sensor)
+
+    def extend(self, sensors):
+        for sensor in sensors:
+            self.append(sensor)
+
+    def __iadd__(self, sensors):
+        self.extend(sensors)
+        return self
+
+    def insert(self, index, sensor):
+        super().insert(index, as_sensor(sensor))
+        self._reindex()
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            super().__setitem__(index, [as_sensor(s) for s in value])
+        else:
+            super().__setitem__(index, as_sensor(value))
+        self._reindex()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._reindex()
+
+    def remove(self, sensor):
+        super().remove(sensor)
+        self._reindex()
+
+    def pop(self, index=-1):
+        sensor = super().pop(index)
+        self._reindex()
+        return sensor
+
+    def clear(self):
+        super().clear()
+        self._reindex()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._reindex()
+
+    def reverse(self):
+        super().reverse()
+        self._reindex()
+
+
+# Change fields of `sensor` inside `sensors`: in place for a SensorRegistry (O(1)), by rebuilding the tuple list
+# otherwise. Returns the updated list, as the change* functions of sensor.py do.
+def update_sensor(sensors, sensor, **fields):
+    if isinstance(sensors, SensorRegistry):
+        record = sensors.get(sensor[0])
+        if record is not None:
+            for field, value in fields.items():
+                setattr(record, field, value)
+        return sensors
+    if isinstance(sensor, Sensor):
+        for field, value in fields.items():
+            setattr(sensor, field, value)
+        return sensors
+    indexes = {SENSOR_FIELDS.index(field): value for field, value in fields.items()}
+    return [tuple(indexes.get(i, v) for i, v in enumerate(s)) if s == sensor else s for s in sensors]
+
+
+class DeviceRegistry(list):
+    """ List of Device records indexed by name, by type and on a grid of CLICK_CELL_SIZE px cells, so the device
+    under a click is found without scanning the whole list. Like SensorRegistry it stands in for the scenario lists.
+    Replacing one device (devices[i] = (...), as the consumption update does) keeps the record and, while its name
+    and position do not change, the indexes (and `revision`, which only changes when devices are added, moved or
+    removed); it counts in `changes`, so a DeviceBank knows when states and cycles may have moved. """
+
+    def __init__(self, devices=()):
+        self.revision = 0
+        self.changes = 0
+        super().__init__(as_device(d) for d in devices)
+        self._reindex()
+
+    def _reindex(self):
+        self.revision += 1
+        self._by_name = {}
+        self._by_type = {}
+        self._cells = {}
+        for position, device in enumerate(self):
+            self._index(position, device)
+
+    def _index(self, position, device):
+        self._by_name[device.name] = device
+        self._by_type.setdefault(device.type, []).append(device)
+        cell = (int(device.x // CLICK_CELL_SIZE), int(device.y // CLICK_CELL_SIZE))
+        self._cells.setdefault(cell, []).append(position)
+
+    # ---- lookup ----
+
+    def get(self, name, default=None):
+        return self._by_name.get(name, default)
+
+    def __contains__(self, item):
+        if isinstance(item, str):
+            return item in self._by_name
+        return super().__contains__(item)
+
+    # Devices of one type, in list order (shared list: do not modify it).
+    def of_type(self, type):
+        return self._by_type.get(type, ())
+
+    def names(self):
+        return self._by_name.keys()
+
+    # Position in the list of the first device within `tolerance` px of (x, y) on both axes, or None.
+    def index_at(self, x, y, tolerance):
+        found = None
+        for cx in range(int((x - tolerance) // CLICK_CELL_SIZE), int((x + tolerance) // CLICK_CELL_SIZE) + 1):
+            for cy in range(int((y - tolerance) // CLICK_CELL_SIZE), int((y + tolerance) // CLICK_CELL_SIZE) + 1):
+                for position in self._cells.get((cx, cy), ()):
+                    device = list.__getitem__(self, position)
+                    if abs(device.x - x) <= tolerance and abs(device.y - y) <= tolerance:
+                        if found is None or position < found:
+                            found = position
+        return found
+
+    # ---- list mutations keep the indexes current ----
+
+    def append(self, device):
+        device = as_device(device)
+        super().append(device)
+        self.revision += 1
+        self._index(len(self) - 1, device)
+
+    def extend(self, devices):
+        for device in devices:
+            self.append(device)
+
+    def __iadd__(self, devices):
+        self.extend(devices)
+        return self
+
+    def insert(self, index, device):
+        super().insert(index, as_device(device))
+        self._reindex()
+
+    def __setitem__(self, index, value):
+        if not isinstance(index, slice):
+            record = list.__getitem__(self, index)
+            if tuple(value[:3]) == tuple(record[:3]) and value[3] == record.type:
+                record[:] = value
+                self.changes += 1
+                return
+            super().__setitem__(index, as_device(value))
+        else:
+            super().__setitem__(index, [as_device(d) for d in value])
+        self._reindex()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._reindex()
+
+    def remove(self, device):
+        super().remove(device)
+        self._reindex()
+
+    def pop(self, index=-1):
+        device = super().pop(index)
+        self._reindex()
+        return device
+
+    def clear(self):
+        super().clear()
+        self._reindex()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._reindex()
+
+    def reverse(self):
+        super().reverse()
+        self._reindex()
+
+
+# Device called `name` in `devices`: by index for a DeviceRegistry, by scanning a plain list.
+def find_device(devices, name):
+    if isinstance(devices, DeviceRegistry):
+        return devices.get(name)
+    return next((d for d in devices if d[0] == name), None)
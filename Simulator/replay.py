@@ -0,0 +1,100 @@
+import argparse
+import csv
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+from activity import reset_activity_state
+from clock import VirtualClock
+from engine import SimulationEngine
+from log import InteractionLog, reset_activity_log, save_activity_log
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
+
+
+# Read the avatar path of a session: [(datetime, x, y), ...] in file order, plus the last timestamp of the file.
+# `subject` keeps the moves of one resident of a multi-resident log ("user", "user2", ...).
+def read_moves(interactions_path, subject=None):
+    moves = []
+    last_time = None
+    with open(interactions_path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                ts = datetime.strptime(row["timestamp_sim"], TIMESTAMP_FORMAT)
+            except (KeyError, ValueError):
+                continue
+            last_time = ts if last_time is None else max(last_time, ts)
+            if row.get("event_type") == "move" and subject in (None, row.get("subject")):
+                try:
+                    moves.append((ts, int(row["x"]), int(row["y"])))
+                except ValueError:
+                    print(f"[WARN] Invalid move row: {row}")
+    return moves, last_time
+
+# Schedule the moves on the engine: moves recorded in the same minute are spread evenly over it,
+# in file order, so each click is evaluated on its own as it was in the GUI. Returns the time of the last one.
+def schedule_moves(engine, moves, start_time):
+    by_minute = OrderedDict()
+    for ts, x, y in moves:
+        by_minute.setdefault(ts, []).append((x, y))
+    last = None
+    for ts, clicks in by_minute.items():
+        offset = (ts - start_time).total_seconds()
+        for i, (x, y) in enumerate(clicks):
+            last = offset + i * 60.0 / len(clicks)
+            engine.schedule_move(last, x, y)
+    return last
+
+# Run a recorded session through the engine at maximum speed and write its sensor, device and activity
+# output to output_dir (interactions.csv + activity_log.csv, as for a manual session).
+def replay_session(interactions_path, scenario_path, output_dir):
+    moves, last_time = read_moves(interactions_path)
+    if not moves:
+        print(f"[WARN] No moves found in {interactions_path}")
+        return None
+    return simulate_moves(moves, last_time, scenario_path, output_dir)
+
+# Simulate an avatar path [(datetime, x, y), ...] on a fresh engine until end_time, or its last move if later.
+def simulate_moves(moves, end_time, scenario_path, output_dir):
+    start_time = moves[0][0]
+    clock = VirtualClock(start_time.strftime("%H:%M"), start_time.strftime("%Y-%m-%d"))
+    engine = SimulationEngine.from_file(scenario_path, clock=clock)
+
+    reset_activity_state()
+    reset_activity_log()
+    interactions = InteractionLog(folder=output_dir, flush_each_row=False)
+    engine.add_observer(interactions)
+    try:
+        last_move = schedule_moves(engine, moves, start_time)
+        engine.run_until(max((end_time - start_time).total_seconds(), last_move))
+        engine.stop()
+    finally:
+        engine.remove_observer(interactions)
+        interactions.close()
+    save_activity_log(os.path.join(output_dir, "activity_log.csv"))
+    return engine
+
+# Replay every logs/*/interactions.csv found under logs_root into output_root/<session folder>.
+def replay_all(logs_root, scenario_path, output_root):
+    replayed = []
+    for name in sorted(os.listdir(logs_root)):
+        interactions_path = os.path.join(logs_root, name, "interactions.csv")
+        if os.path.isfile(interactions_path):
+            output_dir = os.path.join(output_root, name)
+            if replay_session(interactions_path, scenario_path, output_dir) is not None:
+                replayed.append(output_dir)
+    return replayed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded sessions through the simulator without the GUI.")
+    parser.add_argument("scenario", help="scenario file (read_scenario.csv format)")
+    parser.add_argument("sessions", help="an interactions.csv file or a folder of sessions such as logs/")
+    parser.add_argument("--out", default="replays", help="output folder")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.sessions):
+        done = replay_all(args.sessions, args.scenario, args.out)
+        print(f"[LOG] Replayed {len(done)} sessions into '{args.out}'")
+    else:
+        replay_session(args.sessions, args.scenario, args.out)
@@ -0,0 +1,47 @@
+import numpy as np
+
+from visibility import NO_SENSOR
+
+
+class Resident:
+    """ One occupant of the home: the name its moves and sensor events are logged under, where it stands (None
+    before its first move) and the PIR that sees it. The engine keeps one per resident in
+    SimulationEngine.residents, the first one being the GUI avatar. """
+
+    def __init__(self, name):
+        self.name = name
+        self.position = None
+        self.active_pir_sensors = []
+
+    def __repr__(self):
+        return f"Resident({self.name!r}, {self.position})"
+
+
+# What the sensors see of K residents standing at (xs[k], ys[k]), in one pass over all of them: the candidate
+# index (see VisibilityRaster.candidates) of the closest PIR in sight of each resident, NO_SENSOR where none, and
+# the K x W boolean matrix of the residents within `weight_distance` of each of the `weights` sensors. Whole-pixel
+# positions are gathered on the raster, the others (GUI clicks) get the exact search, as in VisibilityRaster.closest.
+def sense(xs, ys, visibility, weights, weight_distance):
+    xs, ys = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+    whole = (xs == np.floor(xs)) & (ys == np.floor(ys))
+    pirs = np.full(len(xs), NO_SENSOR, dtype=np.int32)
+    if whole.any():
+        pirs[whole] = visibility.indexes_along(xs[whole].astype(np.int64), ys[whole].astype(np.int64))
+    if not whole.all():
+        position = {id(sensor): i for i, sensor in enumerate(visibility.candidates)}
+        for k in np.flatnonzero(~whole):
+            sensor = visibility.closest(float(xs[k]), float(ys[k]))
+            pirs[k] = NO_SENSOR if sensor is None else position[id(sensor)]
+    wx = np.array([float(s[1]) for s in weights])
+    wy = np.array([float(s[2]) for s in weights])
+    distances = np.sqrt((wx[None, :] - xs[:, None]) ** 2 + (wy[None, :] - ys[:, None]) ** 2)
+    return pirs, distances < weight_distance
+
+
+# Residents seen by each sensor: {candidate index: [resident, ...]} from the indexes returned by sense().
+def pir_holders(residents, pirs):
+    holders = {}
+    for resident, index in zip(residents, pirs.tolist()):
+        if index != NO_SENSOR:
+            holders.setdefault(index, []).append(resident)
+    return holders
@@ -0,0 +1,333 @@
+import argparse
+import csv
+import math
+import os
+import random
+import re
+from datetime import datetime
+
+from activity import MEAL_SLOTS, MEAL_MIN_DURATION
+from associations import BED_WEIGHT_DISTANCE, TABLE_WEIGHT_DISTANCE
+from clock import VirtualClock
+from consumption_profiles import compiled_profile, use_trace_library, CONTINUOUS_TYPES, REPEAT_BY_TYPE
+from engine import SimulationEngine, DEVICE_TOLERANCE, DOOR_TOLERANCE, WEIGHT_DISTANCE, MAX_DISTANCE, FOV_ANGLE
+from multiday import run_days
+from traces import TraceLibrary
+from utils import calculate_distance, find_closest_sensor_within_fov
+
+# Daily routine, in minutes: start is (mean time of day, std), duration is (mean, std) and probability is the
+# chance that the activity takes place on a given day. Activities happen one after the other in order of their
+# sampled start. Meals can begin with cooking and are dropped when they no longer fit in their MEAL_SLOTS.
+# The names are the labels written by the detectors in activity.py.
+DEFAULT_ROUTINE = {
+    "wake up": {"start": ("06:45", 20)},
+    "breakfast": {"start": ("07:20", 10), "duration": (25, 5), "probability": 0.9,
+                  "cooking": (10, 3), "cooking_probability": 0.3},
+    "Leaving home": {"start": ("08:15", 20), "duration": (480, 60), "probability": 0.6},
+    "office": {"start": ("09:30", 30), "duration": (180, 60), "probability": 0.4},
+    "laundry": {"start": ("10:30", 90), "probability": 0.3},
+    "lunch": {"start": ("12:30", 15), "duration": (30, 10), "probability": 0.8,
+              "cooking": (25, 10), "cooking_probability": 0.7},
+    "dishwasher": {"start": ("14:00", 30), "probability": 0.4},
+    "dinner": {"start": ("20:10", 15), "duration": (35, 10), "probability": 0.9,
+               "cooking": (30, 10), "cooking_probability": 0.8},
+    "sleeping": {"start": ("23:00", 30)},
+}
+IDLE_MOVE_MINUTES = (30, 15)  # time between two moves around the house when nothing is planned
+
+# Device type started by each appliance activity
+ACTIVITY_DEVICES = {"cooking": "oven", "office": "computer", "laundry": "washing_machine",
+                    "dishwasher": "dishwasher"}
+DEVICE_APPROACH = 8  # px from a device: close enough for its PIR, outside DEVICE_TOLERANCE
+DOOR_STEP_OUT = 40  # px beyond the entrance door
+DOOR_STEP_AWAY = 150  # px beyond the entrance door, out of sight of every PIR
+TRANSITION_SECONDS = 120  # gap between the end of an activity and the start of the next one
+
+DAY = 24 * 60 * 60
+
+
+def _minutes(time_str):
+    hour, minute = map(int, time_str.split(":"))
+    return hour * 60 + minute
+
+# Seconds a device stays on before switching itself off, None if it runs until it is turned off.
+def _program_seconds(device_type):
+    if device_type in CONTINUOUS_TYPES or REPEAT_BY_TYPE.get(device_type, False):
+        return None
+    profile = compiled_profile(device_type)
+    return profile.duration * 60 if profile and profile.keys else None
+
+def _hhmm(seconds_of_day):
+    minutes = int(seconds_of_day // 60)
+    return f"{minutes // 60 % 24:02d}:{minutes % 60:02d}"
+
+
+class RoutineGenerator:
+    """ Samples one daily schedule per simulated day from a routine (DEFAULT_ROUTINE by default) and turns it
+    into avatar moves and device toggles on the engine's scenario. Pass it as on_day to multiday.run_days():
+    each day folder also gets the planned schedule in routine.csv. `resident` is the engine resident (see
+    SimulationEngine.add_resident) the moves are for; the plans of the others go to routine_<name>.csv. """
+
+    def __init__(self, engine, seed=None, routine=None, resident=0):
+        self.engine = engine
+        self.resident = resident
+        self.rng = random.Random(seed)
+        self.routine = routine or DEFAULT_ROUTINE
+        self.asleep = False
+        self._find_targets()
+
+    # ---- scenario ----
+
+    def _find_targets(self):
+        points = self.engine.points
+        sensors = self.engine.sensors
+        weights = [(s[1], s[2]) for s in sensors if s[3] == "Weight"]
+
+        def weights_near(pattern, radius):
+            spots = [p[1:] for p in points if re.match(pattern, p[0], re.IGNORECASE)]
+            return [w for w in weights if any(calculate_distance(w[0], w[1], x, y) < radius for x, y in spots)]
+
+        self.beds = weights_near(r'^bed\d*$', BED_WEIGHT_DISTANCE)
+        self.seats = weights_near(r'^table\d*$', TABLE_WEIGHT_DISTANCE)
+        self.devices = {}
+        for device in self.engine.devices:
+            self.devices.setdefault(device[3].lower(), device)
+
+        if points:
+            self.center = (sum(p[1] for p in points) / len(points), sum(p[2] for p in points) / len(points))
+        else:
+            self.center = (0, 0)
+
+        # furniture and other named points, away from anything a click would toggle
+        def clear(x, y):
+            return (all(calculate_distance(x, y, wx, wy) >= WEIGHT_DISTANCE for wx, wy in weights) and
+                    all(abs(d[1] - x) > DEVICE_TOLERANCE or abs(d[2] - y) > DEVICE_TOLERANCE
+                        for d in self.engine.devices) and
+                    all(calculate_distance(x, y, (d[0] + d[2]) / 2, (d[1] + d[3]) / 2) > DOOR_TOLERANCE
+                        + calculate_distance(d[0], d[1], d[2], d[3]) / 2 for d in self.engine.doors))
+        self.idle_spots = [(x, y) for name, x, y in points if not re.match(r'^p\d+$', name) and clear(x, y)]
+
+        self.entrance = None
+        for door, switches, _ in self.engine.associations.switches_by_doors():
+            if any(s[0].lower() == "entrance" for s in switches):
+                x1, y1, x2, y2 = door[:4]
+                mx, my = (x1 + x2) / 2, (y1 + y2) / 2
+                length = calculate_distance(x1, y1, x2, y2) or 1
+                nx, ny = -(y2 - y1) / length, (x2 - x1) / length
+                if nx * (mx - self.center[0]) + ny * (my - self.center[1]) < 0:
+                    nx, ny = -nx, -ny
+                # coming back home, the first step inside must be seen by a PIR (see detect_entering_home)
+                inside = [(mx - nx * d, my - ny * d) for d in range(DOOR_STEP_OUT, 201, 20)]
+                inside += sorted(self.idle_spots, key=lambda p: calculate_distance(mx, my, p[0], p[1]))
+                step_in = next((p for p in inside if clear(*p) and find_closest_sensor_within_fov(
+                    p, sensors, self.engine.walls_coordinates, self.engine.doors, MAX_DISTANCE, FOV_ANGLE)),
+                    inside[0])
+                self.entrance = ((mx, my), (nx, ny), step_in)
+                break
+
+    def _approach(self, device):
+        x, y = device[1], device[2]
+        dx, dy = self.center[0] - x, self.center[1] - y
+        norm = math.hypot(dx, dy) or 1
+        return x + dx / norm * DEVICE_APPROACH, y + dy / norm * DEVICE_APPROACH
+
+    # ---- sampling ----
+
+    def _gauss_minutes(self, spec, default=(1, 0), minimum=1):
+        mean, std = spec or default
+        return max(minimum, self.rng.gauss(mean, std))
+
+    # [(activity, start, end, free)] in seconds of the day, starting no earlier than `now`. The person does one
+    # thing at a time and is free again at `free`: the end of the activity, or right after starting an appliance
+    # that then runs its program until `end`.
+    def sample_day(self, now=0):
+        drawn = []
+        for name, spec in self.routine.items():
+            if self.rng.random() >= spec.get("probability", 1.0):
+                continue
+            mean, std = spec["start"]
+            start = (_minutes(mean) + self.rng.gauss(0, std)) * 60
+            cooking = 0
+            if name in MEAL_SLOTS and self.rng.random() < spec.get("cooking_probability", 0.0):
+                cooking = self._gauss_minutes(spec.get("cooking")) * 60
+                program = self._program("cooking")
+                if program is not None:
+                    cooking = min(cooking, program)
+            drawn.append((start, name, cooking, self._gauss_minutes(spec.get("duration")) * 60))
+        drawn.sort()
+
+        plan = []
+        busy_until = now
+        for start, name, cooking, duration in drawn:
+            start = max(start, busy_until)
+            if name in MEAL_SLOTS:
+                slot_start, slot_end = (h * 3600 for h in MEAL_SLOTS[name])
+                start = max(start, slot_start - cooking)
+                if start + cooking + TRANSITION_SECONDS + (MEAL_MIN_DURATION + 1) * 60 > slot_end:
+                    continue
+                if cooking:
+                    plan.append(("cooking", start, start + cooking, start + cooking))
+                    start += cooking + TRANSITION_SECONDS
+            end = free = DAY if name == "sleeping" else start + duration
+            program = self._program(name)
+            if name in ("laundry", "dishwasher") and program is not None:
+                end = start + program
+            if start >= DAY or (name != "sleeping" and end >= DAY):
+                continue
+            plan.append((name, start, end, free))
+            busy_until = free + TRANSITION_SECONDS
+        return plan
+
+    def _program(self, activity):
+        device = self.devices.get(ACTIVITY_DEVICES.get(activity))
+        return _program_seconds(device[3]) if device else None
+
+    # ---- moves ----
+
+    # Timed actions ("move" | "device", (x, y)) for the plan, in seconds of the day.
+    def _actions(self, plan):
+        actions = []
+
+        def move(t, xy):
+            actions.append((t, "move", xy))
+
+        def toggle(t, device):
+            actions.append((t, "device", (device[1], device[2])))
+
+        def idle(t):
+            if self.idle_spots:
+                move(t, self.rng.choice(self.idle_spots))
+
+        for name, start, end, free in plan:
+            if name == "wake up":
+                idle(start)
+                continue
+            elif name in ACTIVITY_DEVICES:
+                device = self.devices.get(ACTIVITY_DEVICES[name])
+                if device is None:
+                    continue
+                move(start, self._approach(device))
+                toggle(start + 1, device)
+                # turned off by hand only if it would still be running at the end (toggling twice turns it on)
+                program = _program_seconds(device[3])
+                if name in ("cooking", "office") and (program is None or end - start < program):
+                    toggle(end - 1, device)
+            elif name in MEAL_SLOTS:
+                if self.seats:
+                    move(start, self.rng.choice(self.seats))
+            elif name == "Leaving home":
+                if self.entrance is None:
+                    continue
+                (mx, my), (nx, ny), step_in = self.entrance
+                # open, step out, close behind, walk away; coming back: open, close, step in
+                move(start, (mx, my))
+                move(start + 15, (mx + nx * DOOR_STEP_OUT, my + ny * DOOR_STEP_OUT))
+                move(start + 30, (mx, my))
+                move(start + 45, (mx + nx * DOOR_STEP_AWAY, my + ny * DOOR_STEP_AWAY))
+                move(end, (mx, my))
+                move(end + 15, (mx, my))
+                move(end + 30, step_in)
+            elif name == "sleeping":
+                if self.beds:
+                    move(start, self.rng.choice(self.beds))
+                continue
+
+            # back to moving around the house until the next activity
+            idle(free + TRANSITION_SECONDS / 2)
+        return actions
+
+    # Moves around the house every IDLE_MOVE_MINUTES between planned activities, while awake and at home.
+    def _idle_actions(self, plan, now):
+        actions = []
+        awake = not self.asleep
+        t = now
+        for name, start, _, free in plan + [(None, DAY, DAY, DAY)]:
+            if awake and self.idle_spots:
+                t += self._gauss_minutes(IDLE_MOVE_MINUTES, minimum=5) * 60
+                while t < start - TRANSITION_SECONDS:
+                    actions.append((t, "move", self.rng.choice(self.idle_spots)))
+                    t += self._gauss_minutes(IDLE_MOVE_MINUTES, minimum=5) * 60
+            if name == "sleeping":
+                awake = False
+            elif name == "wake up":
+                awake = True
+            t = max(t, free + TRANSITION_SECONDS)
+        return actions
+
+    # ---- multiday.run_days() callback ----
+
+    def __call__(self, engine, day_start, day_dir):
+        now = engine.clock.get_simulated_timestamp() % DAY
+        plan = self.sample_day(now)
+        actions = self._actions(plan) + self._idle_actions(plan, now)
+        for t, kind, (x, y) in actions:
+            if t < now:
+                continue
+            when = day_start + t - now
+            if kind == "move":
+                engine.schedule_move(when, int(round(x)), int(round(y)), self.resident)
+            else:
+                engine.schedule_device_toggle(when, x, y)
+
+        rows = []
+        wake = next((start for name, start, *_ in plan if name == "wake up"), None)
+        if self.asleep and wake is not None:
+            rows.append(("sleeping", _hhmm(now), _hhmm(wake)))
+        rows += [(name, _hhmm(start), _hhmm(min(end, DAY - 60))) for name, start, end, _ in plan
+                 if name != "wake up"]
+        if wake is not None:
+            self.asleep = False
+        if any(name == "sleeping" for name, *_ in plan):
+            self.asleep = True
+        filename = "routine.csv" if self.resident == 0 else f"routine_{engine.residents[self.resident].name}.csv"
+        self._save_plan(rows, os.path.join(day_dir, filename))
+
+    @staticmethod
+    def _save_plan(rows, filename):
+        try:
+            with open(filename, mode="w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["activity", "start", "end"])
+                writer.writerows(rows)
+        except Exception as e:
+            print(f"[ERROR] Saving failed: {e}")
+
+
+# Generate `days` days of labelled data on a scenario: output_dir/<YYYY-MM-DD>/ as in multiday.run_days(),
+# plus the planned schedule of each day in routine.csv. With `residents` > 1 every resident follows its own
+# sample of the routine (seed, seed + 1, ...) and has its own routine_<name>.csv. `nilm` is passed to run_days().
+def generate(scenario_path, days, output_dir, seed=None, start_date=None, routine=None, residents=1, nilm=False):
+    engine = SimulationEngine.from_file(scenario_path, clock=VirtualClock("00:00", start_date))
+    for _ in range(residents - 1):
+        engine.add_resident()
+    generators = [RoutineGenerator(engine, None if seed is None else seed + k, routine, k)
+                  for k in range(residents)]
+    if residents == 1:
+        return run_days(engine, days, output_dir, generators[0], nilm)
+
+    def on_day(engine, day_start, day_dir):
+        for generator in generators:
+            generator(engine, day_start, day_dir)
+
+    return run_days(engine, days, output_dir, on_day, nilm)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate days of randomly sampled daily routines.")
+    parser.add_argument("scenario", help="scenario file (read_scenario.csv format)")
+    parser.add_argument("--days", type=int, default=30, help="number of simulated days")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    parser.add_argument("--start-date", default=None, help="first simulated day, YYYY-MM-DD (default: today)")
+    parser.add_argument("--out", default="logs", help="output folder")
+    parser.add_argument("--residents", type=int, default=1, help="number of residents, each with its own routine")
+    parser.add_argument("--traces", default=None,
+                        help="folder of recorded power traces, <device type>/*.csv (default: built-in profiles)")
+    parser.add_argument("--nilm", action="store_true", help="also write the 1 s mains and device power of each day")
+    args = parser.parse_args()
+
+    if args.traces:
+        use_trace_library(TraceLibrary(args.traces, seed=args.seed))
+
+    out = os.path.join(args.out, datetime.now().strftime("%Y%m%d_%H%M%S") + f"_routine_{args.days}days")
+    generate(args.scenario, args.days, out, args.seed, args.start_date, residents=args.residents, nilm=args.nilm)
+    print(f"[LOG] {args.days} days written to '{out}'")
@@ -0,0 +1,45 @@
+import heapq
+import itertools
+
+
+class ScheduledEvent:
+    __slots__ = ("time", "seq", "kind", "callback", "args")
+
+    def __init__(self, time, seq, kind, callback, args):
+        self.time = time
+        self.seq = seq
+        self.kind = kind
+        self.callback = callback
+        self.args = args
+
+    def __lt__(self, other):
+        return (self.time, self.seq) < (other.time, other.seq)
+
+    def __repr__(self):
+        return f"ScheduledEvent({self.time}, {self.kind})"
+
+
+class EventScheduler:
+    """ Priority queue of pending events keyed by simulated time (seconds).
+    Events with the same time are returned in the order they were scheduled. """
+
+    def __init__(self):
+        self._queue = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def __bool__(self):
+        return bool(self._queue)
+
+    def schedule(self, time, kind, callback=None, *args):
+        event = ScheduledEvent(time, next(self._counter), kind, callback, args)
+        heapq.heappush(self._queue, event)
+        return event
+
+    def peek_time(self):
+        return self._queue[0].time if self._queue else None
+
+    def pop(self):
+        return heapq.heappop(self._queue) if self._queue else None
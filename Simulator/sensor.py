@@ -1,17 +1,13 @@
-import tkinter as tk
-from tkinter import simpledialog, messagebox
-from tkinter import ttk
-
 from utils import draw_sensor, calculate_distance, update_sensor_color
 from common import sensor_states
-from device import devices
 from datetime import datetime
 from common import active_cycles
-from consumption_profiles import get_device_consumption, consumption_profiles
+from consumption_profiles import get_device_consumption, profile_for
 from read import read_sensors as sensors_file
 from read import read_devices as devices_file
+from registry import SensorRegistry, find_device, update_sensor
 
-sensors = []
+sensors = SensorRegistry()
 add_point_enabled = False
 
 def get_sensor_params(sensor_type):
@@ -30,6 +26,7 @@ def add_sensor(canvas, event, load_active):
         return
     x = int(canvas.canvasx(event.x))
     y = int(canvas.canvasy(event.y))
+    from dialogs import SensorDialog
     dialog = SensorDialog(canvas.master, "Add sensor")
     if dialog.result:
         name, type, min_val, max_val, step, state, direction, consumption, associated_device = dialog.result
@@ -50,15 +47,23 @@ def changePIR(canvas, sensor, sensors, new_state=None):
     state = float(state)
     if new_state is None:
         new_state = 1 if state == 0 else 0
-    updated_sensors = []
-    for s in sensors:
-        if s == sensor:
-            updated_sensors.append((name, x, y, type, min_val, max_val, step, new_state, direction, consumption, associated_device))
-        elif s[3] == "PIR":
-            updated_sensors.append((s[0], s[1], s[2], s[3], s[4], s[5], s[6], 0, s[8], s[9], s[10]))
-            update_sensor_color(canvas, s[0], 0, s[4])
-        else:
-            updated_sensors.append(s)
+    if isinstance(sensors, SensorRegistry):
+        # only the PIRs are touched: every other one goes back to 0
+        for s in sensors.of_type("PIR"):
+            if s.name != name:
+                s.state = 0
+                update_sensor_color(canvas, s.name, 0, s.min)
+        updated_sensors = update_sensor(sensors, sensor, state=new_state)
+    else:
+        updated_sensors = []
+        for s in sensors:
+            if s == sensor:
+                updated_sensors.append((name, x, y, type, min_val, max_val, step, new_state, direction, consumption, associated_device))
+            elif s[3] == "PIR":
+                updated_sensors.append((s[0], s[1], s[2], s[3], s[4], s[5], s[6], 0, s[8], s[9], s[10]))
+                update_sensor_color(canvas, s[0], 0, s[4])
+            else:
+                updated_sensors.append(s)
     update_sensor_color(canvas, name, new_state, float(min_val))
     return name, new_state, updated_sensors
 
@@ -77,19 +82,15 @@ def changeTemperature(canvas, sensor, sensors, heating_factor, delta_seconds):
         else:
             new_state = max(state - (step * delta_seconds), min_val)
         new_state = round(new_state * 2) / 2.0
-        updated_sensors = []
-        for s in sensors:
-            if s == sensor:
-                updated_sensor = (name, x, y, type, min_val, max_val, step, new_state, direction, consumption, associated_device)
-                updated_sensors.append(updated_sensor)
-            else:
-                updated_sensors.append(s)
+        updated_sensors = update_sensor(sensors, sensor, min=min_val, max=max_val, step=step, state=new_state)
         update_sensor_color(canvas, name, new_state, min_val)
         return name, new_state, updated_sensors
     return None, None, sensors
 
 
-def changeSmartMeter(canvas, sensor, sensors, devices, delta_seconds, current_datetime):
+def changeSmartMeter(canvas, sensor, sensors, devices, delta_seconds, current_datetime, cycles=None):
+    if cycles is None:
+        cycles = active_cycles
     if len(sensor) < 11:
         print(f"[WARN] Unexpected Smart Meter structure: {sensor}")
         return sensor[0] if sensor else None, 0.0, sensors
@@ -99,41 +100,27 @@ def changeSmartMeter(canvas, sensor, sensors, devices, delta_seconds, current_da
     new_consumption = 0.0
     if associated_device:
         # searches for the associated device both among runtimes and among those loaded from files
-        associated_dev = next((d for d in devices if d[0] == associated_device), None)
-        if not associated_dev and devices:
-            associated_dev = next((d for d in devices if d[0] == associated_device), None)
+        associated_dev = find_device(devices or [], associated_device)
         if not associated_dev and devices_file:
-            associated_dev = next((d for d in devices_file if d[0] == associated_device), None)
+            associated_dev = find_device(devices_file, associated_device)
 
         if associated_dev:
             dev_name, _, _, dev_type, _, dev_state, *_ = associated_dev
 
             if dev_state == 1:
-                if dev_name in active_cycles:
+                if dev_name in cycles:
+                    # the profile of the cycle, as update_devices_consumption draws it
                     new_consumption = get_device_consumption(
-                        dev_name, dev_type, current_datetime, active_cycles, dev_state
+                        dev_name, cycles[dev_name][1], current_datetime, cycles, dev_state
                     )
                 else:
-                    prof = consumption_profiles.get(dev_type)
-                    if prof:
-                        profile = prof["profile"]
-                        if profile:
-                            first_key = sorted(profile)[0]
-                            new_consumption = profile[first_key]
-                        else:
-                            new_consumption = 0.0
-                    else:
-                        new_consumption = 0.0
+                    profile = profile_for(dev_name, dev_type)
+                    new_consumption = float(profile.values[0]) if profile and len(profile.values) else 0.0
             else:
                 new_consumption = 0.0
 
     # update the sensor array with new consumption
-    updated = []
-    for s in sensors:
-        if s == sensor:
-            updated.append((name, x, y, type, min_val, max_val, step, state, direction, new_consumption, associated_device))
-        else:
-            updated.append(s)
+    updated = update_sensor(sensors, sensor, consumption=new_consumption)
 
     # update color (green if above minimum threshold)
     update_sensor_color(canvas, name, new_consumption, min_val)
@@ -145,84 +132,6 @@ def ChangeWeight(canvas, sensor, sensors, new_state):
         print(f"Error: unexpected Weight structure {sensor}")
         return None, None, sensors
     name, x, y, type, min_val, max_val, step, state, direction, consumption, associated_device = sensor
-    updated_sensors = []
-    for s in sensors:
-        if s == sensor:
-            updated_sensor = (name, x, y, type, min_val, max_val, step, new_state, direction, consumption, associated_device)
-            updated_sensors.append(updated_sensor)
-        else:
-            updated_sensors.append(s)
+    updated_sensors = update_sensor(sensors, sensor, state=new_state)
     update_sensor_color(canvas, name, new_state, float(min_val))
     return name, new_state, updated_sensors
-
-class SensorDialog(simpledialog.Dialog):
-    def body(self, master):
-        tk.Label(master, text="Sensor name:").grid(row=0)
-        tk.Label(master, text="Sensor type:").grid(row=1)
-        self.sensor_name = tk.Entry(master)
-        self.sensor_name.grid(row=0, column=1)
-        self.sensor_type = ttk.Combobox(master, values=["PIR", "Temperature", "Switch", "Smart Meter", "Weight"])
-        self.sensor_type.grid(row=1, column=1)
-        self.sensor_type.current(0)
-        self.direction_label = tk.Label(master, text="Direction (degrees):")
-        self.direction_entry = tk.Entry(master)
-        self.associated_device_label = tk.Label(master, text="Associated device:")
-
-        # Merge runtime + devices loaded from files (without duplicates)
-        devices_names_runtime = [d[0] for d in devices] if devices else []
-        devices_names_file = [d[0] for d in devices_file] if devices_file else []
-        devices_names = sorted(set(devices_names_runtime + devices_names_file))
-
-        self.associated_device_combobox = ttk.Combobox(master, values=devices_names)
-        self.sensor_type.bind("<<ComboboxSelected>>", self.on_sensor_type_selected)
-        return self.sensor_name
-
-    # Show 'direction' for PIR or 'associated device' for Smart Meter only.
-    def on_sensor_type_selected(self, event):
-        type = self.sensor_type.get()
-        if type == "PIR":
-            self.direction_label.grid(row=2, column=0)
-            self.direction_entry.grid(row=2, column=1)
-            self.associated_device_label.grid_remove()
-            self.associated_device_combobox.grid_remove()
-        elif type == "Smart Meter":
-            self.direction_label.grid_remove()
-            self.direction_entry.grid_remove()
-            self.associated_device_label.grid(row=2, column=0)
-            self.associated_device_combobox.grid(row=2, column=1)
-            if self.associated_device_combobox['values']:
-                self.associated_device_combobox.current(0)
-        else:
-            self.direction_label.grid_remove()
-            self.direction_entry.grid_remove()
-            self.associated_device_label.grid_remove()
-            self.associated_device_combobox.grid_remove()
-
-    # Check for empty/duplicate name; require direction (PIR) or device (Smart Meter).
-    def validate(self):
-        name = self.sensor_name.get().strip()
-        if not name:
-            messagebox.showwarning("Input not valid", "Sensor name cannot be empty.")
-            return False
-        for s in sensors + sensors_file:
-            if name == s[0]:
-                messagebox.showwarning("Input not valid", "Sensor name already exists.")
-                return False
-        if self.sensor_type.get() == "PIR" and not self.direction_entry.get().strip():
-            messagebox.showwarning("Input not valid", "Pir sensor direction cannot be empty.")
-            return False
-        if self.sensor_type.get() == "Smart Meter" and not self.associated_device_combobox.get():
-            messagebox.showwarning("Input not valid", "Select a device to associate with the Smart Meter.")
-            return False
-        return True
-
-    def apply(self):
-        name = self.sensor_name.get()
-        type = self.sensor_type.get()
-        params = get_sensor_params(type)
-        if type == "PIR":
-            direction = float(self.direction_entry.get())
-            params["direction"] = direction
-        associated_device = self.associated_device_combobox.get() if type == "Smart Meter" else None
-        self.result = (name, type, params["min"], params["max"], params["step"],
-                       params["state"], params.get("direction", None), params["consumption"], associated_device)
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+SIMULATOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SIMULATOR_DIR)
+
+import consumption_profiles  # noqa: E402  (needs the path above)
+
+SCENARIO = os.path.join(SIMULATOR_DIR, "read_scenario.csv")
+
+
+# Scenario shipped with the simulator, used by the end-to-end tests.
+@pytest.fixture
+def scenario():
+    return SCENARIO
+
+
+# The trace library is module state of consumption_profiles: never leak one into the next test.
+@pytest.fixture(autouse=True)
+def no_trace_library():
+    yield
+    consumption_profiles.use_trace_library(None)
@@ -0,0 +1,43 @@
+import os
+import random
+from datetime import datetime, timedelta
+
+from batch import GENERATED_ROUTINE, jitter_moves, make_jobs, run_batch
+
+START = datetime(2026, 1, 1, 7, 0)
+
+
+def read_outputs(run_dir):
+    outputs = {}
+    for folder, _, files in os.walk(run_dir):
+        for name in files:
+            if name == "console.txt":  # names the run folder
+                continue
+            path = os.path.join(folder, name)
+            with open(path, "rb") as f:
+                outputs[os.path.relpath(path, run_dir)] = f.read()
+    return outputs
+
+
+# A seed always gives the same jitter, which keeps the order of the moves and whole minutes between them.
+def test_jitter_is_seeded_and_keeps_order():
+    moves = [(START + timedelta(minutes=m), m, 0) for m in (0, 5, 6, 30, 90)]
+    end = START + timedelta(minutes=120)
+    first = jitter_moves(moves, end, random.Random(3))
+    assert first == jitter_moves(moves, end, random.Random(3))
+    jittered, jittered_end = first
+    assert [m[1:] for m in jittered] == [m[1:] for m in moves]
+    assert all(a[0] <= b[0] for a, b in zip(jittered, jittered[1:]))
+    assert all(m[0].second == 0 for m in jittered)
+    assert jittered_end - jittered[-1][0] == end - moves[-1][0]
+
+
+# Runs are independent: a pool of workers writes what the same jobs write one after the other.
+def test_pool_matches_sequential_runs(tmp_path, scenario):
+    jobs = make_jobs([scenario], [GENERATED_ROUTINE], seeds=[1, 2])
+    sequential = run_batch(jobs, str(tmp_path / "sequential"), processes=1)
+    pooled = run_batch(jobs, str(tmp_path / "pooled"), processes=2)
+    assert all(ok for _, ok in sequential + pooled)
+    outputs = [read_outputs(path) for path, _ in sequential]
+    assert outputs[0] != outputs[1]
+    assert [read_outputs(path) for path, _ in pooled] == outputs
@@ -0,0 +1,59 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from clock import (VirtualClock, datetime_to_timestamp, timestamp_to_datetime, format_timestamp, date_to_timestamp,
+                   SIMULATED_SECONDS_PER_TIMER_SECOND)
+
+
+# The numeric timestamps are the datetimes of the simulated calendar, to the second.
+def test_timestamps_round_trip():
+    rng = random.Random(0)
+    for _ in range(500):
+        dt = datetime(2000, 1, 1) + timedelta(seconds=rng.randrange(60 * 365 * 86400))
+        ts = datetime_to_timestamp(dt)
+        assert timestamp_to_datetime(ts) == dt
+        assert format_timestamp(ts) == dt.strftime("%Y-%m-%d %H:%M")
+        assert date_to_timestamp(dt.strftime("%Y-%m-%d")) == ts - (dt.hour * 3600 + dt.minute * 60 + dt.second)
+
+
+# The clock reads what datetime arithmetic from the start hour gives, across midnights and month ends.
+def test_virtual_clock_follows_the_calendar():
+    clock = VirtualClock("22:30", "2026-01-30")
+    start = datetime(2026, 1, 30, 22, 30)
+    rng = random.Random(1)
+    for _ in range(200):
+        clock.advance_simulated(rng.uniform(0, 20000))
+        expected = start + timedelta(seconds=int(clock.simulated_seconds))
+        assert clock.get_simulated_datetime() == expected
+        assert clock.get_simulated_time() == expected.strftime("%H:%M")
+        assert clock.current_date == expected.strftime("%Y-%m-%d")
+        midnight = clock.next_midnight()
+        assert clock.simulated_seconds < midnight <= clock.simulated_seconds + 86400
+        assert start + timedelta(seconds=midnight) == datetime.combine(expected.date() + timedelta(days=1),
+                                                                       datetime.min.time())
+
+
+# advance() counts timer seconds (simulated minutes), as TimerApp does; advance_to() never goes back.
+def test_advance_and_elapsed_time():
+    clock = VirtualClock("07:00", "2026-01-01")
+    clock.advance(3)
+    assert clock.simulated_seconds == 3 * SIMULATED_SECONDS_PER_TIMER_SECOND
+    assert clock.elapsed_time == timedelta(seconds=3)
+    clock.advance_to(100)
+    clock.advance_to(50)
+    assert clock.simulated_seconds == 180
+    clock.advance_to(3600.5)
+    assert clock.get_simulated_time() == "08:00"
+
+
+# A clock with a speed runs against the wall clock once started and stops with it.
+def test_real_time_clock():
+    clock = VirtualClock("07:00", "2026-01-01", speed=1000)
+    clock.start_stop()
+    time.sleep(0.05)
+    clock.start_stop()
+    moved = clock.simulated_seconds
+    assert 50 <= moved < 5000
+    time.sleep(0.02)
+    assert clock.simulated_seconds == moved
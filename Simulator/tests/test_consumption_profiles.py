@@ -0,0 +1,90 @@
+import random
+
+import numpy as np
+import pytest
+
+import consumption_profiles as consumption_profiles_module
+from consumption_profiles import (consumption_profiles, compiled_profile, consumption_step, interpolated_consumption,
+                                  reset_compiled_profiles, REPEAT_BY_TYPE)
+
+DEVICE_TYPES = sorted(consumption_profiles)
+
+
+# The linear scans that CompiledProfile replaced, kept here as the reference.
+def scan_step(profile, minutes, standby, repeat=False):
+    if not profile:
+        return standby
+    keys = sorted(profile)
+    duration = keys[-1]
+    t = minutes % duration if repeat and duration > 0 else minutes
+    if t < keys[0]:
+        return profile[keys[0]]
+    last_key = keys[0]
+    for k in keys:
+        if t < k:
+            return profile[last_key]
+        last_key = k
+    return profile[keys[-1]]
+
+def scan_interpolated(profile, minutes, standby):
+    keys = sorted(profile)
+    if not keys:
+        return standby
+    if minutes <= keys[0]:
+        return profile[keys[0]]
+    elif minutes >= keys[-1]:
+        return profile[keys[-1]]
+    for i in range(len(keys) - 1):
+        t1, t2 = keys[i], keys[i + 1]
+        if t1 <= minutes < t2:
+            c1, c2 = profile[t1], profile[t2]
+            return c1 + (c2 - c1) * ((minutes - t1) / (t2 - t1))
+    return profile[keys[0]]
+
+# Random minutes around a profile plus every key and every whole minute of it.
+def sample_minutes(device_type):
+    rng = random.Random(device_type)
+    profile = consumption_profiles[device_type]["profile"]
+    return ([rng.uniform(-5, 600) for _ in range(500)] + [float(k) for k in profile]
+            + [float(m) for m in range(-2, int(max(profile)) * 2 + 3)])
+
+
+@pytest.mark.parametrize("device_type", DEVICE_TYPES)
+@pytest.mark.parametrize("repeat", [False, True])
+def test_step_matches_scan(device_type, repeat):
+    entry = consumption_profiles[device_type]
+    for m in sample_minutes(device_type):
+        assert consumption_step(entry["profile"], m, entry["standby"], repeat) == \
+               scan_step(entry["profile"], m, entry["standby"], repeat)
+
+
+@pytest.mark.parametrize("device_type", DEVICE_TYPES)
+def test_compiled_profile_matches_scan(device_type):
+    entry = consumption_profiles[device_type]
+    profile = compiled_profile(device_type)
+    repeat = REPEAT_BY_TYPE.get(device_type, False)
+    minutes = sample_minutes(device_type)
+    expected = [scan_step(entry["profile"], m, entry["standby"], repeat) for m in minutes]
+    assert [profile.step(m) for m in minutes] == expected
+    assert np.asarray(profile.values)[profile.indexes(np.array(minutes))].tolist() == expected
+
+
+@pytest.mark.parametrize("device_type", DEVICE_TYPES)
+def test_interpolated_matches_scan(device_type):
+    entry = consumption_profiles[device_type]
+    for m in sample_minutes(device_type):
+        assert interpolated_consumption(entry["profile"], m, entry["standby"]) == \
+               scan_interpolated(entry["profile"], m, entry["standby"])
+
+
+# A plain dict is compiled once, not on every call, until reset_compiled_profiles() after editing it.
+def test_dict_profile_compiled_once():
+    profile = {0: 10.0, 5: 20.0}
+    assert consumption_step(profile, 6, 0) == 20.0
+    compiled = consumption_profiles_module._dict_profiles[(id(profile), 0, False)][1]
+    assert interpolated_consumption(profile, 2.5, 0) == 15.0
+    assert consumption_step(profile, 1, 0) == 10.0
+    assert consumption_profiles_module._dict_profiles[(id(profile), 0, False)][1] is compiled
+    profile[5] = 30.0
+    reset_compiled_profiles()
+    assert consumption_step(profile, 6, 0) == 30.0
@@ -0,0 +1,89 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from clock import VirtualClock
+from consumption_profiles import consumption_profiles, compiled_profile, energy_between, get_device_consumption
+from energy import EnergyLedger
+from engine import SimulationEngine
+
+OVEN_AT = (868, 597)  # the Oven of the shipped scenario
+START = datetime(2026, 3, 1, 7, 0)
+
+
+# Wh from sampling the drawn power at the middle of every second of [t0, t1): nothing before the start of the
+# cycle, nor once a program that does not loop or keep going is switched off at the end of its profile.
+def sampled_energy(profile, start, t0, t1):
+    seconds = np.arange((t0 - start).total_seconds(), (t1 - start).total_seconds()) + 0.5
+    minutes = seconds / 60.0
+    drawing = minutes >= 0
+    if not profile.repeat and not profile.continuous:
+        drawing &= minutes < profile.end
+    if not drawing.any():
+        return 0.0
+    power = np.asarray(profile.values, dtype=np.float64)[profile.indexes(minutes[drawing])]
+    return power.sum() / 3600.0
+
+
+# The closed form is the sum of 1 s samples, over ranges that start before the cycle, cross whole loops of the
+# repeating profiles and go past the end of the programs.
+@pytest.mark.parametrize("device_type", sorted(consumption_profiles))
+def test_energy_between_matches_1s_sampling(device_type):
+    rng = random.Random(device_type)
+    profile = compiled_profile(device_type)
+    for _ in range(25):
+        t0 = START + timedelta(minutes=rng.randint(-60, 400))
+        t1 = t0 + timedelta(minutes=rng.randint(0, 600))
+        assert energy_between(device_type, START, t0, t1) == \
+               pytest.approx(sampled_energy(profile, START, t0, t1), rel=1e-9, abs=1e-9)
+
+
+# The samples are the ones get_device_consumption returns, second by second.
+@pytest.mark.parametrize("device_type", sorted(consumption_profiles))
+def test_samples_are_the_drawn_power(device_type):
+    profile = compiled_profile(device_type)
+    cycles = {"d": (START, device_type)}
+    t1 = START + timedelta(minutes=min(profile.end, 120))
+    drawn = sum(get_device_consumption("d", device_type, START + timedelta(seconds=k + 0.5), cycles)
+                for k in range(int((t1 - START).total_seconds()))) / 3600.0
+    assert sampled_energy(profile, START, START, t1) == pytest.approx(drawn, rel=1e-9, abs=1e-9)
+
+
+# A cycle switched off early stops counting at the switch-off; the one left to end draws its final step for the
+# minute before it is switched off.
+def test_ledger_cuts_cycles_at_switch_off():
+    profile = compiled_profile("Oven")
+    ledger = EnergyLedger()
+    ledger.started("oven", START, "Oven")
+    ledger.stopped("oven", START + timedelta(minutes=4))
+    ledger.started("oven", START + timedelta(minutes=30), "Oven")
+    day_end = START + timedelta(hours=12)
+    expected = profile.energy(0, 4) + profile.energy(0, profile.end)
+    assert ledger.energy("oven", START, day_end) == pytest.approx(expected)
+    assert ledger.report(START, day_end) == [("oven", "Oven", pytest.approx(expected))]
+    assert profile.energy(0, profile.end) == \
+           pytest.approx(profile.energy(0, profile.duration) + profile.values[-1] / 60.0)
+    # a day only counts its part of the cycles
+    assert ledger.energy("oven", START + timedelta(minutes=2), START + timedelta(minutes=32)) == \
+           pytest.approx(profile.energy(2, 4) + profile.energy(0, 2))
+    ledger.forget_before(START + timedelta(minutes=10))
+    assert ledger.cycles("oven") == [(START + timedelta(minutes=30), None, "Oven")]
+
+
+# The energy of a program includes its final step up to the switch-off: at the first update past the end of the
+# profile (here a wakeup 20 s later), one minute later at most.
+@pytest.mark.parametrize("update_after, drawn", [(20, 20), (None, 60)])
+def test_ledger_counts_final_step_until_switch_off(scenario, update_after, drawn):
+    engine = SimulationEngine.from_file(scenario, clock=VirtualClock("07:00", "2026-01-01"))
+    profile = compiled_profile("Oven")
+    engine.schedule_device_toggle(0, *OVEN_AT)
+    if update_after is not None:
+        engine.schedule_wakeup(profile.duration * 60 + update_after)
+    engine.run_until(3600)
+
+    [(start, end, _)] = engine.energy.cycles("ov")
+    assert end == start + timedelta(minutes=profile.duration, seconds=drawn)
+    assert engine.energy_between("ov", start, start + timedelta(hours=1)) == \
+           pytest.approx(profile.energy(0, profile.duration) + profile.values[-1] * drawn / 3600.0)
@@ -0,0 +1,149 @@
+import random
+
+import numpy as np
+import pytest
+
+from geometry import (OCCLUSION_CELL_SIZE, DoorList, PointTree, SegmentGrid, WallCoordinates, blocked_mask,
+                      hit_matrix, nearest_hits)
+from registry import SensorRegistry
+from utils import (calculate_distance, find_closest_sensor_without_intersection, intersect, is_path_blocked_by_walls,
+                   paths_blocked)
+
+
+# Segments with integer ends, many of them on cell borders, axis-aligned or reduced to a point.
+def random_segment(rng, size=400):
+    def coordinate():
+        if rng.random() < 0.3:
+            return rng.randrange(-1, size // OCCLUSION_CELL_SIZE + 1) * OCCLUSION_CELL_SIZE
+        return rng.randrange(-20, size)
+    x1, y1 = coordinate(), coordinate()
+    shape = rng.random()
+    if shape < 0.2:
+        return x1, y1, x1, coordinate()
+    if shape < 0.4:
+        return x1, y1, coordinate(), y1
+    if shape < 0.45:
+        return x1, y1, x1, y1
+    return x1, y1, coordinate(), coordinate()
+
+
+def random_door(rng):
+    return (*random_segment(rng), rng.choice(["open", "close"]))
+
+
+# The grid never misses a segment that meets the query segment, whichever way the query runs.
+@pytest.mark.parametrize("seed", range(5))
+def test_grid_finds_every_crossing_segment(seed):
+    rng = random.Random(seed)
+    segments = [random_segment(rng) for _ in range(150)]
+    grid = SegmentGrid()
+    for key, segment in enumerate(segments):
+        grid.add(key, *segment)
+    for _ in range(500):
+        query = random_segment(rng)
+        crossing = {k for k, s in enumerate(segments) if intersect(*query, *s)}
+        assert crossing <= set(grid.along(*query))
+        assert crossing <= set(grid.along(*query[2:], *query[:2]))
+
+
+# The indexed walls and doors block the paths the plain lists block, while walls are added coordinate by coordinate,
+# replaced and removed and doors toggled, added and removed.
+@pytest.mark.parametrize("seed", range(5))
+def test_indexed_walls_and_doors_block_like_lists(seed):
+    rng = random.Random(seed)
+    walls, doors = WallCoordinates(), DoorList(random_door(rng) for _ in range(5))
+    for coordinate in [c for _ in range(30) for c in random_segment(rng)]:
+        walls.append(coordinate)
+    for _ in range(100):
+        op = rng.randrange(5)
+        if op == 0:
+            walls.extend(random_segment(rng))
+        elif op == 1 and len(walls) >= 8:
+            i = rng.randrange(len(walls) // 4 - 1) * 4
+            walls[i:i + 4] = random_segment(rng)
+        elif op == 2 and len(walls) >= 8:
+            i = rng.randrange(len(walls) // 4 - 1) * 4
+            del walls[i:i + 4]
+        elif op == 3 and doors:
+            i = rng.randrange(len(doors))
+            doors[i] = (*doors[i][:4], "open" if doors[i][4] == "close" else "close")
+        else:
+            doors.append(random_door(rng))
+        for _ in range(20):
+            path = random_segment(rng)
+            assert (is_path_blocked_by_walls(*path, walls, doors)
+                    == is_path_blocked_by_walls(*path, list(walls), list(doors)))
+
+
+# The batch kernel agrees exactly with utils.intersect on integer coordinates, touching ends and collinear
+# overlaps included; nearest_hits picks a hit segment whose crossing is the closest to the start of the ray.
+@pytest.mark.parametrize("seed", range(5))
+def test_kernel_matches_intersect(seed):
+    rng = random.Random(seed)
+    rays = [random_segment(rng, 120) for _ in range(300)]
+    segments = [random_segment(rng, 120) for _ in range(80)]
+    expected = np.array([[intersect(*ray, *segment) for segment in segments] for ray in rays])
+    assert np.array_equal(hit_matrix(rays, segments), expected)
+    assert np.array_equal(blocked_mask(rays, segments), expected.any(axis=1))
+
+    index, t = nearest_hits(rays, segments)
+    for m, ray in enumerate(rays):
+        if not expected[m].any():
+            assert index[m] == -1 and t[m] == np.inf
+            continue
+        assert expected[m, index[m]] and 0.0 <= t[m] <= 1.0
+        assert distance_to_segment(point_along(ray, t[m]), segments[index[m]]) < 1e-6
+        if t[m] > 1e-6:
+            before = (*ray[:2], *point_along(ray, t[m] - 1e-6))
+            assert not any(intersect(*before, *segments[n]) for n in np.flatnonzero(expected[m]))
+
+
+def point_along(ray, t):
+    return ray[0] + t * (ray[2] - ray[0]), ray[1] + t * (ray[3] - ray[1])
+
+
+def distance_to_segment(point, segment):
+    (x, y), (x1, y1, x2, y2) = point, segment
+    dx, dy = x2 - x1, y2 - y1
+    length2 = dx * dx + dy * dy
+    u = 0.0 if not length2 else min(max(((x - x1) * dx + (y - y1) * dy) / length2, 0.0), 1.0)
+    return float(np.hypot(x - x1 - u * dx, y - y1 - u * dy))
+
+
+# Many paths at once are blocked as each one on its own.
+@pytest.mark.parametrize("seed", range(3))
+def test_paths_blocked_matches_each_path(seed):
+    rng = random.Random(seed)
+    walls = WallCoordinates(c for _ in range(60) for c in random_segment(rng))
+    doors = DoorList(random_door(rng) for _ in range(10))
+    paths = [random_segment(rng) for _ in range(300)]
+    expected = [is_path_blocked_by_walls(*path, list(walls), list(doors)) for path in paths]
+    assert paths_blocked(paths, walls, doors).tolist() == expected
+    assert paths_blocked(paths, list(walls), list(doors)).tolist() == expected
+
+
+# The tree yields every point in the order of a stable sort by calculate_distance, duplicates and ties included.
+@pytest.mark.parametrize("leaf_size", [1, 2, 8])
+def test_point_tree_order(leaf_size):
+    rng = random.Random(leaf_size)
+    points = [(rng.randrange(50), rng.randrange(50)) for _ in range(200)] + [(10, 10)] * 5
+    tree = PointTree(points, leaf_size)
+    for _ in range(200):
+        x, y = rng.choice([rng.randrange(-10, 60), rng.uniform(-10, 60)]), rng.uniform(-10, 60)
+        expected = sorted(range(len(points)), key=lambda i: calculate_distance(x, y, *points[i]))
+        assert list(tree.nearest(x, y)) == expected
+    assert list(PointTree([]).nearest(0, 0)) == []
+
+
+# Walking the registry nearest first finds the sensor the sorted scan of a plain list finds.
+@pytest.mark.parametrize("seed", range(3))
+def test_closest_sensor_without_intersection(seed):
+    rng = random.Random(seed)
+    sensors = [(f"s{k}", rng.randrange(400), rng.randrange(400), "PIR", 0, 1, 1, 0, 0, 0, "") for k in range(60)]
+    walls = [c for _ in range(40) for c in random_segment(rng)]
+    registry, indexed_walls = SensorRegistry(sensors), WallCoordinates(walls)
+    for _ in range(300):
+        point = (rng.randrange(400), rng.randrange(400))
+        expected = find_closest_sensor_without_intersection(point, sensors, walls)
+        found = find_closest_sensor_without_intersection(point, registry, indexed_walls)
+        assert (found and found[0]) == (expected and expected[0])
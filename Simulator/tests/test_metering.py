@@ -0,0 +1,122 @@
+import copy
+import random
+from datetime import timedelta
+
+import pytest
+
+from clock import VirtualClock, timestamp_to_datetime
+from consumption_profiles import consumption_profiles, compiled_profile, minutes_to_next_change
+from metering import DeviceBank
+from registry import DeviceRegistry, SensorRegistry
+from sensor import changeSmartMeter
+from utils import update_devices_consumption
+
+OVEN = ("oven", 0, 0, "Oven", 2000, 1, 1500, 2000, 0, 1)
+DEVICE_TYPES = sorted(consumption_profiles)
+
+
+# Random devices (some off, some with a cycle of another type) and one Smart Meter per device.
+def random_home(rng, now):
+    devices, cycles = [], {}
+    for k in range(rng.randint(1, 12)):
+        type = rng.choice(DEVICE_TYPES)
+        devices.append((f"d{k}", k * 40, 0, type, 100, rng.choice([0, 1]), 1, 2, 0.5, 1))
+        if rng.random() < 0.7:
+            cycle_type = type if rng.random() < 0.9 else rng.choice(DEVICE_TYPES)
+            cycles[f"d{k}"] = (now - timedelta(seconds=rng.randint(0, 60 * 600)), cycle_type)
+    meters = [(f"m{k}", 0, 0, "Smart Meter", 0, 0, 0, 0, 0, 0, f"d{k}") for k in range(len(devices))]
+    return devices, cycles, meters
+
+
+# What the per-device path reads and writes at one tick.
+def per_device_tick(devices, cycles, meters, clock):
+    now = timestamp_to_datetime(clock.get_simulated_timestamp())
+    meters = SensorRegistry(copy.deepcopy(meters))
+    readings = [changeSmartMeter(None, m, meters, devices, 1, now, cycles)[1] for m in meters]
+    update_devices_consumption(None, devices, 1, clock, cycles)
+    return readings
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_device_bank_matches_per_device_update(seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        clock = VirtualClock("00:00", "2026-01-01")
+        clock.advance_to(rng.randint(0, 86400 * 3))
+        devices, cycles, meters = random_home(rng, timestamp_to_datetime(clock.get_simulated_timestamp()))
+
+        old_devices, old_cycles = DeviceRegistry(devices), dict(cycles)
+        old_readings = per_device_tick(old_devices, old_cycles, meters, clock)
+
+        new_devices, new_cycles = DeviceRegistry(devices), dict(cycles)
+        bank = DeviceBank(new_devices)
+        readings = bank.readings([m[10] for m in meters], clock.get_simulated_timestamp(), new_cycles)
+        bank.update(clock.get_simulated_timestamp(), new_cycles)
+
+        assert [readings[m[10]] for m in meters] == old_readings
+        assert [tuple(d) for d in new_devices] == [tuple(d) for d in old_devices]
+        assert new_cycles == old_cycles
+
+
+# One bank kept across ticks follows the toggles made through the registry, as the engine makes them.
+@pytest.mark.parametrize("seed", range(4))
+def test_device_bank_follows_toggles(seed):
+    rng = random.Random(seed)
+    clock = VirtualClock("00:00", "2026-01-01")
+    devices, cycles, meters = random_home(rng, timestamp_to_datetime(clock.get_simulated_timestamp()))
+    old_devices, old_cycles = DeviceRegistry(devices), dict(cycles)
+    new_devices, new_cycles = DeviceRegistry(devices), dict(cycles)
+    bank = DeviceBank(new_devices)
+    for tick in range(300):
+        clock.advance_to(tick * 37)
+        if rng.random() < 0.1:
+            i = rng.randrange(len(devices))
+            cycle = (timestamp_to_datetime(clock.get_simulated_timestamp()), rng.choice(DEVICE_TYPES))
+            for registry, active in ((old_devices, old_cycles), (new_devices, new_cycles)):
+                device = list(registry[i])
+                device[5] = 1 - device[5]
+                if device[5] == 1:
+                    active[device[0]] = cycle
+                else:
+                    active.pop(device[0], None)
+                registry[i] = device
+
+        old_readings = per_device_tick(old_devices, old_cycles, meters, clock)
+        readings = bank.readings([m[10] for m in meters], clock.get_simulated_timestamp(), new_cycles)
+        bank.update(clock.get_simulated_timestamp(), new_cycles)
+
+        assert [readings[m[10]] for m in meters] == old_readings
+        assert [tuple(d) for d in new_devices] == [tuple(d) for d in old_devices]
+        assert new_cycles == old_cycles
+
+
+# A program draws its last step for one minute: it is switched off at the first update past its profile, and the
+# engine wakes up for it one minute after the last key.
+def test_program_switched_off_at_end_of_profile():
+    clock = VirtualClock("00:00", "2026-01-01")
+    ts = clock.get_simulated_timestamp()
+    profile = compiled_profile("Oven")
+    devices = DeviceRegistry([OVEN])
+    cycles = {"oven": (timestamp_to_datetime(ts), "Oven")}
+    bank = DeviceBank(devices)
+    last_step = ts + int(profile.duration * 60)
+
+    assert minutes_to_next_change("Oven", float(profile.duration)) == 1
+    assert bank.update(last_step, cycles) == []
+    assert bank.readings(["oven"], last_step, cycles)["oven"] == profile.values[-1]
+    assert devices[0][8] == profile.values[-1]
+    assert bank.update(last_step + 60, cycles) == ["oven"]
+    assert "oven" not in cycles and devices[0][5] == 0
+
+
+# Same rule on the per-tick path of the GUI.
+@pytest.mark.parametrize("minutes, on", [(0, True), (9, True), (10, False)])
+def test_update_devices_consumption_switch_off(minutes, on):
+    clock = VirtualClock("00:00", "2026-01-01")
+    start = timestamp_to_datetime(clock.get_simulated_timestamp())
+    devices = [OVEN]
+    cycles = {"oven": (start, "Oven")}
+    clock.advance_to(minutes * 60)
+    update_devices_consumption(None, devices, 1, clock, cycles)
+    assert (devices[0][5] == 1) is on
+    assert ("oven" in cycles) is on
@@ -0,0 +1,56 @@
+import csv
+import os
+
+import pytest
+
+from clock import VirtualClock
+from consumption_profiles import compiled_profile
+from engine import SimulationEngine
+from multiday import run_days
+
+OVEN_AT = (868, 597)  # the Oven of the shipped scenario
+
+
+def read_csv(day_dir, name):
+    with open(os.path.join(day_dir, name), newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def device_toggles(day_dir):
+    return [row for row in read_csv(day_dir, "interactions.csv") if row["extra"] == "user_toggle_at_click"]
+
+
+# Events at t < midnight, fractional ones included, are applied and logged in the old day, the ones at midnight and
+# later in the new one.
+def test_events_split_at_midnight(scenario, tmp_path):
+    engine = SimulationEngine.from_file(scenario, clock=VirtualClock("23:00", "2026-01-01"))
+
+    def on_day(engine, day_start, day_dir):
+        if day_start == 0:
+            for t in (3598, 3599.5, 3600, 3601):
+                engine.schedule_device_toggle(t, *OVEN_AT)
+
+    first, second = run_days(engine, 2, str(tmp_path), on_day)
+
+    assert os.path.basename(first) == "2026-01-01" and os.path.basename(second) == "2026-01-02"
+    assert [(row["timestamp_sim"], row["value"]) for row in device_toggles(first)] == \
+           [("2026-01-01 23:59", "1"), ("2026-01-01 23:59", "0")]
+    assert [(row["timestamp_sim"], row["value"]) for row in device_toggles(second)] == \
+           [("2026-01-02 00:00", "1"), ("2026-01-02 00:00", "0")]
+    assert engine.now() == 3600 + 86400
+
+
+# A program running over midnight is split between the energy.csv of the two days, at midnight.
+def test_energy_split_at_midnight(scenario, tmp_path):
+    engine = SimulationEngine.from_file(scenario, clock=VirtualClock("23:55", "2026-01-01"))
+    profile = compiled_profile("Oven")
+
+    def on_day(engine, day_start, day_dir):
+        if day_start == 0:
+            engine.schedule_device_toggle(0, *OVEN_AT)
+
+    days = run_days(engine, 2, str(tmp_path), on_day)
+
+    [before], [after] = (read_csv(day_dir, "energy.csv") for day_dir in days)
+    assert float(before["kWh"]) == pytest.approx(profile.energy(0, 5) / 1000.0, abs=1e-4)
+    assert float(after["kWh"]) == pytest.approx(profile.energy(5, profile.end) / 1000.0, abs=1e-4)
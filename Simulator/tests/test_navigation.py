@@ -0,0 +1,142 @@
+import heapq
+import math
+import random
+
+import pytest
+
+from clock import VirtualClock
+from engine import SimulationEngine
+from geometry import DoorList, WallCoordinates
+from navigation import NavigationGrid
+from utils import intersect
+
+SIZE = 160  # px side of the random floor plans
+MARGIN = 20  # px of grid around them
+STEPS = [(dc, dr) for dc in (-1, 0, 1) for dr in (-1, 0, 1) if dc or dr]
+
+
+def random_segment(rng):
+    x1, y1 = rng.randrange(SIZE), rng.randrange(SIZE)
+    if rng.random() < 0.5:
+        return x1, y1, x1, rng.randrange(SIZE)
+    return x1, y1, rng.randrange(SIZE), y1
+
+
+def random_plan(rng):
+    walls = [c for _ in range(12) for c in random_segment(rng)]
+    doors = [(*random_segment(rng), rng.choice(["open", "close"])) for _ in range(5)]
+    return WallCoordinates(walls), DoorList(doors)
+
+
+def blocking(walls, doors):
+    segments = [tuple(walls[i:i + 4]) for i in range(0, len(walls) - 3, 4)]
+    return segments + [door[:4] for door in doors if door[4] == "close"]
+
+
+# Shortest distance between two grid points on the 8-neighbour grid, every step checked with utils.intersect.
+def reference_distance(grid, source, target, segments):
+    size = grid.cell_size
+    lo_x, lo_y = grid._center(0)
+    hi_x, hi_y = grid._center(grid._columns * grid._rows - 1)
+    distances = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        distance, (x, y) = heapq.heappop(heap)
+        if (x, y) == target:
+            return distance
+        if distance > distances[(x, y)]:
+            continue
+        for dc, dr in STEPS:
+            nx, ny = x + dc * size, y + dr * size
+            if not (lo_x <= nx <= hi_x and lo_y <= ny <= hi_y):
+                continue
+            if any(intersect(x, y, nx, ny, *s) for s in segments):
+                continue
+            candidate = distance + math.hypot(nx - x, ny - y)
+            if candidate < distances.get((nx, ny), math.inf):
+                distances[(nx, ny)] = candidate
+                heapq.heappush(heap, (candidate, (nx, ny)))
+    return None
+
+
+def length(points):
+    return sum(math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(points, points[1:]))
+
+
+# Between the two grid points the route starts and ends at, it is a shortest way around the walls and the closed
+# doors: no leg crosses one, and its length is the one of a plain Dijkstra search. None when there is no way.
+@pytest.mark.parametrize("seed", range(4))
+def test_route_is_a_shortest_way_through_open_doors(seed):
+    rng = random.Random(seed)
+    walls, doors = random_plan(rng)
+    grid = NavigationGrid(walls, doors, margin=MARGIN)
+    found = 0
+    for _ in range(25):
+        start, end = (rng.uniform(0, SIZE), rng.uniform(0, SIZE)), (rng.uniform(0, SIZE), rng.uniform(0, SIZE))
+        route = grid.route(start, end)
+        segments = blocking(walls, doors)
+        source, target = (grid._center(grid._snap(*point)) for point in (start, end))
+        expected = reference_distance(grid, source, target, segments)
+        if route is None:
+            assert expected is None
+        else:
+            found += 1
+            assert route[0] == start and route[-1] == end
+            assert (route[1], route[-2]) == (source, target) or (len(route) == 3 and route[1] == source == target)
+            corners = route[1:-1]
+            assert not any(intersect(*a, *b, *s) for a, b in zip(corners, corners[1:]) for s in segments)
+            assert length(corners) == pytest.approx(expected)
+        if rng.random() < 0.3:
+            i = rng.randrange(len(doors))
+            doors[i] = (*doors[i][:4], "open" if doors[i][4] == "close" else "close")
+    assert found
+
+
+# A cached route is kept while the doors its search looked at stay as they were, and searched again after one of
+# them toggles; the answers are the ones of a fresh grid every time.
+def test_route_cache_follows_doors():
+    rng = random.Random(7)
+    walls, doors = random_plan(rng)
+    grid = NavigationGrid(walls, doors, margin=MARGIN)
+    pairs = [((rng.uniform(0, SIZE), rng.uniform(0, SIZE)), (rng.uniform(0, SIZE), rng.uniform(0, SIZE)))
+             for _ in range(10)]
+    searches, outcomes = [], set()
+    search = grid._search
+    grid._search = lambda *args: searches.append(args) or search(*args)
+    for _ in range(30):
+        for start, end in pairs:
+            key = (grid._snap(*start), grid._snap(*end)) if grid._layout is not None else None
+            cached = grid._routes.get(key)
+            before = len(searches)
+            route = grid.route(start, end)
+            assert route == NavigationGrid(walls, DoorList(list(doors)), margin=MARGIN).route(start, end)
+            if cached is not None:
+                looked_at = cached.mask & doors.closed != cached.closed
+                assert len(searches) - before == int(looked_at)
+                outcomes.add(looked_at)
+        i = rng.randrange(len(doors))
+        doors[i] = (*doors[i][:4], "open" if doors[i][4] == "close" else "close")
+    assert outcomes == {True, False}
+
+
+# Walls added after the first route rebuild the grid: first a detour, then no way into a closed box.
+def test_grid_rebuilt_when_walls_change():
+    walls, doors = WallCoordinates([]), DoorList([(0, 0, 100, 120, "open")])
+    grid = NavigationGrid(walls, doors, margin=MARGIN)
+    assert length(grid.route((5, 55), (95, 55))[1:-1]) == pytest.approx(90)
+    walls.extend([50, -20, 50, 100])
+    assert length(grid.route((5, 55), (95, 55))[1:-1]) > 90
+    walls.extend([80, 40, 110, 40, 110, 40, 110, 70, 110, 70, 80, 70, 80, 70, 80, 40])
+    assert grid.route((5, 55), (95, 55)) is None
+
+
+# On the shipped scenario the rooms are closed off until their doors open.
+def test_scenario_routes(scenario):
+    engine = SimulationEngine.from_file(scenario, clock=VirtualClock("07:00", "2026-01-01"))
+    assert engine.navigation.route((864, 605), (376, 287)) is None
+    assert engine.navigation.route((864, 605), (741, 535)) is not None
+    for index, door in enumerate(engine.doors):
+        if door[4] == "close":
+            engine.toggle_door(index)
+    route = engine.navigation.route((864, 605), (376, 287))
+    assert route[0] == (864, 605) and route[-1] == (376, 287)
@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from clock import VirtualClock
+from consumption_profiles import consumption_profiles
+from engine import SimulationEngine
+from nilm import device_channels, load_nilm, save_nilm
+
+OVEN_AT = (868, 597)  # the Oven of the shipped scenario
+
+
+# An oven program cut short, one left to end and one still running at the end of the hour.
+def oven_hour(scenario):
+    engine = SimulationEngine.from_file(scenario, clock=VirtualClock("07:00", "2026-01-01"))
+    t0 = engine.current_datetime()
+    for minute in (2, 5, 20, 55):
+        engine.schedule_device_toggle(minute * 60, *OVEN_AT)
+    engine.run_until(3600)
+    return engine, t0, t0 + timedelta(hours=1)
+
+
+# Each 1 s channel adds up to the closed-form energy of its device, and the mains to all of them plus the standby
+# of the idle devices.
+def test_channels_match_energy(scenario):
+    engine, t0, t1 = oven_hour(scenario)
+    times, channels, standby = device_channels(engine, t0, t1)
+
+    assert len(times) == 3600 and np.all(np.diff(times) == 1)
+    assert list(channels) == [d[0] for d in engine.devices]
+    assert len(engine.energy.cycles("ov")) == 3
+    for name, power in channels.items():
+        assert power.sum() / 3600.0 == pytest.approx(engine.energy_between(name, t0, t1), rel=1e-9, abs=1e-9), name
+    idle = sum(consumption_profiles.get(d[3], {}).get("standby", 0.0) for d in engine.devices
+               if not engine.energy.cycles(d[0]))
+    assert standby[0] == pytest.approx(idle + consumption_profiles["Oven"].get("standby", 0.0))
+
+
+# The file holds the same channels (float32), the mains summing them with the base load, and loads as a frame
+# indexed by the sample times.
+def test_save_and_load(scenario, tmp_path):
+    engine, t0, t1 = oven_hour(scenario)
+    times, channels, standby = device_channels(engine, t0, t1)
+    filename = str(tmp_path / "nilm.npz")
+    save_nilm(engine, t0, t1, filename, base_load=12.5)
+
+    frame = load_nilm(filename)
+    assert list(frame.columns) == ["mains", "standby"] + list(channels)
+    assert len(frame) == len(times)
+    assert frame.index[0] == np.datetime64(t0.replace(tzinfo=None), "s")
+    assert frame.index[1] - frame.index[0] == np.timedelta64(1, "s")
+    for name, power in channels.items():
+        assert np.array_equal(frame[name].to_numpy(), power.astype(np.float32)), name
+    expected = standby + 12.5 + sum(channels.values())
+    assert np.allclose(frame["mains"].to_numpy(), expected, rtol=1e-6)
+    assert list(load_nilm(filename, devices=["ov"]).columns) == ["mains", "standby", "ov"]
@@ -0,0 +1,141 @@
+import random
+
+import pytest
+
+from registry import CLICK_CELL_SIZE, DeviceRegistry, SensorRegistry, find_device, update_sensor
+
+SENSOR_TYPES = ["PIR", "Switch", "Weight", "Smart Meter", "Temperature"]
+DEVICE_TYPES = ["Oven", "Fridge", "Computer", "Dishwasher"]
+
+
+def random_sensor(rng, k):
+    type = rng.choice(SENSOR_TYPES)
+    device = f"d{rng.randrange(4)}" if type == "Smart Meter" and rng.random() < 0.8 else ""
+    return (f"s{k}", rng.randrange(500), rng.randrange(500), type, 0, 1, 1, 0, 1, 0.0, device)
+
+
+def random_device(rng, k):
+    # a few devices share a name or sit within a click of each other
+    return (f"d{k % 40}", rng.randrange(-20, 200), rng.randrange(-20, 200), rng.choice(DEVICE_TYPES), 100,
+            rng.choice([0, 1]), 1, 2, 0.0, 1)
+
+
+# One random list mutation, applied to the registry and to a list of tuples.
+def mutate(rng, registry, model, make, k):
+    op = rng.choice(["append", "insert", "set", "del", "pop", "remove", "sort", "iadd"])
+    if op in ("del", "pop", "remove", "set") and not model:
+        op = "append"
+    if op == "append":
+        item = make(rng, k)
+        registry.append(item)
+        model.append(item)
+    elif op == "iadd":
+        items = [make(rng, k), make(rng, k + 1000)]
+        registry += items
+        model += items
+    elif op == "insert":
+        i, item = rng.randrange(len(model) + 1), make(rng, k)
+        registry.insert(i, item)
+        model.insert(i, item)
+    elif op == "set":
+        i, item = rng.randrange(len(model)), make(rng, k)
+        registry[i] = item
+        model[i] = item
+    elif op == "del":
+        i = rng.randrange(len(model))
+        del registry[i]
+        del model[i]
+    elif op == "pop":
+        assert tuple(registry.pop()) == model.pop()
+    elif op == "remove":
+        item = rng.choice(model)
+        registry.remove(list(item))
+        model.remove(item)
+    else:
+        registry.sort(key=lambda item: item[1])
+        model.sort(key=lambda item: item[1])
+
+
+# The indexes of a SensorRegistry answer what scanning the list would, through any list mutation.
+@pytest.mark.parametrize("seed", range(5))
+def test_sensor_indexes_follow_mutations(seed):
+    rng = random.Random(seed)
+    registry = SensorRegistry(random_sensor(rng, k) for k in range(10))
+    model = [tuple(s) for s in registry]
+    for step in range(300):
+        revision = registry.revision
+        mutate(rng, registry, model, random_sensor, 100 + step)
+        assert registry.revision > revision
+
+        assert [tuple(s) for s in registry] == model
+        by_name = {s[0]: s for s in model}
+        assert set(registry.names()) == set(by_name)
+        assert all(tuple(registry.get(name)) == s for name, s in by_name.items())
+        for type in SENSOR_TYPES:
+            assert [tuple(s) for s in registry.of_type(type)] == [s for s in model if s[3] == type]
+
+
+# update_sensor changes the record in place, as it rebuilds a list of tuples, and leaves the indexes alone.
+def test_update_sensor_in_place():
+    rng = random.Random(0)
+    sensors = [random_sensor(rng, k) for k in range(20)]
+    registry = SensorRegistry(sensors)
+    revision = registry.revision
+    for _ in range(100):
+        sensor = rng.choice(sensors)
+        state, consumption = rng.random(), rng.random()
+        sensors = update_sensor(sensors, sensor, state=state, consumption=consumption)
+        assert update_sensor(registry, sensor, state=state, consumption=consumption) is registry
+    assert [tuple(s) for s in registry] == sensors
+    assert registry.revision == revision
+
+
+# Smart Meters are indexed by the device they monitor, in list order.
+@pytest.mark.parametrize("seed", range(5))
+def test_meters_by_device_follow_mutations(seed):
+    rng = random.Random(seed)
+    registry = SensorRegistry(random_sensor(rng, k) for k in range(10))
+    model = [tuple(s) for s in registry]
+    for step in range(300):
+        mutate(rng, registry, model, random_sensor, 100 + step)
+        meters = {}
+        for s in model:
+            if s[3] == "Smart Meter" and s[10]:
+                meters.setdefault(s[10], []).append(s)
+        assert {d: [tuple(s) for s in m] for d, m in registry.metered_devices().items()} == meters
+        assert all([tuple(s) for s in registry.meters_of(d)] == m for d, m in meters.items())
+
+
+# The device under a click is the first one in list order within the tolerance on both axes, as scanning the
+# list finds it; lookups by name give the last device of that name, as find_device() on the list does.
+@pytest.mark.parametrize("seed", range(5))
+def test_device_indexes_follow_mutations(seed):
+    rng = random.Random(seed)
+    registry = DeviceRegistry(random_device(rng, k) for k in range(30))
+    model = [tuple(d) for d in registry]
+    for step in range(200):
+        mutate(rng, registry, model, random_device, 100 + step)
+        assert [tuple(d) for d in registry] == model
+        for _ in range(20):
+            x, y = rng.uniform(-30, 210), rng.uniform(-30, 210)
+            tolerance = rng.choice([0, 5, CLICK_CELL_SIZE + 3])
+            expected = next((i for i, d in enumerate(model)
+                             if abs(d[1] - x) <= tolerance and abs(d[2] - y) <= tolerance), None)
+            assert registry.index_at(x, y, tolerance) == expected
+        for name in {d[0] for d in model}:
+            assert tuple(find_device(registry, name)) == [d for d in model if d[0] == name][-1]
+        for type in DEVICE_TYPES:
+            assert [tuple(d) for d in registry.of_type(type)] == [d for d in model if d[3] == type]
+
+
+# Replacing a device by itself with a new state (a toggle, the consumption update) keeps the record and the
+# indexes; moving it re-indexes.
+def test_device_replaced_in_place():
+    registry = DeviceRegistry([("oven", 10, 10, "Oven", 2000, 0, 1, 2, 0.0, 1)])
+    record, revision = registry[0], registry.revision
+    registry[0] = ("oven", 10, 10, "Oven", 2000, 1, 1, 2, 950.0, 1)
+    assert registry[0] is record and record.state == 1 and record.current_consumption == 950.0
+    assert registry.revision == revision
+    registry[0] = ("oven", 100, 10, "Oven", 2000, 1, 1, 2, 950.0, 1)
+    assert registry.revision > revision
+    assert registry.index_at(10, 10, 5) is None and registry.index_at(100, 10, 5) == 0
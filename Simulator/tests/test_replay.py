@@ -0,0 +1,43 @@
+import csv
+import os
+from datetime import datetime, timedelta
+
+from replay import read_moves, replay_session
+
+START = datetime(2026, 1, 1, 7, 0)
+CLICKS = [(864, 605), (868, 597), (741, 535), (737, 209), (376, 287)]
+
+
+def write_session(path, moves):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp_sim", "event_type", "subject", "name", "x", "y", "value", "extra"])
+        for ts, x, y in moves:
+            writer.writerow([ts.strftime("%Y-%m-%d %H:%M"), "move", "user", "avatar", x, y, "", ""])
+
+
+# Replaying a session and reading its output back gives the same path, clicks of the last minute included.
+def test_replay_round_trip(tmp_path, scenario):
+    moves = ([(START, *CLICKS[0]), (START + timedelta(minutes=3), *CLICKS[2])]
+             + [(START + timedelta(minutes=10), x, y) for x, y in CLICKS])
+    session = tmp_path / "interactions.csv"
+    write_session(str(session), moves)
+
+    output = tmp_path / "replayed"
+    engine = replay_session(str(session), scenario, str(output))
+
+    assert engine.avatar_position == CLICKS[-1]
+    replayed, last_time = read_moves(str(output / "interactions.csv"))
+    assert replayed == moves
+    assert last_time == moves[-1][0]
+    assert os.path.exists(output / "activity_log.csv")
+
+
+# All the clicks of a single minute are played, even when the session is that one minute.
+def test_replay_single_minute(tmp_path, scenario):
+    session = tmp_path / "interactions.csv"
+    write_session(str(session), [(START, x, y) for x, y in CLICKS])
+    engine = replay_session(str(session), scenario, str(tmp_path / "replayed"))
+    replayed, _ = read_moves(str(tmp_path / "replayed" / "interactions.csv"))
+    assert engine.avatar_position == CLICKS[-1]
+    assert [(x, y) for _, x, y in replayed] == CLICKS
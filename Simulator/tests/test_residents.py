@@ -0,0 +1,115 @@
+import random
+
+import pytest
+
+from clock import VirtualClock
+from door import point_in_line
+from engine import SimulationEngine, DOOR_TOLERANCE, MAX_DISTANCE, FOV_ANGLE, WEIGHT_DISTANCE
+from geometry import DoorList, WallCoordinates
+from registry import SensorRegistry
+from residents import pir_holders, sense
+from utils import calculate_distance, find_closest_sensor_within_fov
+from visibility import NO_SENSOR, VisibilityRaster
+
+SIZE = 160  # px side of the random floor plans
+
+
+def random_segment(rng):
+    x1, y1 = rng.randrange(SIZE), rng.randrange(SIZE)
+    if rng.random() < 0.5:
+        return x1, y1, x1, rng.randrange(SIZE)
+    return x1, y1, rng.randrange(SIZE), y1
+
+
+def random_layout(rng):
+    sensors = [(f"pir{k}", rng.randrange(SIZE), rng.randrange(SIZE), "PIR", 0, 1, 1, 0,
+                rng.choice([None, 0, 90, 180, 270, rng.uniform(0, 360)]), 0, "") for k in range(10)]
+    weights = [(f"w{k}", rng.randrange(SIZE), rng.randrange(SIZE), "Weight", 0, 1, 1, 0, None, 0, "")
+               for k in range(4)]
+    walls = [c for _ in range(8) for c in random_segment(rng)]
+    doors = [(*random_segment(rng), rng.choice(["open", "close"])) for _ in range(3)]
+    return SensorRegistry(sensors + weights), WallCoordinates(walls), DoorList(doors)
+
+
+def name(sensor):
+    return None if sensor is None else sensor[0]
+
+
+# For K residents at once, whole-pixel and fractional positions alike, sense() finds the PIR the exact search finds
+# for each of them, and the Weight sensors within reach; pir_holders() groups the residents by PIR.
+@pytest.mark.parametrize("seed", range(4))
+def test_sense_matches_exact_search(seed):
+    rng = random.Random(seed)
+    sensors, walls, doors = random_layout(rng)
+    raster = VisibilityRaster(sensors, walls, doors, MAX_DISTANCE, FOV_ANGLE)
+    raster.rebuild()
+    weights = sensors.of_type("Weight")
+    for _ in range(10):
+        positions = [(rng.randrange(SIZE), rng.randrange(SIZE)) if rng.random() < 0.6 else
+                     (rng.uniform(0, SIZE), rng.uniform(0, SIZE)) for _ in range(rng.randint(1, 8))]
+        positions += [positions[0]] * rng.randint(0, 2) + [(w[1] + 3, w[2] - 4) for w in weights[:1]]
+        xs, ys = [x for x, _ in positions], [y for _, y in positions]
+        pirs, on_weights = sense(xs, ys, raster, weights, WEIGHT_DISTANCE)
+
+        candidates = raster.candidates
+        expected = [name(find_closest_sensor_within_fov(p, sensors, walls, doors, MAX_DISTANCE, FOV_ANGLE))
+                    for p in positions]
+        assert [None if i == NO_SENSOR else candidates[i][0] for i in pirs.tolist()] == expected
+        assert on_weights.tolist() == [[calculate_distance(x, y, w[1], w[2]) < WEIGHT_DISTANCE for w in weights]
+                                       for x, y in positions]
+        residents = list(range(len(positions)))
+        holders = pir_holders(residents, pirs)
+        assert {candidates[i][0]: r for i, r in holders.items()} == \
+               {n: [k for k in residents if expected[k] == n] for n in set(expected) - {None}}
+        i = rng.randrange(len(doors))
+        doors[i] = (*doors[i][:4], "open" if doors[i][4] == "close" else "close")
+
+
+# Residents moving around the shipped scenario, alone or together: each one holds the PIR the exact search finds at
+# its position, the PIRs on are the ones held, and a Weight sensor is on while someone stands on it.
+@pytest.mark.parametrize("seed", range(3))
+def test_residents_hold_the_pirs_in_sight(scenario, seed):
+    rng = random.Random(seed)
+    engine = SimulationEngine.from_file(scenario, clock=VirtualClock("07:00", "2026-01-01"))
+    for _ in range(2):
+        engine.add_resident()
+    weights = engine.sensors.of_type("Weight")
+    spots = [(w[1], w[2]) for w in weights]
+
+    def free_spot():
+        # away from the doors, so that the visibility stays as it is between two moves
+        while True:
+            x, y = rng.choice(spots) if rng.random() < 0.2 else (rng.uniform(300, 950), rng.uniform(50, 700))
+            if not any(point_in_line(x, y, *door[:4], DOOR_TOLERANCE) for door in engine.doors):
+                return x, y
+
+    held = {}
+    for _ in range(30):
+        moves = [(k, *free_spot()) for k in rng.sample(range(3), rng.randint(1, 3))]
+        for k, x, y in moves:
+            held[k] = name(find_closest_sensor_within_fov((x, y), engine.sensors, engine.walls_coordinates,
+                                                          engine.doors, MAX_DISTANCE, FOV_ANGLE))
+        engine.move_residents(moves)
+
+        for k, resident in enumerate(engine.residents):
+            assert [s[0] for s in resident.active_pir_sensors] == ([held[k]] if k in held and held[k] else [])
+        assert {s[0] for s in engine.sensors.of_type("PIR") if s[7]} == set(held.values()) - {None}
+        placed = [r.position for r in engine.residents if r.position is not None]
+        for sensor in engine.sensors.of_type("Weight"):
+            on = any(calculate_distance(x, y, sensor[1], sensor[2]) < WEIGHT_DISTANCE for x, y in placed)
+            assert bool(sensor[7]) == on, sensor[0]
+
+
+# Moves of several residents scheduled at the same time are applied in one go.
+def test_moves_at_the_same_time_are_batched(scenario):
+    engine = SimulationEngine.from_file(scenario, clock=VirtualClock("07:00", "2026-01-01"))
+    engine.add_resident()
+    batches = []
+    move_residents = engine.move_residents
+    engine.move_residents = lambda moves: batches.append(list(moves)) or move_residents(moves)
+    engine.schedule_move(60, 741, 535)
+    engine.schedule_move(60, 837, 273, resident=1)
+    engine.schedule_move(120, 521, 232, resident=1)
+    engine.run_until(120)
+    assert batches == [[(0, 741, 535), (1, 837, 273)], [(1, 521, 232)]]
+    assert [r.position for r in engine.residents] == [(741, 535), (521, 232)]
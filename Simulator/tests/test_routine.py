@@ -0,0 +1,51 @@
+import csv
+import os
+
+import pytest
+
+from activity import MEAL_SLOTS
+from clock import VirtualClock
+from engine import SimulationEngine
+from routine import DAY, TRANSITION_SECONDS, RoutineGenerator, generate
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def minutes(hhmm):
+    hour, minute = map(int, hhmm.split(":"))
+    return hour * 60 + minute
+
+
+# One thing at a time, in the day, meals in their slots.
+@pytest.mark.parametrize("seed", range(20))
+def test_sampled_day_is_consistent(scenario, seed):
+    engine = SimulationEngine.from_file(scenario, clock=VirtualClock("00:00", "2026-03-01"))
+    plan = RoutineGenerator(engine, seed).sample_day()
+    assert plan == RoutineGenerator(engine, seed).sample_day()
+    busy_until = 0
+    for name, start, end, free in plan:
+        assert busy_until <= start <= free <= end <= DAY
+        if name in MEAL_SLOTS:
+            slot_start, slot_end = (h * 3600 for h in MEAL_SLOTS[name])
+            assert slot_start <= start and end <= slot_end
+        busy_until = free + (TRANSITION_SECONDS if name != "cooking" else 0)
+
+
+# The activity detectors find the planned activities, in order and close to the planned start, and a seed always
+# writes the same days.
+def test_generated_days_are_labelled_as_planned(scenario, tmp_path):
+    days = generate(scenario, 2, str(tmp_path / "a"), seed=3, start_date="2026-03-01")
+    again = generate(scenario, 2, str(tmp_path / "b"), seed=3, start_date="2026-03-01")
+    for day_dir, other in zip(days, again):
+        planned = read_rows(os.path.join(day_dir, "routine.csv"))
+        detected = [row for row in read_rows(os.path.join(day_dir, "activity_log.csv"))
+                    if row["activity"] != "returning home"]
+        assert [row["activity"] for row in detected] == [row["activity"] for row in planned]
+        for plan, found in zip(planned, detected):
+            assert abs(minutes(found["start"]) - minutes(plan["start"])) <= 15
+        for name in ("routine.csv", "activity_log.csv", "sensor_log.csv", "energy.csv"):
+            with open(os.path.join(day_dir, name), "rb") as f, open(os.path.join(other, name), "rb") as g:
+                assert f.read() == g.read(), name
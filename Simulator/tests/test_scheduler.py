@@ -0,0 +1,19 @@
+import random
+
+from scheduler import EventScheduler
+
+
+# Events come out by time, the ones at the same time in the order they were scheduled.
+def test_events_in_time_then_schedule_order():
+    rng = random.Random(0)
+    scheduler = EventScheduler()
+    times = [rng.choice([0, 1.5, 3, 60, 86399.5]) for _ in range(200)]
+    for k, t in enumerate(times):
+        scheduler.schedule(t, "wakeup", None, k)
+    popped = []
+    while scheduler:
+        assert scheduler.peek_time() is not None
+        event = scheduler.pop()
+        popped.append((event.time, event.args[0]))
+    assert popped == sorted((t, k) for k, t in enumerate(times))
+    assert scheduler.pop() is None and scheduler.peek_time() is None
@@ -0,0 +1,69 @@
+import random
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from clock import format_timestamp
+from timeseries import (SensorSeries, format_times, last_falling_edge, last_state, nan_to_none, sensor_columns,
+                        states_of)
+
+
+# A series holds what a list of (time, state, consumption) samples would, through appends past its capacity,
+# overwritten last samples and trims.
+@pytest.mark.parametrize("binary, consumption", [(True, False), (False, False), (False, True)])
+def test_series_matches_sample_list(binary, consumption):
+    rng = random.Random(0)
+    series = SensorSeries("test", binary=binary, consumption=consumption, capacity=2)
+    samples, t = [], 1767225600
+    for _ in range(1000):
+        state = rng.choice([0, 1]) if binary else round(rng.uniform(0, 100), 2)
+        value = rng.choice([None, round(rng.uniform(0, 3000), 2)]) if consumption else None
+        if samples and rng.random() < 0.2:
+            series.replace_last(state, value)
+            samples[-1] = (samples[-1][0], state, samples[-1][2] if value is None else value)
+        elif rng.random() < 0.02:
+            keep = rng.randint(1, 3)
+            assert series.trim(keep) == max(len(samples) - keep, 0)
+            samples = samples[-keep:]
+        else:
+            t += rng.randint(0, 120)
+            series.append(t, state, value)
+            samples.append((t, state, value))
+
+        assert len(series) == len(samples)
+        assert series.last_time == samples[-1][0] and series.last_state == samples[-1][1]
+    times, states, values = series.columns()
+    assert times.tolist() == [s[0] for s in samples]
+    assert states.tolist() == [s[1] for s in samples]
+    if consumption:
+        assert nan_to_none(values) == [s[2] for s in samples]
+    else:
+        assert values is None
+    assert series.columns(5)[0].tolist() == times[5:].tolist()
+
+
+# Exports read the series as the {'time': [...], 'state': [...]} dicts they replace.
+def test_series_exports():
+    series = SensorSeries("Smart Meter", consumption=True)
+    for t, state, value in [(1767225600, 0.0, 0.0), (1767225660, 1.0, 250.5), (1767229200, 1.0, None)]:
+        series.append(t, state, value)
+    times, states, consumption = sensor_columns(series)
+    assert times == [format_timestamp(t) for t in series.times.tolist()] == format_times(series.times)
+    assert states == [0.0, 1.0, 1.0] and consumption == [0.0, 250.5, None]
+    frame = series.to_frame()
+    assert frame.index[1] == datetime(2026, 1, 1, 0, 1) and frame["consumption"].iloc[1] == 250.5
+
+    as_dict = {"time": times, "state": states, "consumption": consumption}
+    assert sensor_columns(as_dict) == (times, states, consumption)
+    for sensor_states in ({"m": series}, {"m": as_dict}):
+        assert last_state(sensor_states, "m") == 1.0
+        assert list(states_of(sensor_states, "m")) == states
+        assert last_state(sensor_states, "other") is None
+
+
+@pytest.mark.parametrize("states, edge", [([], None), ([1], None), ([0, 1, 1], None), ([1, 0], 1),
+                                          ([0, 1, 0, 1, 1, 0, 0], 5)])
+def test_last_falling_edge(states, edge):
+    assert last_falling_edge(states) == edge
+    assert last_falling_edge(np.array(states, dtype=np.int8)) == edge
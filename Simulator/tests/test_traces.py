@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+import pytest
+
+import traces
+from traces import TraceLibrary, load_trace
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+# One column is taken as 1 Hz; (seconds, W) is held until the next sample, whatever the chunk size.
+@pytest.mark.parametrize("chunk_rows", [1, 2, 3, 1 << 16])
+def test_load_trace_streams_and_leaves_trace_folder_alone(tmp_path, monkeypatch, chunk_rows):
+    monkeypatch.setattr(traces, "TRACE_CHUNK_ROWS", chunk_rows)
+    folder, cache = tmp_path / "traces", str(tmp_path / "cache")
+    plain = write(str(folder / "plain.csv"), "watts\n10\n20\n30\n")
+    timed = write(str(folder / "timed.csv"), "seconds,watts\n100,5\n101.5,7\n102,9\n104.5,2\n")
+    assert load_trace(plain, cache).tolist() == [10, 20, 30]
+    assert load_trace(timed, cache).tolist() == [5, 5, 9, 9, 9, 2]
+    assert sorted(os.listdir(folder)) == ["plain.csv", "timed.csv"]
+    assert len(os.listdir(cache)) == 2
+
+
+def test_empty_trace_is_rejected(tmp_path):
+    empty = write(str(tmp_path / "empty.csv"), "watts\n\n")
+    with pytest.raises(ValueError, match="empty.csv"):
+        load_trace(empty, str(tmp_path / "cache"))
+
+
+# Resampled to minutes, a trace keeps its real length: its energy is the one of the 1 Hz samples, plus the final
+# minute a program draws its last step for before it is switched off.
+def test_trace_profile_energy_matches_samples(tmp_path):
+    rng = np.random.default_rng(0)
+    watts = rng.uniform(0, 2000, 150)
+    write(str(tmp_path / "Oven" / "o.csv"), "\n".join(f"{w:.2f}" for w in watts) + "\n")
+    library = TraceLibrary(str(tmp_path), cache_dir=str(tmp_path / "cache"))
+    samples = np.asarray(load_trace(str(tmp_path / "Oven" / "o.csv"), library.cache_dir), dtype=np.float64)
+    minute, second = library.profile("o", "Oven"), library.profile("o", "Oven", step_seconds=1)
+    assert minute.duration == second.duration == pytest.approx(150 / 60.0)
+    assert minute.energy(0, minute.duration) == pytest.approx(samples.sum() / 3600.0)
+    assert minute.energy(0, 10) == pytest.approx(samples.sum() / 3600.0 + minute.values[-1] / 60.0)
+    assert second.values[second.indexes(np.arange(150) / 60.0)].tolist() == samples.tolist()
@@ -0,0 +1,97 @@
+import math
+
+import numpy as np
+import pytest
+
+from clock import VirtualClock
+from engine import SimulationEngine, MAX_DISTANCE, FOV_ANGLE
+from trajectory import WALK_SPEED, changes, walk, walk_route
+from utils import find_closest_sensor_within_fov
+
+
+# A walk goes from one end to the other at the given speed, at least `rate` positions per second.
+@pytest.mark.parametrize("start, end", [((0, 0), (0, 0)), ((0, 0), (3, 4)), ((10, 500), (700, 20)),
+                                        ((5.5, 2.25), (-100, 80))])
+def test_walk(start, end):
+    times, xs, ys = walk(start, end, speed=70, rate=10)
+    length = math.hypot(end[0] - start[0], end[1] - start[1])
+    assert times[0] == 0 and times[-1] == pytest.approx(length / 70)
+    assert (xs[0], ys[0]) == (round(start[0]), round(start[1])) and (xs[-1], ys[-1]) == (round(end[0]), round(end[1]))
+    assert np.all(np.diff(times) <= 0.1 + 1e-9)
+    assert np.all(np.hypot(np.diff(xs), np.diff(ys)) <= 7 + 1.5)
+
+
+# A route is its legs one after the other, each waypoint once.
+def test_walk_route():
+    waypoints = [(0, 0), (100, 0), (100, 50), (20, 90)]
+    times, xs, ys = walk_route(waypoints)
+    legs = [walk(a, b) for a, b in zip(waypoints, waypoints[1:])]
+    assert len(times) == sum(len(t) for t, _, _ in legs) - len(legs) + 1
+    assert times[-1] == pytest.approx(sum(t[-1] for t, _, _ in legs))
+    assert np.all(np.diff(times) > 0)
+    assert [(x, y) for x, y in zip(xs.tolist(), ys.tolist()) if (x, y) in waypoints] == waypoints
+    times, xs, ys = walk_route([(5, 5)])
+    assert not times.any() and set(xs.tolist()) == set(ys.tolist()) == {5}
+
+
+@pytest.mark.parametrize("values, expected", [([], []), ([3], [0]), ([1, 1, 2, 2, 1], [0, 2, 4])])
+def test_changes(values, expected):
+    assert changes(values).tolist() == expected
+
+
+class SweptRows:
+    def __init__(self):
+        self.rows = []
+        self.walks = []
+
+    def interaction(self, timestamp_sim, event_type, subject, name, x, y, value, extra):
+        if event_type == "sensor" and subject == "PIR":
+            self.rows.append((timestamp_sim, name, value, extra))
+
+    def avatar_walked(self, times, xs, ys):
+        self.walks.append((times, xs, ys))
+
+
+# Walking between two clicks turns on, in order, the PIRs the exact search finds in sight along the route; the PIR in
+# sight at the click is the one of the click.
+@pytest.mark.parametrize("start, end", [((864, 605), (376, 287)), ((376, 287), (737, 209)),
+                                        ((741, 535), (521, 232))])
+def test_walk_sweeps_the_pirs_in_sight(scenario, start, end):
+    engine = SimulationEngine.from_file(scenario, clock=VirtualClock("07:00", "2026-01-01"))
+    for index, door in enumerate(engine.doors):
+        if door[4] == "close":
+            engine.toggle_door(index)
+    engine.walk_speed = WALK_SPEED
+    engine.schedule_move(0, *start)
+    engine.run_until(0)
+    previous = [s[0] for s in engine.active_pir_sensors] or [None]
+    rows = SweptRows()
+    engine.add_observer(rows)
+    engine.schedule_move(600, *end)
+    engine.run_until(600)
+
+    [(times, xs, ys)] = rows.walks
+    assert np.array_equal(np.column_stack((xs, ys)),
+                          np.column_stack(walk_route(engine.navigation.route(start, end))[1:]))
+    assert times[-1] == engine.now() and np.all(np.diff(times) > 0)
+    in_sight = [find_closest_sensor_within_fov((x, y), engine.sensors, engine.walls_coordinates, engine.doors,
+                                               MAX_DISTANCE, FOV_ANGLE) for x, y in zip(xs.tolist(), ys.tolist())]
+    names = np.array(previous + [None if s is None else s[0] for s in in_sight], dtype=object)
+    expected = [names[i] for i in changes(names)[1:-1] if names[i] is not None]
+    assert expected
+    assert [name for _, name, value, extra in rows.rows if extra == "swept_path"] == expected
+    assert [s[0] for s in engine.active_pir_sensors] == ([names[-1]] if names[-1] else [])
+    assert [t for t, *_ in rows.rows] == sorted(t for t, *_ in rows.rows)
+
+
+# With the doors closed there is no way through: the avatar jumps to the click and sweeps nothing.
+def test_no_walk_through_closed_doors(scenario):
+    engine = SimulationEngine.from_file(scenario, clock=VirtualClock("07:00", "2026-01-01"))
+    engine.walk_speed = WALK_SPEED
+    engine.schedule_move(0, 864, 605)
+    rows = SweptRows()
+    engine.add_observer(rows)
+    engine.schedule_move(600, 376, 287)
+    engine.run_until(600)
+    assert engine.navigation.route((864, 605), (376, 287)) is None
+    assert not rows.walks and all(extra != "swept_path" for *_, extra in rows.rows)
@@ -0,0 +1,108 @@
+import random
+
+import numpy as np
+import pytest
+
+from clock import VirtualClock
+from engine import SimulationEngine, MAX_DISTANCE, FOV_ANGLE
+from geometry import DoorList, WallCoordinates
+from registry import SensorRegistry
+from utils import find_closest_sensor_within_fov
+from visibility import FovCache, VisibilityRaster
+
+SIZE = 160  # px side of the random floor plans
+
+
+def random_segment(rng):
+    x1, y1 = rng.randrange(SIZE), rng.randrange(SIZE)
+    if rng.random() < 0.5:
+        return x1, y1, x1, rng.randrange(SIZE)
+    return x1, y1, rng.randrange(SIZE), y1
+
+
+# PIRs with and without a direction, some at the same spot, axis-aligned walls and doors.
+def random_layout(rng):
+    sensors = []
+    for k in range(12):
+        x, y = (sensors[-1][1], sensors[-1][2]) if sensors and rng.random() < 0.1 else \
+            (rng.randrange(SIZE), rng.randrange(SIZE))
+        direction = None if rng.random() < 0.1 else rng.choice([0, 45, 90, 180, 270, rng.uniform(0, 360)])
+        sensors.append((f"pir{k}", x, y, "PIR", 0, 1, 1, 0, direction, 0, ""))
+    walls = [c for _ in range(10) for c in random_segment(rng)]
+    doors = [(*random_segment(rng), rng.choice(["open", "close"])) for _ in range(4)]
+    return SensorRegistry(sensors), WallCoordinates(walls), DoorList(doors)
+
+
+def name(sensor):
+    return None if sensor is None else sensor[0]
+
+
+# A click anywhere picks the sensor find_closest_sensor_within_fov picks, in every door configuration met.
+@pytest.mark.parametrize("seed", range(3))
+def test_raster_matches_exact_search(seed):
+    rng = random.Random(seed)
+    sensors, walls, doors = random_layout(rng)
+    max_distance, fov_angle = rng.choice([(60, 60), (100, 90), (230, 60)])
+    raster = VisibilityRaster(sensors, walls, doors, max_distance, fov_angle)
+    raster.rebuild()
+    xs, ys = np.meshgrid(np.arange(-5, SIZE + 5, 5), np.arange(-5, SIZE + 5, 5))
+    xs, ys = xs.ravel(), ys.ravel()
+    for _ in range(3):
+        expected = [name(find_closest_sensor_within_fov((x, y), sensors, walls, doors, max_distance, fov_angle))
+                    for x, y in zip(xs.tolist(), ys.tolist())]
+        assert [name(raster.closest(x, y)) for x, y in zip(xs.tolist(), ys.tolist())] == expected
+        candidates = raster.candidates
+        assert [None if i < 0 else candidates[i][0] for i in raster.indexes_along(xs, ys).tolist()] == expected
+        i = rng.randrange(len(doors))
+        doors[i] = (*doors[i][:4], "open" if doors[i][4] == "close" else "close")
+
+
+# Same on the shipped scenario, over the whole floor plan, with its doors open and closed.
+def test_raster_matches_exact_search_on_scenario(scenario):
+    engine = SimulationEngine.from_file(scenario, clock=VirtualClock("07:00", "2026-01-01"))
+    raster = engine.visibility
+    xs, ys = np.meshgrid(np.arange(0, 1000, 7), np.arange(0, 800, 7))
+    for state in ("open", "close"):
+        for i, door in enumerate(engine.doors):
+            engine.doors[i] = (*door[:4], state)
+        for x, y in zip(xs.ravel().tolist(), ys.ravel().tolist()):
+            expected = find_closest_sensor_within_fov((x, y), engine.sensors, engine.walls_coordinates,
+                                                      engine.doors, MAX_DISTANCE, FOV_ANGLE)
+            assert name(raster.closest(x, y)) == name(expected), (x, y, state)
+
+
+# Cached results stay those of the exact search through door toggles (resolved again from the kept masks, without
+# new geometry) and layout changes (cache emptied).
+@pytest.mark.parametrize("seed", range(3))
+def test_fov_cache_follows_doors(seed, monkeypatch):
+    rng = random.Random(seed)
+    sensors, walls, doors = random_layout(rng)
+    cache = FovCache(sensors, walls, doors)
+    queries = []
+    query = FovCache._query
+
+    def counted_query(self, *args):
+        queries.append(args)
+        return query(self, *args)
+
+    monkeypatch.setattr(FovCache, "_query", counted_query)
+    points = [(rng.randrange(SIZE), rng.randrange(SIZE)) for _ in range(40)] + \
+             [(rng.uniform(0, SIZE), rng.uniform(0, SIZE)) for _ in range(10)]
+    for step in range(25):
+        op = rng.random()
+        if op < 0.7:
+            i = rng.randrange(len(doors))
+            doors[i] = (*doors[i][:4], "open" if doors[i][4] == "close" else "close")
+        elif op < 0.8:
+            doors.append((*random_segment(rng), "close"))
+        elif op < 0.9:
+            walls.extend(random_segment(rng))
+        else:
+            sensors.append((f"new{step}", rng.randrange(SIZE), rng.randrange(SIZE), "PIR", 0, 1, 1, 0,
+                            rng.uniform(0, 360), 0, ""))
+        layout_changed = op >= 0.7
+        before = len(queries)
+        for point in points:
+            expected = find_closest_sensor_within_fov(point, sensors, walls, doors, MAX_DISTANCE, FOV_ANGLE)
+            assert name(cache.closest(point, MAX_DISTANCE, FOV_ANGLE)) == name(expected)
+        assert len(queries) - before == (len(points) if layout_changed or step == 0 else 0)
@@ -1,6 +1,8 @@
 import tkinter as tk
 from datetime import datetime, timedelta
 
+from clock import SIMULATED_SECONDS_PER_TIMER_SECOND, date_to_timestamp, format_timestamp
+
 class TimerApp:
     def __init__(self, parent, start_callback=None, stop_callback=None):
         self.start_callback = start_callback
@@ -13,7 +15,7 @@ class TimerApp:
         self.elapsed_time = timedelta()
         self.simulated_start_time = None
         self.advanced = False
-        self.current_date = datetime.today().strftime("%Y-%m-%d")  # Today's date in YYYY-MM-DD format
+        self.start_date = datetime.today().strftime("%Y-%m-%d")  # Today's date in YYYY-MM-DD format
         self.timer_frame.columnconfigure(0, weight=1)
 
         self.label = tk.Label(self.timer_frame, text=f"Time: 00:00 \n Date: {self.current_date}",
@@ -108,13 +110,31 @@ class TimerApp:
         final_simulated_time = self.simulated_start_time + timedelta(hours=simulated_hours, minutes=simulated_minutes)
         return final_simulated_time.strftime("%H:%M")
 
+    # Simulated seconds since the start (one real second is one simulated minute).
+    @property
+    def simulated_seconds(self):
+        return self.elapsed_time.total_seconds() * SIMULATED_SECONDS_PER_TIMER_SECOND
+
+    # Simulated date: start_date until the first midnight, then it moves on with the timer.
+    @property
+    def current_date(self):
+        return format_timestamp(self.get_simulated_timestamp(), "%Y-%m-%d")
+
+    # Numeric simulated timestamp with second resolution (see clock.py), counted from start_date.
+    def get_simulated_timestamp(self):
+        day_start = date_to_timestamp(self.start_date)
+        if self.simulated_start_time is None:
+            return day_start
+        start_of_day = self.simulated_start_time.hour * 3600 + self.simulated_start_time.minute * 60
+        return day_start + int(start_of_day + self.simulated_seconds)
+
     def reset(self):
         # Reset to initial state
         self.is_running = False
         self.start_time = None
         self.elapsed_time = timedelta()
         self.simulated_start_time = None
-        self.current_date = datetime.today().strftime("%Y-%m-%d")  # Reset to today's date
+        self.start_date = datetime.today().strftime("%Y-%m-%d")  # Reset to today's date
 
         # Reset of field text
         self.start_hour_entry.delete(0, tk.END)
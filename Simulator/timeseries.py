@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+INITIAL_CAPACITY = 16  # samples allocated for a new series; the arrays double when full
+
+
+class SensorSeries:
+    """ Samples of one sensor in typed columns: int64 times (simulated seconds since the epoch, see clock.py),
+    int8 states for binary sensors or float64 otherwise and, for Smart Meters, float64 consumption.
+    The arrays grow by doubling, so appends are amortized O(1); times, states and consumption are
+    zero-copy NumPy views of the filled part, to_frame() a pandas frame over the same data. """
+
+    __slots__ = ("type", "associated_device", "_times", "_states", "_consumption", "_size")
+
+    def __init__(self, type=None, binary=False, consumption=False, associated_device=None,
+                 capacity=INITIAL_CAPACITY):
+        self.type = type
+        self.associated_device = associated_device
+        self._times = np.empty(capacity, dtype=np.int64)
+        self._states = np.empty(capacity, dtype=np.int8 if binary else np.float64)
+        self._consumption = np.empty(capacity, dtype=np.float64) if consumption else None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self):
+        capacity = 2 * len(self._times)
+        self._times = np.resize(self._times, capacity)
+        self._states = np.resize(self._states, capacity)
+        if self._consumption is not None:
+            self._consumption = np.resize(self._consumption, capacity)
+
+    def append(self, t, state, consumption=None):
+        if self._size == len(self._times):
+            self._grow()
+        i = self._size
+        self._times[i] = t
+        self._states[i] = state
+        if self._consumption is not None:
+            self._consumption[i] = np.nan if consumption is None else consumption
+        self._size = i + 1
+
+    # Overwrite the last sample (same time, new reading).
+    def replace_last(self, state, consumption=None):
+        i = self._size - 1
+        self._states[i] = state
+        if self._consumption is not None and consumption is not None:
+            self._consumption[i] = consumption
+
+    @property
+    def last_time(self):
+        return int(self._times[self._size - 1]) if self._size else None
+
+    @property
+    def last_state(self):
+        return self._states[self._size - 1].item() if self._size else None
+
+    # ---- views ----
+
+    @property
+    def times(self):
+        return self._times[:self._size]
+
+    @property
+    def states(self):
+        return self._states[:self._size]
+
+    @property
+    def consumption(self):
+        return None if self._consumption is None else self._consumption[:self._size]
+
+    def datetimes(self):
+        return self.times.view("datetime64[s]")
+
+    def to_frame(self):
+        data = {"state": self.states}
+        if self._consumption is not None:
+            data["consumption"] = self.consumption
+        return pd.DataFrame(data, index=pd.DatetimeIndex(self.datetimes(), name="timestamp"), copy=False)
+
+    # Copy of the samples from index `start` on: (times, states, consumption or None).
+    def columns(self, start=0):
+        consumption = self.consumption
+        return (self.times[start:].copy(), self.states[start:].copy(),
+                None if consumption is None else consumption[start:].copy())
+
+    # Drop all but the last `keep` samples; returns how many were removed.
+    def trim(self, keep=1):
+        removed = max(self._size - keep, 0)
+        if removed:
+            kept = slice(removed, self._size)
+            self._times[:keep] = self._times[kept]
+            self._states[:keep] = self._states[kept]
+            if self._consumption is not None:
+                self._consumption[:keep] = self._consumption[kept]
+            self._size = keep
+        return removed
+
+
+# "YYYY-MM-DD HH:MM" strings for an array of simulated timestamps, formatted in one pass.
+def format_times(times):
+    text = np.datetime_as_string(np.asarray(times, dtype=np.int64).view("datetime64[s]"), unit="m")
+    return np.char.replace(text, "T", " ").tolist()
+
+# Last state recorded for `name`, or None. Works for SensorSeries and for {'time': [...], 'state': [...]} dicts.
+def last_state(sensor_states, name):
+    data = sensor_states.get(name)
+    if data is None:
+        return None
+    if isinstance(data, SensorSeries):
+        return data.last_state
+    states = data.get('state', [])
+    return states[-1] if len(states) else None
+
+# All the states recorded for `name` (a NumPy view for a SensorSeries), empty if there are none.
+def states_of(sensor_states, name):
+    data = sensor_states.get(name)
+    if data is None:
+        return ()
+    if isinstance(data, SensorSeries):
+        return data.states
+    return data.get('state', [])
+
+# Index of the last falling edge (1 -> 0) of a state sequence, or None.
+def last_falling_edge(states):
+    states = np.asarray(states)
+    if len(states) < 2:
+        return None
+    edges = np.flatnonzero((states[:-1] == 1) & (states[1:] == 0))
+    return int(edges[-1]) + 1 if len(edges) else None
+
+# (times, states, consumption) of a sensor for display and export: "YYYY-MM-DD HH:MM" strings and plain
+# lists for a SensorSeries, the lists as they are for the dicts built from CSV files (consumption may be None).
+def sensor_columns(sensor_data):
+    if isinstance(sensor_data, SensorSeries):
+        consumption = sensor_data.consumption
+        return (format_times(sensor_data.times), sensor_data.states.tolist(),
+                None if consumption is None else nan_to_none(consumption))
+    return sensor_data.get('time', []) or [], sensor_data.get('state', []) or [], sensor_data.get('consumption')
+
+# Plain list of a float column with missing values (NaN) as None, as csv writes them as empty fields.
+def nan_to_none(values):
+    return [None if v != v else v for v in values.tolist()]
@@ -0,0 +1,230 @@
+import csv
+import os
+import random
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from consumption_profiles import consumption_profiles, REPEAT_BY_TYPE, CONTINUOUS_TYPES
+
+TRACE_STEP_SECONDS = 60  # s of trace averaged into one step of the simulation (the resolution of the sensor log)
+TRACE_CACHE_SIZE = 32  # resampled traces kept in memory
+TRACE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "smarthome_simulator", "traces")  # .npy copies
+TRACE_CHUNK_ROWS = 1 << 16  # CSV rows parsed at a time when converting a trace
+STEP_TOLERANCE = 1e-9  # fraction of a step: minutes one rounding error short of a step start are in that step
+
+
+class TraceProfile:
+    """ A recorded power trace resampled to steps of `step_minutes`: the mean power of each step in `values`,
+    the start of each step in `keys`. Drawn like a CompiledProfile (step(), indexes(), energy(), next_key(),
+    first), the trace lasting `duration` minutes (len(values) steps by default, the last one may be shorter): a
+    repeating type loops over it, a continuous one keeps its last step, the others keep it until `end`, one
+    minute later, where they are switched off. """
+
+    def __init__(self, values, step_minutes, standby=0.0, repeat=False, continuous=False, duration=None):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.step_minutes = step_minutes
+        self.keys = np.arange(len(self.values)) * step_minutes
+        self.standby = standby
+        self.duration = len(self.values) * step_minutes if duration is None else duration
+        self.end = self.duration + 1
+        self.repeat = repeat
+        self.continuous = continuous
+        # W·min drawn from the start of the trace to each step
+        widths = np.diff(np.append(self.keys, self.duration)) if len(self.values) else np.empty(0)
+        self.cumulative = np.concatenate(([0.0], np.cumsum(self.values * widths)))
+
+    # Step of `minutes`, with STEP_TOLERANCE: whole seconds / 60 do not always divide back to a whole number of
+    # steps in floating point.
+    def _index(self, minutes):
+        return min(max(int(minutes / self.step_minutes + STEP_TOLERANCE), 0), len(self.values) - 1)
+
+    def step(self, minutes):
+        if not len(self.values):
+            return self.standby
+        t = minutes % self.duration if self.repeat else minutes
+        return float(self.values[self._index(t)])
+
+    def indexes(self, minutes):
+        t = np.mod(minutes, self.duration) if self.repeat else minutes
+        return np.clip(np.floor(t / self.step_minutes + STEP_TOLERANCE), 0, len(self.values) - 1).astype(np.int64)
+
+    def energy(self, m0, m1):
+        return (self._integral(m1) - self._integral(m0)) / 60.0
+
+    def _integral(self, minutes):
+        if minutes <= 0:
+            return 0.0
+        if not len(self.values):
+            return self.standby * minutes
+        loops = 0
+        if self.repeat:
+            loops, minutes = divmod(minutes, self.duration)
+        elif not self.continuous:
+            minutes = min(minutes, self.end)
+        i = self._index(minutes)
+        within = self.cumulative[i] + self.values[i] * (minutes - self.keys[i])
+        return float(loops * self.cumulative[-1] + within)
+
+    def next_key(self, minutes):
+        i = int(np.floor(minutes / self.step_minutes + STEP_TOLERANCE)) + 1
+        return float(self.keys[i]) if 0 <= i < len(self.keys) else None
+
+    @property
+    def first(self):
+        return float(self.values[0]) if len(self.values) else self.standby
+
+
+# Power samples of a trace file, memory-mapped: a CSV of one power column in W sampled at 1 Hz, or of two
+# columns (seconds, W) held until the next sample; an optional header line is skipped. The first read converts
+# it, TRACE_CHUNK_ROWS rows at a time, to a .npy file in `cache_dir` (again when the CSV is newer), which is what
+# gets mapped afterwards; the trace folder itself is only read. ValueError for a file without samples.
+def load_trace(path, cache_dir=TRACE_CACHE_DIR):
+    name = os.path.splitext(os.path.basename(path))[0]
+    cache = os.path.join(cache_dir, f"{name}_{zlib.crc32(os.path.abspath(path).encode('utf-8')):08x}.npy")
+    if not os.path.exists(cache) or os.path.getmtime(cache) < os.path.getmtime(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        _convert(path, cache)
+    return np.load(cache, mmap_mode="r")
+
+# Write the 1 Hz samples of the CSV `path` to the .npy file `cache`: streamed to a raw file first (the length is
+# only known at the end), then copied behind the .npy header; renamed into place once complete, so runs sharing
+# the cache (batch.py) never map a partial file.
+def _convert(path, cache):
+    part = f"{cache}.{os.getpid()}.part"
+    tmp = f"{cache}.{os.getpid()}.tmp"
+    try:
+        with open(part, "wb") as raw:
+            for samples in _one_hz(_csv_chunks(path, TRACE_CHUNK_ROWS)):
+                samples.astype(np.float32).tofile(raw)
+        length = os.path.getsize(part) // 4
+        if not length:
+            raise ValueError(f"Trace {path} has no power samples")
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(length,))
+        samples = np.memmap(part, dtype=np.float32, mode="r")
+        for start in range(0, length, TRACE_CHUNK_ROWS):
+            out[start:start + TRACE_CHUNK_ROWS] = samples[start:start + TRACE_CHUNK_ROWS]
+        out.flush()
+        del out, samples
+        os.replace(tmp, cache)
+    finally:
+        for leftover in (part, tmp):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+# Rows of a trace CSV as float arrays of up to `rows` rows, the header line (if any) skipped.
+def _csv_chunks(path, rows):
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        chunk = []
+        first = True
+        for row in csv.reader(f):
+            if not row:
+                continue
+            if first:
+                first = False
+                try:
+                    [float(v) for v in row]
+                except ValueError:
+                    continue
+            chunk.append(row)
+            if len(chunk) == rows:
+                yield np.array(chunk, dtype=np.float64).reshape(len(chunk), -1)
+                chunk = []
+        if chunk:
+            yield np.array(chunk, dtype=np.float64).reshape(len(chunk), -1)
+
+# 1 Hz samples of the chunks of a trace: one column is already 1 Hz; (seconds, W) is held from each sample to the
+# next, up to the second after the last one. Each chunk carries its last sample over to the next.
+def _one_hz(chunks):
+    t0, last, next_second = None, None, 0
+    for data in chunks:
+        if data.shape[1] == 1:
+            yield data[:, 0]
+            continue
+        if t0 is None:
+            t0 = data[0, 0]
+        times, watts = data[:, 0] - t0, data[:, 1]
+        if last is not None:
+            times, watts = np.concatenate(([last[0]], times)), np.concatenate(([last[1]], watts))
+        seconds = np.arange(next_second, int(np.floor(times[-1])) + 1)
+        yield watts[np.searchsorted(times, seconds, side="right") - 1]
+        next_second = int(np.floor(times[-1])) + 1
+        last = (times[-1], watts[-1])
+    if last is not None and np.ceil(last[0]) >= next_second:
+        yield np.full(int(np.ceil(last[0])) - next_second + 1, last[1])
+
+# Mean power of each step of `step_seconds` of a 1 Hz trace (the last step may be shorter).
+def resample(watts, step_seconds):
+    step = max(int(round(step_seconds)), 1)
+    starts = np.arange(0, len(watts), step)
+    if not len(starts):
+        return np.empty(0)
+    sums = np.add.reduceat(np.asarray(watts, dtype=np.float64), starts)
+    return sums / np.diff(np.append(starts, len(watts)))
+
+
+class TraceLibrary:
+    """ Power traces recorded from real appliances, in `directory`/<device type>/*.csv (e.g. traces/Fridge/).
+    Each device gets one trace of its type the first time it draws power: picked from its name, so the same
+    device always gets the same trace, or at random when a `seed` is given. Traces are memory-mapped and only
+    the resampled steps of the last TRACE_CACHE_SIZE used are kept in memory (their .npy copies go to
+    `cache_dir`, see load_trace). Install it with consumption_profiles.use_trace_library(). """
+
+    def __init__(self, directory, step_seconds=TRACE_STEP_SECONDS, seed=None, cache_size=TRACE_CACHE_SIZE,
+                 cache_dir=TRACE_CACHE_DIR):
+        self.directory = directory
+        self.step_seconds = step_seconds
+        self.cache_size = cache_size
+        self.cache_dir = cache_dir
+        self._rng = random.Random(seed) if seed is not None else None
+        self._files = {}  # device type -> trace paths
+        self._assigned = {}  # device name -> trace path
+        self._resampled = OrderedDict()  # (trace path, device type, step seconds) -> TraceProfile
+
+    # Trace files of a device type, in name order.
+    def traces(self, device_type):
+        files = self._files.get(device_type)
+        if files is None:
+            folder = os.path.join(self.directory, device_type)
+            files = sorted(os.path.join(folder, f) for f in os.listdir(folder)
+                           if f.lower().endswith(".csv")) if os.path.isdir(folder) else []
+            self._files[device_type] = files
+        return files
+
+    # Give the device `name` a trace: `path`, or one of its type picked as described above. None without traces.
+    def assign(self, name, device_type, path=None):
+        if path is None:
+            files = self.traces(device_type)
+            if not files:
+                return None
+            if self._rng is not None:
+                path = self._rng.choice(files)
+            else:
+                path = files[zlib.crc32(name.encode("utf-8")) % len(files)]
+        self._assigned[name] = path
+        return path
+
+    # TraceProfile of the device `name` in steps of `step_seconds` (the library's by default), None when its type
+    # has no traces.
+    def profile(self, name, device_type, step_seconds=None):
+        if name is None:
+            return None
+        path = self._assigned.get(name) or self.assign(name, device_type)
+        if path is None:
+            return None
+        step_seconds = self.step_seconds if step_seconds is None else step_seconds
+        key = (path, device_type, step_seconds)
+        trace = self._resampled.get(key)
+        if trace is None:
+            standby = consumption_profiles.get(device_type, {}).get("standby", 0.0)
+            watts = load_trace(path, self.cache_dir)
+            trace = TraceProfile(resample(watts, step_seconds), step_seconds / 60.0, standby,
+                                 REPEAT_BY_TYPE.get(device_type, False), device_type in CONTINUOUS_TYPES,
+                                 len(watts) / 60.0)
+            self._resampled[key] = trace
+            while len(self._resampled) > self.cache_size:
+                self._resampled.popitem(last=False)
+        else:
+            self._resampled.move_to_end(key)
+        return trace
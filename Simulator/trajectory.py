@@ -0,0 +1,37 @@
+import math
+
+import numpy as np
+
+WALK_SPEED = 70  # px per simulated second of an avatar walking between two clicks
+SAMPLES_PER_SECOND = 10  # positions per simulated second of walking
+
+
+# Straight walk from `start` to `end`: (times, xs, ys) arrays, times in simulated seconds from the start, both
+# ends included, positions rounded to whole pixels (the resolution of the visibility raster).
+def walk(start, end, speed=WALK_SPEED, rate=SAMPLES_PER_SECOND):
+    length = math.hypot(end[0] - start[0], end[1] - start[1])
+    duration = length / speed if speed > 0 else 0.0
+    steps = max(int(math.ceil(duration * rate)), 1)
+    fraction = np.linspace(0.0, 1.0, steps + 1)
+    xs = np.rint(start[0] + (end[0] - start[0]) * fraction).astype(np.int64)
+    ys = np.rint(start[1] + (end[1] - start[1]) * fraction).astype(np.int64)
+    return fraction * duration, xs, ys
+
+# Walk along waypoints [(x, y), ...] (e.g. a NavigationGrid route), leg after leg, as one (times, xs, ys).
+def walk_route(waypoints, speed=WALK_SPEED, rate=SAMPLES_PER_SECOND):
+    legs = [walk(a, b, speed, rate) for a, b in zip(waypoints, waypoints[1:])]
+    if not legs:
+        return walk(waypoints[0], waypoints[0], speed, rate)
+    offsets = np.cumsum([0.0] + [times[-1] for times, _, _ in legs[:-1]])
+    # each leg starts where the previous one ended: keep that position once
+    times = np.concatenate([legs[0][0]] + [t[1:] + o for (t, _, _), o in zip(legs[1:], offsets[1:])])
+    xs = np.concatenate([legs[0][1]] + [x[1:] for _, x, _ in legs[1:]])
+    ys = np.concatenate([legs[0][2]] + [y[1:] for _, _, y in legs[1:]])
+    return times, xs, ys
+
+# Positions where a sequence of values (e.g. the PIR seen at each sample) differs from the previous one.
+def changes(values):
+    values = np.asarray(values)
+    if not len(values):
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
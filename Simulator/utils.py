@@ -1,7 +1,10 @@
-import tkinter as tk
 import math
 
-from consumption_profiles import consumption_profiles, get_device_consumption
+import numpy as np
+
+from consumption_profiles import profile_for, get_device_consumption, CONTINUOUS_TYPES
+from geometry import WallCoordinates, DoorList, as_segments, blocked_mask
+from registry import SensorRegistry
 
 
 def draw_sensor(canvas, sensor):
@@ -10,7 +13,7 @@ def draw_sensor(canvas, sensor):
     rect_tag = f'{name}_rect_sensor'
     text_tag = f'{name}_text_sensor'
     canvas.create_rectangle(x - 5, y - 5, x + 5, y + 5, fill=color, tags=('sensor', rect_tag))
-    canvas.create_text(x+7, y, text=name, fill=color, anchor=tk.SW, tags=('sensor', text_tag))
+    canvas.create_text(x+7, y, text=name, fill=color, anchor="sw", tags=('sensor', text_tag))
 
 def calculate_distance(x1, y1, x2, y2):
     return math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
@@ -55,16 +58,18 @@ def is_within_fov(sensor, x, y, max_distance, fov_angle):
 
 def find_closest_sensor_without_intersection(point, sensors, walls_coordinates):
     x1, y1 = point
+    if isinstance(sensors, SensorRegistry):
+        # nearest first from the registry tree, stopping at the first sensor in sight
+        for sensor in sensors.nearest(x1, y1):
+            if not _crosses_wall(x1, y1, sensor[1], sensor[2], walls_coordinates):
+                return sensor
+        return None
     sensors_sorted = sorted(sensors, key=lambda s: calculate_distance(x1, y1, s[1], s[2]))
-    for sensor in sensors_sorted:
-        x2, y2 = sensor[1], sensor[2]
-        intersects = False
-        for i in range(0, len(walls_coordinates), 4):
-            p1, p2, p3, p4 = walls_coordinates[i:i + 4]
-            if intersect(x1, y1, x2, y2, p1, p2, p3, p4):
-                intersects = True
-                break
-        if not intersects:
+    if not sensors_sorted:
+        return None
+    blocked = paths_blocked([(x1, y1, s[1], s[2]) for s in sensors_sorted], walls_coordinates, ())
+    for sensor, is_blocked in zip(sensors_sorted, blocked):
+        if not is_blocked:
             return sensor
     return None
 
@@ -72,18 +77,48 @@ def find_closest_sensor_within_fov(point, sensors, walls_coordinates, doors, max
     x, y = point
     visible_sensors = [s for s in sensors if is_within_fov(s, x, y, max_distance, fov_angle)]
     visible_sensors.sort(key=lambda s: calculate_distance(x, y, s[1], s[2]))
-    for sensor in visible_sensors:
-        sx, sy = sensor[1], sensor[2]
-        if not is_path_blocked_by_walls(sx, sy, x, y, walls_coordinates, doors):
+    if not visible_sensors:
+        return None
+    blocked = paths_blocked([(s[1], s[2], x, y) for s in visible_sensors], walls_coordinates, doors)
+    for sensor, is_blocked in zip(visible_sensors, blocked):
+        if not is_blocked:
             return sensor
     return None
 
+# Blocked mask of many paths [(x1, y1, x2, y2), ...] at once (walls and closed doors), with the batch kernel of
+# geometry.py over the segments the paths may cross. Same result as is_path_blocked_by_walls on each path.
+def paths_blocked(paths, walls_coordinates, doors):
+    if not len(paths):
+        return np.zeros(0, dtype=bool)
+    box = _paths_box(paths)
+    if isinstance(walls_coordinates, WallCoordinates):
+        walls = walls_coordinates.compiled
+        rows = sorted({row for path in paths for row in walls_coordinates.grid.along(*path)})
+        segments = [walls.segments[walls.overlapping(*box, rows=rows)]] if rows else []
+    else:
+        segments = [as_segments(walls_coordinates)]
+    if isinstance(doors, DoorList):
+        compiled = doors.compiled
+        rows = sorted({row for path in paths for row in doors.crossing(*path)})
+        if rows:
+            rows = compiled.overlapping(*box, rows=rows)
+            segments.append(compiled.segments[rows[compiled.closed[rows]]])
+    else:
+        segments.append(as_segments([door[:4] for door in doors if door[4] == "close"]))
+    return blocked_mask(paths, np.concatenate(segments) if segments else np.empty((0, 4)))
+
+# (min x, min y, max x, max y) of a list of paths.
+def _paths_box(paths):
+    xs = [c for path in paths for c in (path[0], path[2])]
+    ys = [c for path in paths for c in (path[1], path[3])]
+    return min(xs), min(ys), max(xs), max(ys)
+
 def is_path_blocked_by_walls(x1, y1, x2, y2, walls_coordinates, doors):
-    for i in range(0, len(walls_coordinates), 4):
-        p1, p2, p3, p4 = walls_coordinates[i:i + 4]
-        if intersect(x1, y1, x2, y2, p1, p2, p3, p4):
-            return True
-    for door in doors:
+    if _crosses_wall(x1, y1, x2, y2, walls_coordinates):
+        return True
+    # indexed doors: only those on the cells crossed by the path
+    candidates = (doors[i] for i in doors.crossing(x1, y1, x2, y2)) if isinstance(doors, DoorList) else doors
+    for door in candidates:
         # door structure: (x1, y1, x2, y2, state).
         if door[4] == "close":
             px1, py1, px2, py2 = door[0], door[1], door[2], door[3]
@@ -91,6 +126,25 @@ def is_path_blocked_by_walls(x1, y1, x2, y2, walls_coordinates, doors):
                 return True
     return False
 
+def _crosses_wall(x1, y1, x2, y2, walls_coordinates):
+    if isinstance(walls_coordinates, WallCoordinates):
+        # compiled walls on the cells crossed by the segment, boxes checked before the orientation tests
+        rows = walls_coordinates.compiled.rows
+        lo_x, hi_x = min(x1, x2), max(x1, x2)
+        lo_y, hi_y = min(y1, y2), max(y1, y2)
+        for row in walls_coordinates.grid.along(x1, y1, x2, y2):
+            p1, p2, p3, p4, bx0, by0, bx1, by1 = rows[row]
+            if bx0 > hi_x or bx1 < lo_x or by0 > hi_y or by1 < lo_y:
+                continue
+            if intersect(x1, y1, x2, y2, p1, p2, p3, p4):
+                return True
+        return False
+    for i in range(0, len(walls_coordinates), 4):
+        p1, p2, p3, p4 = walls_coordinates[i:i + 4]
+        if intersect(x1, y1, x2, y2, p1, p2, p3, p4):
+            return True
+    return False
+
 def on_segment(x1, y1, x2, y2, x, y):
     return min(x1, x2) <= x <= max(x1, x2) and min(y1, y2) <= y <= max(y1, y2)
 
@@ -101,6 +155,10 @@ def orientation(x1, y1, x2, y2, x3, y3):
     return 1 if val > 0 else 2
 
 def intersect(x1, y1, x2, y2, x3, y3, x4, y4):
+    # segments whose bounding boxes are apart cannot meet
+    if (max(x1, x2) < min(x3, x4) or min(x1, x2) > max(x3, x4) or
+            max(y1, y2) < min(y3, y4) or min(y1, y2) > max(y3, y4)):
+        return False
     o1 = orientation(x1, y1, x2, y2, x3, y3)
     o2 = orientation(x1, y1, x2, y2, x4, y4)
     o3 = orientation(x3, y3, x4, y4, x1, y1)
@@ -134,6 +192,9 @@ def find_switch_sensors_by_doors(doors, sensors):
     return results
 
 def update_sensor_color(canvas, name, state, min_val):
+    # headless runs have no canvas to repaint
+    if canvas is None:
+        return
     color = "green" if float(state) > float(min_val) else "red"
     rect_tag = f'{name}_rect_sensor'
     text_tag = f'{name}_text_sensor'
@@ -141,18 +202,16 @@ def update_sensor_color(canvas, name, state, min_val):
     canvas.itemconfig(text_tag, fill=color)
 
 
-def update_devices_consumption(canvas, devices, delta_seconds, timer_app_instance=None):
+def update_devices_consumption(canvas, devices, delta_seconds, timer_app_instance=None, active_cycles=None):
     if timer_app_instance is None:
         print("Timer not provided to update_devices_consumption.")
         return
 
-    from common import active_cycles
-    from datetime import datetime
+    if active_cycles is None:
+        from common import active_cycles
+    from clock import timestamp_to_datetime
 
-    # Rebuild simulated datetime
-    simulated_time_str = timer_app_instance.get_simulated_time()
-    current_date_str = timer_app_instance.current_date
-    current_datetime = datetime.strptime(f"{current_date_str} {simulated_time_str}", "%Y-%m-%d %H:%M")
+    current_datetime = timestamp_to_datetime(timer_app_instance.get_simulated_timestamp())
 
     for i in range(len(devices)):
         name, dx, dy, type, power, state, min_c, max_c, current_cons, cons_dir = devices[i]
@@ -161,12 +220,12 @@ def update_devices_consumption(canvas, devices, delta_seconds, timer_app_instanc
             if name in active_cycles:
                 start_time, cycle_type = active_cycles[name]
                 elapsed_min = (current_datetime - start_time).total_seconds() / 60.0
-                profile_duration = max(consumption_profiles[cycle_type]["profile"].keys())
+                profile_duration = profile_for(name, cycle_type).duration
 
                 # At end of profile: for non-continuous devices, turn OFF and close cycle.
                 # Continuous: Refrigerator and Computer continue in duration module.
                 if elapsed_min > profile_duration:
-                    if cycle_type not in ["Fridge", "Computer"]:
+                    if cycle_type not in CONTINUOUS_TYPES:
                         # Turn off the device and close the cycle
                         devices[i] = (name, dx, dy, type, power, 0, min_c, max_c, 0, 0)
                         try:
@@ -0,0 +1,270 @@
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from geometry import DoorList, blocked_mask, compile_segments, hit_matrix
+from utils import calculate_distance, find_closest_sensor_within_fov, is_within_fov, paths_blocked
+
+NO_SENSOR = -1  # raster value: no sensor sees the pixel
+EXACT = -2  # raster value: too close to a field-of-view border to trust the array maths, ask utils instead
+_BORDER = 1e-6  # px / degrees around the range and angle limits that are left to the exact test
+RASTER_CACHE_SIZE = 8  # door configurations kept: doors are toggled back and forth between a few of them
+FOV_CACHE_SIZE = 4096  # query points kept by FovCache (device positions and clicks)
+
+
+# What cached geometry depends on: the revision of the indexed lists (see registry.py and geometry.py), the
+# length of plain ones.
+def layout_revision(sensors, walls_coordinates, doors):
+    return tuple(getattr(c, "revision", len(c)) for c in (sensors, walls_coordinates, doors))
+
+def closed_doors(doors):
+    if isinstance(doors, DoorList):
+        return doors.closed
+    return sum(1 << i for i, door in enumerate(doors) if door[4] == "close")
+
+
+# Bounding box (min x, min y, max x, max y) of the field of view of a sensor: its position, the two ends of the
+# arc and the points of the arc facing along the axes.
+def _fov_box(sx, sy, direction, max_distance, fov_angle):
+    half = min(fov_angle / 2, 180)
+    angles = [direction - half, direction + half]
+    angles += [a for a in range(-360, 721, 90) if direction - half <= a <= direction + half]
+    xs = [sx] + [sx + max_distance * math.cos(math.radians(a)) for a in angles]
+    ys = [sy] + [sy + max_distance * math.sin(math.radians(a)) for a in angles]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+class _FovQuery:
+    __slots__ = ("candidates", "hidden_by_walls", "door_bits", "hidden_by_doors", "mask", "closed", "result")
+
+
+class FovCache:
+    """ Results of find_closest_sensor_within_fov, one per (point, max_distance, fov_angle). A query keeps the
+    sensors that have the point in their field of view, in distance order, which of their lines of sight walls
+    block and which doors cross them; `mask` is the bitmask of those doors and `closed` the ones that were closed.
+    Toggling a door only affects the queries whose lines of sight it crosses: they are resolved again from the
+    kept masks, without any geometry, and every other result is reused as it is. The point is used as given:
+    clicks and device positions are whole pixels, so the results are the exact ones. The cache is emptied when
+    sensors, walls or doors are added, moved or removed. """
+
+    def __init__(self, sensors, walls_coordinates, doors, size=FOV_CACHE_SIZE):
+        self.sensors = sensors
+        self.walls_coordinates = walls_coordinates
+        self.doors = doors
+        self.size = size
+        self._layout = None
+        self._queries = OrderedDict()
+
+    def closest(self, point, max_distance, fov_angle):
+        layout = layout_revision(self.sensors, self.walls_coordinates, self.doors)
+        if layout != self._layout:
+            self._queries.clear()
+            self._layout = layout
+        key = (point[0], point[1], max_distance, fov_angle)
+        closed = closed_doors(self.doors)
+        query = self._queries.get(key)
+        if query is None:
+            query = self._query(point, max_distance, fov_angle)
+            self._resolve(query, closed)
+            self._queries[key] = query
+            while len(self._queries) > self.size:
+                self._queries.popitem(last=False)
+        else:
+            self._queries.move_to_end(key)
+            if closed & query.mask != query.closed:
+                self._resolve(query, closed)
+        return query.result
+
+    def _query(self, point, max_distance, fov_angle):
+        x, y = point
+        candidates = [s for s in self.sensors if is_within_fov(s, x, y, max_distance, fov_angle)]
+        candidates.sort(key=lambda s: calculate_distance(x, y, s[1], s[2]))
+        paths = [(s[1], s[2], x, y) for s in candidates]
+        if isinstance(self.doors, DoorList):
+            door_indexes = sorted({i for path in paths for i in self.doors.crossing(*path)})
+        else:
+            door_indexes = range(len(self.doors)) if paths else ()
+        hidden_by_doors = np.zeros((len(paths), 0), dtype=bool)
+        if paths and door_indexes:
+            hidden_by_doors = hit_matrix(paths, compile_segments(self.doors).segments[list(door_indexes)])
+        crossing = hidden_by_doors.any(axis=0)
+
+        query = _FovQuery()
+        query.candidates = candidates
+        query.hidden_by_walls = paths_blocked(paths, self.walls_coordinates, ())
+        # only the doors that cross a line of sight can change the result
+        query.door_bits = np.array([1 << i for i in door_indexes], dtype=object)[crossing]
+        query.hidden_by_doors = hidden_by_doors[:, crossing]
+        query.mask = int(sum(query.door_bits))
+        return query
+
+    # Pick the result of a query for the closed doors `closed`.
+    @staticmethod
+    def _resolve(query, closed):
+        blocked = query.hidden_by_walls.copy()
+        if len(query.door_bits):
+            is_closed = np.array([bool(closed & bit) for bit in query.door_bits])
+            blocked |= (query.hidden_by_doors & is_closed).any(axis=1)
+        query.closed = closed & query.mask
+        visible = np.flatnonzero(~blocked)
+        query.result = query.candidates[visible[0]] if len(visible) else None
+
+
+class VisibilityRaster:
+    """ For every pixel of the floor plan, the sensor find_closest_sensor_within_fov would pick for a click there
+    with the current walls and door states: the closest sensor whose field of view contains the pixel and whose
+    line of sight is not blocked. A click at integer coordinates is an array lookup; other points, pixels outside
+    the raster and pixels on the border of a field of view go through the exact search (`fov_cache` if given).
+
+    The door-independent part is prepared once per layout (sensors, walls or doors added, moved or removed): for
+    each sensor, the pixels of its field of view, their distance, the ones hidden by walls and, for every door near
+    it, the ones that door hides when closed. A door configuration then only combines boolean masks; the last
+    RASTER_CACHE_SIZE configurations are kept. """
+
+    def __init__(self, sensors, walls_coordinates, doors, max_distance, fov_angle, fov_cache=None):
+        self.sensors = sensors
+        self.walls_coordinates = walls_coordinates
+        self.doors = doors
+        self.max_distance = max_distance
+        self.fov_angle = fov_angle
+        self.fov_cache = fov_cache
+        self._layout = None
+        self._layers = []  # per sensor: (tx, ty, distance, hidden by walls, {door index: hidden by the door})
+        self._exact = None
+        self._rasters = OrderedDict()  # door states -> raster
+        self._candidates = []
+        self._origin = (0, 0)
+        self._raster = np.empty((0, 0), dtype=np.int32)
+
+    def closest(self, x, y):
+        self._refresh()
+        if isinstance(x, (int, np.integer)) and isinstance(y, (int, np.integer)):
+            col, row = x - self._origin[0], y - self._origin[1]
+            if 0 <= row < self._raster.shape[0] and 0 <= col < self._raster.shape[1]:
+                value = self._raster[row, col]
+                if value == NO_SENSOR:
+                    return None
+                if value != EXACT:
+                    return self._candidates[value]
+        if self.fov_cache is not None:
+            return self.fov_cache.closest((x, y), self.max_distance, self.fov_angle)
+        return find_closest_sensor_within_fov((x, y), self.sensors, self.walls_coordinates, self.doors,
+                                              self.max_distance, self.fov_angle)
+
+    # Candidate index (see `candidates`) of the closest visible sensor for every point (xs[i], ys[i]) of two
+    # integer arrays, NO_SENSOR where none: one gather on the raster, the exact search only for the points
+    # outside it or on a field-of-view border.
+    def indexes_along(self, xs, ys):
+        self._refresh()
+        xs, ys = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+        cols, rows = xs - self._origin[0], ys - self._origin[1]
+        on_raster = (rows >= 0) & (rows < self._raster.shape[0]) & (cols >= 0) & (cols < self._raster.shape[1])
+        indexes = np.full(len(xs), EXACT, dtype=np.int32)
+        indexes[on_raster] = self._raster[rows[on_raster], cols[on_raster]]
+        position = {id(sensor): i for i, sensor in enumerate(self._candidates)}
+        for i in np.flatnonzero(indexes == EXACT):
+            sensor = self.closest(int(xs[i]), int(ys[i]))
+            indexes[i] = NO_SENSOR if sensor is None else position[id(sensor)]
+        return indexes
+
+    # Sensors that can be in sight of a point: those with a direction, in list order.
+    @property
+    def candidates(self):
+        self._refresh()
+        return self._candidates
+
+    # Make the raster of the current door configuration the active one, preparing or composing it if needed.
+    def _refresh(self):
+        if layout_revision(self.sensors, self.walls_coordinates, self.doors) != self._layout:
+            self.rebuild()
+        door_states = tuple(door[4] for door in self.doors)
+        raster = self._rasters.get(door_states)
+        if raster is None:
+            raster = self._compose(door_states)
+            self._rasters[door_states] = raster
+            while len(self._rasters) > RASTER_CACHE_SIZE:
+                self._rasters.popitem(last=False)
+        else:
+            self._rasters.move_to_end(door_states)
+        self._raster = raster
+
+    # Prepare the per-sensor layers of the current scenario (called on load and when the layout changes).
+    def rebuild(self):
+        self._layout = layout_revision(self.sensors, self.walls_coordinates, self.doors)
+        self._rasters.clear()
+        self._layers = []
+        # only sensors with a direction can have (x, y) in their field of view (see utils.is_within_fov)
+        self._candidates = [s for s in self.sensors if s[8] is not None]
+        if not self._candidates:
+            self._exact = np.zeros((0, 0), dtype=bool)
+            return
+        reach = int(np.ceil(self.max_distance)) + 1
+        xs = [s[1] for s in self._candidates]
+        ys = [s[2] for s in self._candidates]
+        x0, y0 = int(np.floor(min(xs))) - reach, int(np.floor(min(ys))) - reach
+        x1, y1 = int(np.ceil(max(xs))) + reach, int(np.ceil(max(ys))) + reach
+        self._origin = (x0, y0)
+        self._exact = np.zeros((y1 - y0 + 1, x1 - x0 + 1), dtype=bool)
+        walls = compile_segments(self.walls_coordinates)
+        doors = compile_segments(self.doors)
+
+        for sensor in self._candidates:
+            sx, sy, direction = sensor[1], sensor[2], sensor[8]
+            # only the bounding box of the field of view, not the whole square around the sensor
+            left, top, right, bottom = _fov_box(sx, sy, direction, self.max_distance, self.fov_angle)
+            cols = np.arange(max(int(np.floor(left)) - 1, x0), min(int(np.ceil(right)) + 1, x1) + 1)
+            rows = np.arange(max(int(np.floor(top)) - 1, y0), min(int(np.ceil(bottom)) + 1, y1) + 1)
+            px, py = np.meshgrid(cols, rows)
+            dx, dy = px - sx, py - sy
+            distance = np.hypot(dx, dy)
+            relative = (np.degrees(np.arctan2(dy, dx)) % 360 - direction % 360) % 360
+            relative = np.where(relative > 180, relative - 360, relative)
+            inside = (distance <= self.max_distance) & (np.abs(relative) <= self.fov_angle / 2)
+            border = ((np.abs(distance - self.max_distance) < _BORDER) |
+                      (np.abs(np.abs(relative) - self.fov_angle / 2) < _BORDER))
+            self._exact[rows[0] - y0:rows[-1] - y0 + 1, cols[0] - x0:cols[-1] - x0 + 1] |= border
+
+            tx, ty = px[inside], py[inside]
+            # same expression as utils.calculate_distance, which orders the candidates
+            sort_distance = np.sqrt(dx[inside] ** 2 + dy[inside] ** 2)
+            hidden_by_doors = {}
+            for index in self._near(sx, sy, tx, ty, doors):
+                hidden_by_doors[index] = self._blocked(sx, sy, tx, ty, doors, [index])
+            self._layers.append((tx - x0, ty - y0, sort_distance, self._blocked(sx, sy, tx, ty, walls),
+                                 hidden_by_doors))
+
+    # Raster of one door configuration, from the prepared layers.
+    def _compose(self, door_states):
+        raster = np.full(self._exact.shape, NO_SENSOR, dtype=np.int32)
+        best = np.full(self._exact.shape, np.inf)
+        # sensors in list order, a strictly closer one replacing the previous pick: on equal distances the
+        # first in the list wins, as with the stable sort of find_closest_sensor_within_fov
+        for index, (cols, rows, distance, hidden_by_walls, hidden_by_doors) in enumerate(self._layers):
+            visible = ~hidden_by_walls
+            for door, hidden in hidden_by_doors.items():
+                if door_states[door] == "close":
+                    visible &= ~hidden
+            picked = visible & (distance < best[rows, cols])
+            raster[rows[picked], cols[picked]] = index
+            best[rows[picked], cols[picked]] = distance[picked]
+        raster[self._exact] = EXACT
+        return raster
+
+    # Rows of the compiled segments whose bounding box meets the one of the rays from (sx, sy) to the pixels (tx, ty).
+    @staticmethod
+    def _near(sx, sy, tx, ty, compiled, rows=None):
+        if not len(compiled) or not len(tx):
+            return np.empty(0, dtype=np.int64)
+        return compiled.overlapping(min(sx, tx.min()), min(sy, ty.min()), max(sx, tx.max()), max(sy, ty.max()), rows)
+
+    # Blocked mask of the lines of sight from the sensor (sx, sy) to the pixels (tx, ty) by the compiled segments
+    # (or some of their rows).
+    @classmethod
+    def _blocked(cls, sx, sy, tx, ty, compiled, rows=None):
+        segments = compiled.segments[cls._near(sx, sy, tx, ty, compiled, rows)]
+        if not len(segments):
+            return np.zeros(len(tx), dtype=bool)
+        rays = np.column_stack((np.full(len(tx), sx, dtype=np.float64), np.full(len(tx), sy, dtype=np.float64),
+                                tx, ty))
+        return blocked_mask(rays, segments)
@@ -1,9 +1,13 @@
-import tkinter as tk
+try:
+    import tkinter as tk
+except ImportError:  # headless runs (engine.py) never open the wall window
+    tk = None
 from point import points
+from geometry import WallCoordinates
 from read import read_walls_coordinates
 
 walls = []
-walls_coordinates = []
+walls_coordinates = WallCoordinates()
 
 def draw_line_window(canvas, window, load_active):
     global walls